@@ -0,0 +1,9 @@
+-- CreateTable
+CREATE TABLE "data_versions" (
+    "kind" TEXT NOT NULL,
+    "grade_level" TEXT NOT NULL,
+    "content_hash" TEXT NOT NULL,
+    "updated_at" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "data_versions_pkey" PRIMARY KEY ("kind","grade_level")
+);
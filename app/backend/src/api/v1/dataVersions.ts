@@ -0,0 +1,38 @@
+import express, { Request, Response } from 'express';
+import createLogger from '@/utils/logger';
+import { prisma } from '@/db/prisma';
+import { etagFromVersions, sendNotModified } from '@/utils/etag';
+
+const logger = createLogger('DataVersionsAPI');
+const router = express.Router();
+
+/**
+ * GET /api/v1/data-versions
+ * Version manifest published by scripts/import_taxonomy.py and scripts/import_questions.py:
+ * { taxonomy: { [gradeLevel]: hash }, questions: { [gradeLevel]: hash } }
+ * Each hash is the ETag of the matching resource; the manifest has its own ETag.
+ */
+router.get('/', async (req: Request, res: Response) => {
+    try {
+        const rows = await prisma.dataVersion.findMany({
+            select: { kind: true, gradeLevel: true, contentHash: true },
+        });
+        const etag = etagFromVersions(rows.map((row) => ({
+            gradeLevel: `${row.kind}/${row.gradeLevel}`,
+            contentHash: row.contentHash,
+        })));
+        if (sendNotModified(req, res, etag)) return;
+
+        const manifest: Record<string, Record<string, string>> = { taxonomy: {}, questions: {} };
+        for (const row of rows) {
+            if (!manifest[row.kind]) manifest[row.kind] = {};
+            manifest[row.kind][row.gradeLevel] = row.contentHash;
+        }
+        res.status(200).json(manifest);
+    } catch (error) {
+        logger.error({ error }, 'Error fetching data versions');
+        res.status(500).json({ error: 'An error occurred while fetching data versions' });
+    }
+});
+
+export default router;
@@ -8,6 +8,7 @@ import quizTemplatesRouter from './quizTemplates'; // Import quizTemplatesRouter
 import gamesRouter from './games'; // Re-enabled gamesRouter
 import questionsRouter from './questions'; // Import questionsRouter
 import taxonomyRouter from './taxonomy';
+import dataVersionsRouter from './dataVersions';
 import studentRouter from './student'; // Import studentRouter
 import usersRouter from './users'; // Import usersRouter
 import myTournamentsRouter from './myTournaments'; // Import myTournamentsRouter
@@ -45,6 +46,9 @@ router.use('/games', gamesRouter); // Re-enabled gamesRouter mounting
 // Mount the game control router
 router.use('/game-control', gameControlRouter);
 
+// Mount the data versions manifest (content hashes usable as ETags)
+router.use('/data-versions', dataVersionsRouter);
+
 // Mount the taxonomy router BEFORE questions router (more specific route first)
 router.use('/questions/taxonomy', taxonomyRouter);
 
@@ -3,6 +3,7 @@ import createLogger from '@/utils/logger';
 import { prisma } from '@/db/prisma';
 import ParsedMetadataSchema from '@shared/types/taxonomy';
 import type { ParsedMetadata } from '@shared/types/taxonomy';
+import { etagFromHash, etagFromVersions, sendNotModified } from '@/utils/etag';
 
 const logger = createLogger('TaxonomyAPI');
 const router = express.Router();
@@ -10,9 +11,15 @@ const router = express.Router();
 /**
  * GET /api/v1/questions/taxonomy
  * Returns all taxonomy rows as a ParsedMetadata-shaped object
+ * ETag: combined content hashes of all levels (304 without loading the content)
  */
 router.get('/', async (req: Request, res: Response) => {
     try {
+        const versions = await prisma.taxonomy.findMany({
+            select: { gradeLevel: true, contentHash: true },
+        });
+        if (sendNotModified(req, res, etagFromVersions(versions))) return;
+
         const rows = await prisma.taxonomy.findMany();
         const metadataMap: Record<string, any> = {};
         const gradeLevels: string[] = [];
@@ -41,10 +48,17 @@ router.get('/', async (req: Request, res: Response) => {
 /**
  * GET /api/v1/questions/taxonomy/:level
  * Returns taxonomy content for a single grade level
+ * ETag: the level content hash (304 without loading the content)
  */
 router.get('/:level', async (req: Request, res: Response) => {
     try {
         const { level } = req.params;
+        const version = await prisma.taxonomy.findUnique({
+            where: { gradeLevel: level } as any,
+            select: { contentHash: true },
+        });
+        if (version && sendNotModified(req, res, etagFromHash(version.contentHash))) return;
+
         const row = await prisma.taxonomy.findUnique({ where: { gradeLevel: level } as any });
         if (!row) {
             res.status(404).json({ error: 'Not found' });
@@ -0,0 +1,40 @@
+import crypto from 'crypto';
+import type { Request, Response } from 'express';
+
+interface VersionRow {
+    gradeLevel: string;
+    contentHash: string | null;
+}
+
+/**
+ * Strong ETag for one content hash published by the import scripts
+ * (taxonomy.content_hash, data_versions.content_hash). Null if there is no hash.
+ */
+export function etagFromHash(hash: string | null | undefined): string | null {
+    return hash ? `"${hash}"` : null;
+}
+
+/**
+ * Strong ETag for a set of grade levels: a hash of every (level, content hash) pair.
+ * Null if any level has no hash (no conditional request possible).
+ */
+export function etagFromVersions(rows: VersionRow[]): string | null {
+    if (rows.some((row) => !row.contentHash)) return null;
+    const lines = rows.map((row) => `${row.gradeLevel}:${row.contentHash}`).sort();
+    return etagFromHash(crypto.createHash('sha256').update(lines.join('\n')).digest('hex'));
+}
+
+/**
+ * Set ETag / Cache-Control and answer 304 when the client copy is current.
+ * Returns true if the response has been sent.
+ */
+export function sendNotModified(req: Request, res: Response, etag: string | null): boolean {
+    if (!etag) return false;
+    res.setHeader('ETag', etag);
+    res.setHeader('Cache-Control', 'no-cache');
+    if (req.fresh) {
+        res.status(304).end();
+        return true;
+    }
+    return false;
+}
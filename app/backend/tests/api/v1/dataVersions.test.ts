@@ -0,0 +1,45 @@
+import request from 'supertest';
+import express from 'express';
+import dataVersionsRouter from '../../../src/api/v1/dataVersions';
+
+jest.mock('@/db/prisma', () => ({
+    prisma: {
+        dataVersion: {
+            findMany: jest.fn(),
+        },
+    },
+}));
+
+import { prisma } from '@/db/prisma';
+
+describe('Data versions API', () => {
+    let app: express.Application;
+
+    beforeEach(() => {
+        app = express();
+        app.use('/data-versions', dataVersionsRouter);
+        (prisma.dataVersion.findMany as jest.Mock).mockResolvedValue([
+            { kind: 'taxonomy', gradeLevel: 'CP', contentHash: 'tax-cp' },
+            { kind: 'questions', gradeLevel: 'CP', contentHash: 'q-cp' },
+        ]);
+    });
+
+    afterEach(() => {
+        jest.clearAllMocks();
+    });
+
+    it('should return one hash per kind and grade level', async () => {
+        const response = await request(app).get('/data-versions');
+
+        expect(response.status).toBe(200);
+        expect(response.body).toEqual({ taxonomy: { CP: 'tax-cp' }, questions: { CP: 'q-cp' } });
+        expect(response.headers.etag).toMatch(/^"[0-9a-f]{64}"$/);
+    });
+
+    it('should answer 304 when the manifest did not change', async () => {
+        const first = await request(app).get('/data-versions');
+        const second = await request(app).get('/data-versions').set('If-None-Match', first.headers.etag);
+
+        expect(second.status).toBe(304);
+    });
+});
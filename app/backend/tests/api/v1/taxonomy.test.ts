@@ -80,6 +80,25 @@ describe('Taxonomy API', () => {
             expect(response.body.metadata.CP.niveau).toBe('CP');
         });
 
+        it('should answer 304 when the ETag still matches', async () => {
+            const rows = [
+                { gradeLevel: 'CP', content: { niveau: 'CP', disciplines: [] }, contentHash: 'hash1' },
+                { gradeLevel: 'CE1', content: { niveau: 'CE1', disciplines: [] }, contentHash: 'hash2' },
+            ];
+            (prisma.taxonomy.findMany as jest.Mock).mockResolvedValue(rows);
+
+            const first = await request(app).get('/taxonomy');
+            expect(first.status).toBe(200);
+            expect(first.headers.etag).toBeDefined();
+
+            (prisma.taxonomy.findMany as jest.Mock).mockClear();
+            const second = await request(app).get('/taxonomy').set('If-None-Match', first.headers.etag);
+
+            expect(second.status).toBe(304);
+            // Only the hashes were read, not the content
+            expect(prisma.taxonomy.findMany).toHaveBeenCalledTimes(1);
+        });
+
         it('should return empty metadata if no rows found', async () => {
             (prisma.taxonomy.findMany as jest.Mock).mockResolvedValue([]);
 
@@ -120,6 +139,16 @@ describe('Taxonomy API', () => {
             expect(response.body.disciplines).toHaveLength(1);
         });
 
+        it('should use the level content hash as ETag', async () => {
+            (prisma.taxonomy.findUnique as jest.Mock).mockResolvedValue({ contentHash: 'hash1' });
+
+            const response = await request(app).get('/taxonomy/CP').set('If-None-Match', '"hash1"');
+
+            expect(response.status).toBe(304);
+            expect(response.headers.etag).toBe('"hash1"');
+            expect(prisma.taxonomy.findUnique).toHaveBeenCalledTimes(1);
+        });
+
         it('should return 404 if grade level not found', async () => {
             (prisma.taxonomy.findUnique as jest.Mock).mockResolvedValue(null);
 
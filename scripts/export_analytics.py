@@ -0,0 +1,343 @@
+"""
+    Incremental columnar export (Parquet / Arrow) for offline item analysis.
+
+    Streams questions, game templates composition, game instances and participant
+    results through server-side named cursors into partitioned files:
+
+      <output>/<table>/export_date=YYYY-MM-DD/part-<run>.parquet
+
+    A small state file (<output>/_state.json) keeps the last exported watermark of
+    each table, so the next run only appends rows changed since then. Only
+    `questions` has an `updated_at` column; for the other tables the watermark is
+    the most recent of their timestamps (see TABLES). A row that changes again is
+    exported again: readers should keep the last version per primary key.
+
+    Timestamps are set when a row is written, not when its transaction commits:
+    a row can become visible after rows with a later watermark were exported.
+    Each run therefore reads again WATERMARK_OVERLAP before the saved watermark,
+    and skips the rows of that window it already exported (their primary key
+    and watermark are kept in the state). Watermarks have the millisecond
+    precision of the exported timestamps. The state is saved after each table.
+
+    Requires pyarrow (pip install pyarrow), which is only needed by this script.
+
+    Usage:
+      python3 scripts/export_analytics.py --output ./analytics
+      python3 scripts/export_analytics.py --output ./analytics --format arrow --full
+
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timedelta, timezone
+
+
+class Colors:
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+def color_text(text, color):
+    return f"{color}{text}{Colors.ENDC}"
+
+
+def print_ok(msg):
+    print(color_text(msg, Colors.OKGREEN))
+
+
+def print_warn(msg):
+    print(color_text(msg, Colors.WARNING))
+
+
+def print_err(msg):
+    print(color_text(msg, Colors.FAIL))
+
+
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+    cfg = {
+        'DB_NAME': os.getenv('DB_NAME'),
+        'DB_USER': os.getenv('DB_USER'),
+        'DB_PASSWORD': os.getenv('DB_PASSWORD'),
+        'DB_HOST': os.getenv('DB_HOST'),
+        'DB_PORT': int(os.getenv('DB_PORT', '5432')),
+    }
+    return cfg
+
+
+def get_conn(cfg):
+    import psycopg2
+    return psycopg2.connect(
+        dbname=cfg['DB_NAME'],
+        user=cfg['DB_USER'],
+        password=cfg['DB_PASSWORD'],
+        host=cfg['DB_HOST'],
+        port=cfg['DB_PORT'],
+    )
+
+
+# Fenêtre relue à chaque export pour les transactions validées après coup
+WATERMARK_OVERLAP = timedelta(minutes=10)
+
+# For each table: source, primary key, watermark expression and exported columns (name, type).
+# Types are pyarrow type names resolved in arrow_schema() so that pyarrow is only
+# imported when the export actually runs.
+TABLES = {
+    'questions': {
+        'from': 'questions',
+        'key': ('uid',),
+        'watermark': 'updated_at',
+        'columns': [
+            ('uid', 'string'), ('question_type', 'string'), ('discipline', 'string'),
+            ('grade_level', 'string'), ('themes', 'string[]'), ('tags', 'string[]'),
+            ('difficulty', 'int32'), ('time_limit_seconds', 'int32'),
+            ('excluded_from', 'string[]'), ('author', 'string'),
+            ('created_at', 'timestamp'), ('updated_at', 'timestamp'),
+        ],
+    },
+    'questions_in_game_templates': {
+        'from': 'questions_in_game_templates',
+        'key': ('game_template_id', 'question_uid'),
+        'watermark': 'created_at',
+        'columns': [
+            ('game_template_id', 'string'), ('question_uid', 'string'),
+            ('sequence', 'int32'), ('created_at', 'timestamp'),
+        ],
+    },
+    'game_instances': {
+        'from': 'game_instances',
+        'key': ('id',),
+        'watermark': 'GREATEST(created_at, started_at, ended_at)',
+        'columns': [
+            ('id', 'string'), ('game_template_id', 'string'), ('play_mode', 'string'),
+            ('status', 'string'), ('created_at', 'timestamp'),
+            ('started_at', 'timestamp'), ('ended_at', 'timestamp'),
+        ],
+    },
+    'game_participants': {
+        'from': 'game_participants',
+        'key': ('id',),
+        'watermark': 'GREATEST(joined_at, last_active_at, completed_at)',
+        'columns': [
+            ('id', 'string'), ('game_instance_id', 'string'), ('user_id', 'string'),
+            ('live_score', 'float64'), ('deferred_score', 'float64'),
+            ('nb_attempts', 'int32'), ('status', 'string'), ('joined_at', 'timestamp'),
+            ('last_active_at', 'timestamp'), ('completed_at', 'timestamp'),
+        ],
+    },
+}
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        print_err('pyarrow is required for this export: pip install pyarrow')
+        sys.exit(1)
+    return pyarrow
+
+
+def arrow_schema(pa, columns):
+    types = {
+        'string': pa.string(),
+        'string[]': pa.list_(pa.string()),
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'timestamp': pa.timestamp('ms'),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def build_query(spec):
+    # Enum columns (play_mode, status) are cast to text so that psycopg2 returns str
+    select = ', '.join(f'{name}::text' if kind == 'string' else name for name, kind in spec['columns'])
+    return (
+        f"SELECT {select}, date_trunc('milliseconds', {spec['watermark']}) AS _watermark FROM {spec['from']} "
+        f"WHERE %(since)s::timestamp IS NULL OR {spec['watermark']} >= %(since)s::timestamp "
+        f"ORDER BY _watermark"
+    )
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format_time(value):
+    return value.isoformat(timespec='milliseconds') if value else None
+
+
+class TableState:
+    """Watermark of one table and the rows already exported in the overlap window before it."""
+
+    def __init__(self, entry=None, overlap=WATERMARK_OVERLAP):
+        if isinstance(entry, str):
+            # État des versions précédentes : watermark seul
+            entry = {'watermark': entry}
+        entry = entry or {}
+        self.overlap = overlap
+        self.watermark = _parse_time(entry.get('watermark'))
+        self.recent = {(tuple(key), _parse_time(mark)) for key, mark in entry.get('recent', [])}
+
+    def since(self):
+        """Lower bound (inclusive, ISO string) of the next export, or None for everything."""
+        if self.watermark is None:
+            return None
+        return _format_time(self.watermark - self.overlap)
+
+    def is_new(self, key, watermark):
+        return (key, watermark) not in self.recent
+
+    def add(self, key, watermark):
+        if watermark is None:
+            return
+        if self.watermark is None or watermark > self.watermark:
+            self.watermark = watermark
+        self.recent.add((key, watermark))
+
+    def prune(self):
+        """Forget the rows older than the overlap window (rows come in watermark order)."""
+        if self.watermark is not None:
+            start = self.watermark - self.overlap
+            self.recent = {(key, mark) for key, mark in self.recent if mark >= start}
+
+    def to_json(self):
+        self.prune()
+        recent = sorted(self.recent, key=lambda entry: (entry[1], [str(k) for k in entry[0]]))
+        return {
+            'watermark': _format_time(self.watermark),
+            'recent': [[list(key), _format_time(mark)] for key, mark in recent],
+        }
+
+
+def load_state(path):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def export_table(conn, pa, name, spec, output_dir, table_state, fmt, batch_size, run_id):
+    """Stream the new rows of one table into a single new partition file.
+
+    table_state (TableState) is updated with the exported rows; returns the
+    number of rows written.
+    """
+    schema = arrow_schema(pa, spec['columns'])
+    col_names = [c for c, _ in spec['columns']]
+    key_index = [col_names.index(c) for c in spec['key']]
+    partition = os.path.join(output_dir, name, f"export_date={run_id[:10]}")
+    ext = 'parquet' if fmt == 'parquet' else 'arrow'
+    path = os.path.join(partition, f"part-{run_id}.{ext}")
+    tmp_path = path + '.tmp'
+    writer = None
+    total = 0
+
+    cur = conn.cursor(name=f'export_{name}')
+    cur.itersize = batch_size
+    try:
+        cur.execute(build_query(spec), {'since': table_state.since()})
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            # Lignes de la fenêtre de recouvrement déjà exportées au run précédent
+            fresh = []
+            for row in rows:
+                key = tuple(row[i] for i in key_index)
+                if table_state.is_new(key, row[-1]):
+                    fresh.append(row)
+                    table_state.add(key, row[-1])
+            table_state.prune()
+            rows = fresh
+            if not rows:
+                continue
+            # Column-major conversion: one list per column, no per-row dicts
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(columns[i], type=schema.field(i).type) for i in range(len(col_names))],
+                schema=schema,
+            )
+            if writer is None:
+                os.makedirs(partition, exist_ok=True)
+                if fmt == 'parquet':
+                    writer = pa.parquet.ParquetWriter(tmp_path, schema, compression='zstd')
+                else:
+                    writer = pa.ipc.new_file(tmp_path, schema)
+            if fmt == 'parquet':
+                writer.write_batch(batch)
+            else:
+                writer.write(batch)
+            total += len(rows)
+    finally:
+        cur.close()
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        os.replace(tmp_path, path)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental Parquet/Arrow export of questions and game results')
+    parser.add_argument('--output', '-o', default='analytics', help='Output directory (defaults to ./analytics)')
+    parser.add_argument('--format', choices=['parquet', 'arrow'], default='parquet', help='Output format (defaults to parquet)')
+    parser.add_argument('--tables', nargs='+', choices=sorted(TABLES), default=list(TABLES), help='Tables to export (defaults to all)')
+    parser.add_argument('--batch-size', type=int, default=10000, help='Rows fetched per round-trip (defaults to 10000)')
+    parser.add_argument('--full', action='store_true', help='Ignore the saved watermarks and export everything')
+    args = parser.parse_args()
+
+    pa = import_pyarrow()
+
+    cfg = load_env()
+    missing = [k for k, v in cfg.items() if not v]
+    if missing:
+        print_err(f'Missing DB environment variables: {missing}. Check scripts/.env or environment.')
+        sys.exit(1)
+
+    output_dir = os.path.abspath(args.output)
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, '_state.json')
+    state = {} if args.full else load_state(state_path)
+    run_id = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H%M%S')
+
+    try:
+        conn = get_conn(cfg)
+    except Exception as e:
+        print_err(f'Failed to connect to DB: {e}')
+        sys.exit(1)
+
+    try:
+        # One read-only snapshot for all tables so that joins stay consistent
+        conn.set_session(readonly=True, isolation_level='REPEATABLE READ')
+        for name in args.tables:
+            table_state = TableState(state.get(name))
+            since = table_state.since()
+            count = export_table(conn, pa, name, TABLES[name], output_dir, table_state, args.format, args.batch_size, run_id)
+            # Sauvegarde après chaque table : un échec sur la suivante ne fait pas réexporter celle-ci
+            state[name] = table_state.to_json()
+            save_state(state_path, state)
+            if count:
+                print_ok(f"{name}: {count} rows (watermark {state[name]['watermark']})")
+            else:
+                print_warn(f'{name}: no new rows since {since}')
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+    Export the live question bank (DB) back to YAML or JSONL files.
+
+    Questions are read with their polymorphic rows (multiple_choice_questions,
+    numeric_questions) through a server-side named cursor, batch by batch, and
+    streamed to one file per (gradeLevel, discipline). Memory use does not depend
+    on the size of the tables. The YAML output uses the canonical field order of
+    the files in `questions/` and can be re-imported as is by import_questions.py.
+
+    Usage:
+      python3 scripts/export_questions.py --output ./export
+      python3 scripts/export_questions.py --output ./export --format jsonl --batch-size 5000
+
+"""
+
+import os
+import sys
+import json
+import re
+import argparse
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from question_schema.schema import CANONICAL_FIELD_ORDER
+
+
+class Colors:
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+
+def color_text(text, color):
+    return f"{color}{text}{Colors.ENDC}"
+
+
+def print_ok(msg):
+    print(color_text(msg, Colors.OKGREEN))
+
+
+def print_err(msg):
+    print(color_text(msg, Colors.FAIL))
+
+
+def load_env():
+    from dotenv import load_dotenv
+    load_dotenv()
+    cfg = {
+        'DB_NAME': os.getenv('DB_NAME'),
+        'DB_USER': os.getenv('DB_USER'),
+        'DB_PASSWORD': os.getenv('DB_PASSWORD'),
+        'DB_HOST': os.getenv('DB_HOST'),
+        'DB_PORT': int(os.getenv('DB_PORT', '5432')),
+    }
+    return cfg
+
+
+def get_conn(cfg):
+    import psycopg2
+    return psycopg2.connect(
+        dbname=cfg['DB_NAME'],
+        user=cfg['DB_USER'],
+        password=cfg['DB_PASSWORD'],
+        host=cfg['DB_HOST'],
+        port=cfg['DB_PORT'],
+    )
+
+
+# Order by output file first (same lowercasing as group_path) so that each file is usually written in one go
+EXPORT_QUERY = '''
+    SELECT q.uid, q.author, q.grade_level, q.discipline, q.themes, q.tags, q.title,
+           q.question_type, q.time_limit_seconds, q.difficulty, q.excluded_from,
+           q.question_text, mc.answer_options, mc.correct_answers,
+           n.correct_answer, n.tolerance, n.unit, q.explanation
+    FROM questions q
+    LEFT JOIN multiple_choice_questions mc ON mc.question_uid = q.uid
+    LEFT JOIN numeric_questions n ON n.question_uid = q.uid
+    ORDER BY q.grade_level NULLS LAST, lower(q.discipline), q.uid
+'''
+
+# Column order of EXPORT_QUERY, expressed as YAML field names
+ROW_FIELDS = (
+    'uid', 'author', 'gradeLevel', 'discipline', 'themes', 'tags', 'title',
+    'questionType', 'timeLimit', 'difficulty', 'excludedFrom',
+    'text', 'answerOptions', 'correctAnswers',
+    'correctAnswer', 'tolerance', 'unit', 'explanation',
+)
+
+UNKNOWN_GRADE_LEVEL = '_sans-niveau'
+
+
+def row_to_question(row):
+    """Build a question dict in canonical field order, omitting NULL columns."""
+    values = dict(zip(ROW_FIELDS, row))
+    if values['questionType'] == 'numeric':
+        values['answerOptions'] = values['correctAnswers'] = None
+        # Les tolérances nulles ne sont pas écrites dans les fichiers sources
+        if not values['tolerance']:
+            values['tolerance'] = None
+    else:
+        values['correctAnswer'] = values['tolerance'] = values['unit'] = None
+    if not values['excludedFrom']:
+        values['excludedFrom'] = None
+    return {field: values[field] for field in CANONICAL_FIELD_ORDER if values.get(field) is not None}
+
+
+class _ExportDumper(yaml.SafeDumper):
+    pass
+
+
+def _represent_str(dumper, data):
+    # Block style for multi-line text, like hand-written files (PyYAML falls back
+    # to a quoted scalar when the literal style cannot represent the string)
+    if '\n' in data:
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', data)
+
+
+_ExportDumper.add_representer(str, _represent_str)
+
+
+def dump_yaml_question(q):
+    return yaml.dump([q], Dumper=_ExportDumper, allow_unicode=True, sort_keys=False, width=1000)
+
+
+def dump_jsonl_question(q):
+    return json.dumps(q, ensure_ascii=False) + '\n'
+
+
+def path_segment(name, default):
+    """name usable as a single path component (no separator, never '.' or '..')."""
+    segment = re.sub(r'[\\/]+', '-', str(name or '')).strip()
+    return default if segment in ('', '.', '..') else segment
+
+
+def group_path(output_dir, grade_level, discipline, fmt):
+    level = path_segment(grade_level, UNKNOWN_GRADE_LEVEL)
+    # Same layout as questions/: <niveau>/<discipline en minuscules>/
+    disc = path_segment(discipline, 'sans-discipline').lower()
+    ext = 'yaml' if fmt == 'yaml' else 'jsonl'
+    return os.path.join(output_dir, level, disc, f"export-{level}-{disc}.{ext}")
+
+
+def export_questions(conn, output_dir, fmt='yaml', batch_size=1000):
+    """Stream every question to per-(gradeLevel, discipline) files.
+
+    Returns a dict {file path: number of questions written}.
+    """
+    dump = dump_yaml_question if fmt == 'yaml' else dump_jsonl_question
+    counts = {}
+    current_path = None
+    out = None
+    # A named cursor keeps the result set on the server: only batch_size rows are in memory
+    cur = conn.cursor(name='export_questions')
+    cur.itersize = batch_size
+    try:
+        cur.execute(EXPORT_QUERY)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                q = row_to_question(row)
+                # Le fichier de sortie est la clé de regroupement : des disciplines qui ne diffèrent
+                # que par la casse ou les séparateurs partagent un fichier
+                path = group_path(output_dir, q.get('gradeLevel'), q.get('discipline'), fmt)
+                if path != current_path:
+                    if out:
+                        out.close()
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    # Fichier déjà commencé (tri SQL différent du nôtre) : on complète au lieu d'écraser
+                    out = open(path, 'a' if path in counts else 'w', encoding='utf-8')
+                    if path in counts and fmt == 'yaml':
+                        out.write('\n')
+                    counts.setdefault(path, 0)
+                    current_path = path
+                elif fmt == 'yaml':
+                    out.write('\n')
+                out.write(dump(q))
+                counts[path] += 1
+    finally:
+        if out:
+            out.close()
+        cur.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export questions from the DB to YAML/JSONL files')
+    parser.add_argument('--output', '-o', default='export', help='Output directory (defaults to ./export)')
+    parser.add_argument('--format', choices=['yaml', 'jsonl'], default='yaml', help='Output format (defaults to yaml)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows fetched per round-trip (defaults to 1000)')
+    args = parser.parse_args()
+
+    cfg = load_env()
+    missing = [k for k, v in cfg.items() if not v]
+    if missing:
+        print_err(f'Missing DB environment variables: {missing}. Check scripts/.env or environment.')
+        sys.exit(1)
+
+    try:
+        conn = get_conn(cfg)
+    except Exception as e:
+        print_err(f'Failed to connect to DB: {e}')
+        sys.exit(1)
+
+    try:
+        counts = export_questions(conn, os.path.abspath(args.output), args.format, args.batch_size)
+    finally:
+        conn.close()
+
+    for path, count in counts.items():
+        print_ok(f'  - {path} ({count})')
+    print('\n' + '='*40)
+    print_ok(f'Export finished: {sum(counts.values())} questions in {len(counts)} files')
+    print('='*40 + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,122 @@
 """
     Utilitaire pour la génération de la doc (nomenclature)
+
+    Écrit dans vuepress/docs/.vuepress/data/ :
+      - index.json : pour chaque niveau, son hash et la liste de ses disciplines
+        (nom, fichier, hash) ;
+      - <niveau>/<discipline>.json : une discipline (thèmes et tags), chargée à la
+        demande par le composant QuestionsExplorer.
+
+    Tout est écrit en JSON minifié, et seuls les fichiers dont le hash source a
+    changé depuis la dernière génération sont réécrits.
 """
 
-import yaml
 import json
 import os
-from glob import glob
+import re
+import sys
+import unicodedata
 
-base_dir = os.path.dirname(__file__)
+base_dir = os.path.dirname(os.path.abspath(__file__))
 root_dir = os.path.abspath(os.path.join(base_dir, '..'))
 
+sys.path.insert(0, base_dir)
+
+from taxonomy.artifact import load_taxonomy, compute_hash
+
 # Uniquement traiter les YAML dans le dossier questions/
 src_dir = os.path.join(root_dir, 'questions')
 # Destination adaptée pour VuePress : .vuepress/data/ pour les imports ES6
 dst_dir = os.path.join(root_dir, 'vuepress', 'docs', '.vuepress', 'data')
-os.makedirs(dst_dir, exist_ok=True)
-
-yaml_files = glob(os.path.join(src_dir, '*.yaml'))
-for yaml_file in yaml_files:
-    base_name = os.path.splitext(os.path.basename(yaml_file))[0]
-    json_file = os.path.join(dst_dir, f"{base_name}.json")
-    with open(yaml_file, 'r', encoding='utf-8') as f:
-        data = yaml.safe_load(f)
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    print(f"{yaml_file} converti en {json_file}")
\ No newline at end of file
+index_file = os.path.join(dst_dir, 'index.json')
+
+
+def slugify(name):
+    folded = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', folded.lower()).strip('-') or 'discipline'
+
+
+def dumps_min(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_if_changed(path, text):
+    if os.path.isfile(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+
+def load_previous_index():
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def main():
+    os.makedirs(dst_dir, exist_ok=True)
+    # Nomenclatures lues depuis l'artefact compilé (pas de re-parsing YAML si inchangées)
+    taxonomy = load_taxonomy(src_dir)
+    for level, err in taxonomy.errors.items():
+        print(err)
+
+    previous = load_previous_index()
+    index = {}
+    written = skipped = 0
+    for level in taxonomy.levels():
+        level_hash = taxonomy.content_hash(level)
+        old_entries = {e.get('file'): e for e in previous.get(level, {}).get('disciplines', [])}
+        entries = []
+        used = set()
+        for disc in taxonomy.content(level)['disciplines']:
+            base_slug = slug = slugify(disc['nom'])
+            n = 2
+            while slug in used:
+                slug = f"{base_slug}-{n}"
+                n += 1
+            used.add(slug)
+            rel = f"{level}/{slug}.json"
+            entries.append({'nom': disc['nom'], 'file': rel, 'hash': compute_hash(disc)[:16]})
+            old_entry = old_entries.get(rel)
+            chunk = os.path.join(dst_dir, rel)
+            if old_entry and old_entry.get('hash') == entries[-1]['hash'] and os.path.isfile(chunk):
+                skipped += 1
+                continue
+            write_if_changed(chunk, dumps_min(disc))
+            written += 1
+        index[level] = {'hash': level_hash[:16], 'disciplines': entries}
+
+        # Supprimer les disciplines qui n'existent plus dans ce niveau
+        level_dir = os.path.join(dst_dir, level)
+        for name in (os.listdir(level_dir) if os.path.isdir(level_dir) else []):
+            if name.endswith('.json') and f"{level}/{name}" not in {e['file'] for e in entries}:
+                os.remove(os.path.join(level_dir, name))
+
+    # Niveau en erreur (YAML invalide) : on garde l'entrée et les fichiers de la génération précédente
+    for level in taxonomy.errors:
+        if level not in index and level in previous:
+            index[level] = previous[level]
+
+    # Niveaux supprimés et anciens fichiers <niveau>.json (un fichier complet par niveau)
+    legacy_files = {f"{level}.json" for level in (*index, *previous, *taxonomy.errors)} - {"index.json"}
+    for name in os.listdir(dst_dir):
+        path = os.path.join(dst_dir, name)
+        if os.path.isdir(path) and name not in index and name not in taxonomy.errors:
+            for f in os.listdir(path):
+                os.remove(os.path.join(path, f))
+            os.rmdir(path)
+        elif name in legacy_files and os.path.isfile(path):
+            os.remove(path)
+
+    index_changed = write_if_changed(index_file, dumps_min(index))
+    print(f"{written} fichiers discipline écrits, {skipped} inchangés, index {'mis à jour' if index_changed else 'inchangé'} ({dst_dir})")
+
+
+if __name__ == '__main__':
+    main()
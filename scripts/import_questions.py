@@ -2,12 +2,22 @@
     Pour importer les questions dans la BDD
 """
 
-import yaml
+import json
+import hashlib
 import psycopg2
 import os
 import logging
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from question_schema.schema import normalize_question_type
+from question_schema.segments import question_segments
+from question_schema.validator import validate_question
+from question_schema.loader import load_questions_with_positions
+from taxonomy.artifact import load_taxonomy
+from taxonomy.usage import UsageIndexBuilder, as_list, taxonomy_errors, write_usage_index
+
 # ANSI color codes for pretty output
 class Colors:
     HEADER = '\033[95m'
@@ -24,6 +34,7 @@ def color_text(text, color):
     return f"{color}{text}{Colors.ENDC}"
 import argparse
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
 
 # Load environment variables from .env file
 load_dotenv()
@@ -73,6 +84,32 @@ def clear_db():
     conn.close()
     logging.info('Tables game_participants, game_instances, game_templates, and question tables cleared.')
 
+def question_bundle_hashes(questions_per_level):
+    """{grade_level: sha256} over the questions of each level, in uid order."""
+    hashes = {}
+    for level, questions in questions_per_level.items():
+        ordered = sorted(questions, key=lambda q: str(q.get('uid')))
+        s = json.dumps(ordered, ensure_ascii=False, sort_keys=True, default=str)
+        hashes[level] = hashlib.sha256(s.encode('utf-8')).hexdigest()
+    return hashes
+
+def publish_versions(cur, hashes):
+    """Replace the 'questions' entries of the data_versions manifest (same transaction as the import)."""
+    if hashes:
+        execute_values(
+            cur,
+            '''INSERT INTO data_versions (kind, grade_level, content_hash, updated_at)
+               VALUES %s
+               ON CONFLICT (kind, grade_level) DO UPDATE SET
+                 content_hash = EXCLUDED.content_hash,
+                 updated_at = NOW()
+               WHERE data_versions.content_hash IS DISTINCT FROM EXCLUDED.content_hash''',
+            [('questions', level, h) for level, h in sorted(hashes.items())],
+            template='(%s, %s, %s, NOW())',
+            page_size=len(hashes),
+        )
+    cur.execute("DELETE FROM data_versions WHERE kind = 'questions' AND grade_level != ALL(%s)", (list(hashes),))
+
 def import_questions():
 
     def print_colored(level, msg):
@@ -100,6 +137,7 @@ def import_questions():
     # For summary: count per discipline/theme
     from collections import defaultdict
     questions_per_folder = defaultdict(int)
+    questions_per_level = defaultdict(list)
     global verbose
     # --- NOUVELLE LOGIQUE ---
     import glob
@@ -107,38 +145,24 @@ def import_questions():
     # 1. Trouver tous les dossiers à la racine de questions/
     root_items = os.listdir(questions_dir)
     root_dirs = [d for d in root_items if os.path.isdir(os.path.join(questions_dir, d))]
-    # 2. Charger les nomenclatures (ex: cp.yaml, ce1.yaml, ...)
-    nomenclatures = {}
+    # 2. Charger les nomenclatures (ex: cp.yaml, ce1.yaml, ...) depuis l'artefact compilé
+    #    (recompilé automatiquement si un fichier de nomenclature a changé)
+    taxonomy = load_taxonomy(questions_dir)
+    # Index inverse nomenclature -> questions, pour `taxonomy.py diff`
+    usage_index = UsageIndexBuilder()
     for d in root_dirs:
-        nom_path = os.path.join(questions_dir, f"{d}.yaml")
-        if os.path.isfile(nom_path):
-            try:
-                with open(nom_path, 'r', encoding='utf-8') as f:
-                    nomenclatures[d] = yaml.safe_load(f)
-            except Exception as e:
-                msg = f"Erreur lors de la lecture de la nomenclature {nom_path} : {e}"
-                logging.error(msg)
-                all_errors.append(msg)
-                total_errors += 1
+        if d in taxonomy.errors:
+            msg = taxonomy.errors[d]
+            logging.error(msg)
+            all_errors.append(msg)
+            total_errors += 1
     # 3. Parcourir tous les fichiers questions (sauf nomenclatures)
     for d in root_dirs:
         dir_path = os.path.join(questions_dir, d)
-        # Préparer la structure de nomenclature pour ce dossier (niveau)
-        nomenclature = nomenclatures.get(d)
-        disciplines_dict = {}
-        if nomenclature and 'disciplines' in nomenclature:
-            for disc in nomenclature['disciplines']:
-                disc_name = disc.get('nom')
-                if not disc_name:
-                    continue
-                themes_dict = {}
-                for theme in disc.get('themes', []):
-                    theme_name = theme.get('nom')
-                    if not theme_name:
-                        continue
-                    tags = set(theme.get('tags', []))
-                    themes_dict[theme_name] = tags
-                disciplines_dict[disc_name] = themes_dict
+        # Structure de nomenclature pour ce dossier (niveau) : {discipline: {theme: set(tags)}}
+        disciplines_dict = taxonomy.disciplines_dict(d)
+        usage_index.add_level(d, disciplines_dict)
+        lookup = taxonomy.lookup(d)
         # Chercher tous les .yaml dans ce dossier
         for root, dirs, files in os.walk(dir_path):
             for f in files:
@@ -150,8 +174,7 @@ def import_questions():
                     # logging.info(f'Processing file: {yaml_path}')
                     print_colored('INFO', f'Processing file: {yaml_path}')
                     try:
-                        with open(yaml_path, 'r', encoding='utf-8') as file:
-                            questions = yaml.safe_load(file)
+                        questions, positions = load_questions_with_positions(yaml_path)
                         if not isinstance(questions, list):
                             msg = f"Erreur de format dans le fichier : {yaml_path} (le fichier doit contenir une liste de questions)"
                             # logging.error(msg)
@@ -168,135 +191,49 @@ def import_questions():
                         return
                     # Pour chaque question, valider la nomenclature
                     for idx, q in enumerate(questions):
-                        required_fields = ["uid", "text", "questionType", "discipline", "themes", "difficulty", "gradeLevel", "author", "timeLimit"]
-                        missing = [field for field in required_fields if field not in q or q[field] in [None, ""]]
-                        # Special handling for themes - allow empty list but not missing
-                        if "themes" not in q:
-                            missing.append("themes")
-                        elif q["themes"] is None or (isinstance(q["themes"], list) and len(q["themes"]) == 0):
-                            missing.append("themes")
-                        
-                        question_type = q.get("questionType")
-                        # Normalize question type for validation
-                        if question_type == "multiple_choice":
-                            question_type = "multipleChoice"
-                        elif question_type == "single_choice":
-                            question_type = "singleChoice"
-                        # --- Ajout des vérifications demandées ---
-                        if question_type in ["multipleChoice", "singleChoice"]:
-                            mc_fields = ["answerOptions", "correctAnswers"]
-                            mc_missing = [field for field in mc_fields if field not in q or q[field] in [None, ""] or (isinstance(q[field], list) and len(q[field]) == 0)]
-                            missing.extend(mc_missing)
-                            # Vérification correctAnswers
-                            answer_options = q.get("answerOptions", [])
-                            correct_answers = q.get("correctAnswers", [])
-                            if not isinstance(correct_answers, list) or not isinstance(answer_options, list):
-                                msg = f"correctAnswers et answerOptions doivent être des listes pour la question (uid={q.get('uid')}) dans {yaml_path}"
+                        q_errors, q_warnings = validate_question(q)
+                        if q_errors:
+                            for err in q_errors:
+                                msg = f"{err} dans {yaml_path} (index {idx})"
                                 print_colored('ERROR', msg)
                                 all_errors.append(msg)
                                 total_errors += 1
-                                return
-                            if len(correct_answers) != len(answer_options):
-                                msg = f"correctAnswers doit être de même longueur que answerOptions pour la question (uid={q.get('uid')}) dans {yaml_path}"
-                                print_colored('ERROR', msg)
-                                all_errors.append(msg)
-                                total_errors += 1
-                                return
-                            if not all(isinstance(b, bool) for b in correct_answers):
-                                msg = f"correctAnswers doit être un tableau de booléens pour la question (uid={q.get('uid')}) dans {yaml_path}"
-                                print_colored('ERROR', msg)
-                                all_errors.append(msg)
-                                total_errors += 1
-                                return
-                            if question_type == "singleChoice":
-                                if correct_answers.count(True) != 1:
-                                    msg = f"singleChoice : correctAnswers doit contenir exactement un booléen à True (uid={q.get('uid')}) dans {yaml_path}"
-                                    print_colored('ERROR', msg)
-                                    all_errors.append(msg)
-                                    total_errors += 1
-                                    return
-                        elif question_type == "numeric":
-                            if "correctAnswer" not in q or q["correctAnswer"] is None:
-                                missing.append("correctAnswer")
-                            # Vérification stricte du type
-                            try:
-                                float(q["correctAnswer"])
-                            except (ValueError, TypeError):
-                                msg = f"correctAnswer doit être un nombre pour une question numeric (uid={q.get('uid')}) dans {yaml_path}"
-                                print_colored('ERROR', msg)
-                                all_errors.append(msg)
-                                total_errors += 1
-                                return
-                        else:
-                            msg = f"Unknown questionType '{q.get('questionType')}' for question (uid={q.get('uid')}) dans {yaml_path}"
-                            print_colored('ERROR', msg)
-                            all_errors.append(msg)
-                            total_errors += 1
-                            return
-                        invalid_time_limit = False
-                        if "timeLimit" in q:
-                            try:
-                                time_limit_val = int(q["timeLimit"])
-                                if time_limit_val <= 0:
-                                    invalid_time_limit = True
-                            except Exception:
-                                invalid_time_limit = True
-
-                        if missing or invalid_time_limit:
-                            msg = f"Question manquante ou incomplète dans {yaml_path} (index {idx}): champs manquants ou timeLimit invalide : {missing if missing else ''}{' (timeLimit must be a positive integer)' if invalid_time_limit else ''}"
-                            print_colored('ERROR', msg)
-                            all_errors.append(msg)
-                            total_errors += 1
                             return
+                        for warn in q_warnings:
+                            msg = f"{warn} dans {yaml_path}"
+                            print_colored('WARNING', msg)
+                            all_warnings.append(msg)
+                            total_warnings += 1
 
                         # --- Validation stricte nomenclature ---
-                        # 1. Discipline
-                        discipline = q.get('discipline')
-                        if discipline not in disciplines_dict:
-                            msg = f"Discipline '{discipline}' inconnue pour la question (uid={q.get('uid')}) dans {yaml_path}"
+                        themes = as_list(q.get('themes', []))
+                        tags = as_list(q.get('tags')) if q.get('tags') else []
+                        # Noms écrits sans accents / avec une autre casse ou d'autres espaces :
+                        # on importe l'orthographe de la nomenclature et on le signale
+                        discipline, themes, tags, fixes = lookup.canonicalize(q.get('discipline'), themes, tags)
+                        if fixes:
+                            q['discipline'], q['themes'] = discipline, themes
+                            if tags:
+                                q['tags'] = tags
+                        for kind, old, new in fixes:
+                            msg = f"Valeur de {kind} '{old}' remplacée par '{new}' (uid={q.get('uid')}) dans {yaml_path}"
+                            print_colored('WARNING', msg)
+                            all_warnings.append(msg)
+                            total_warnings += 1
+                        for err in taxonomy_errors(discipline, themes, tags, disciplines_dict, lookup):
+                            msg = f"{err} (uid={q.get('uid')}) dans {yaml_path}"
                             print_colored('ERROR', msg)
                             all_errors.append(msg)
                             total_errors += 1
                             return
-                        # 2. Themes
-                        themes = q.get('themes', [])
-                        if isinstance(themes, str):
-                            themes = [themes]
-                        for theme in themes:
-                            if discipline in disciplines_dict and theme not in disciplines_dict[discipline]:
-                                msg = f"Thème '{theme}' inconnu pour la discipline '{discipline}' (uid={q.get('uid')}) dans {yaml_path}"
-                                print_colored('ERROR', msg)
-                                all_errors.append(msg)
-                                total_errors += 1
-                                return
-                        # 3. Tags (optionnel, si la question a des tags)
-                        if 'tags' in q and q['tags']:
-                            tags = q['tags']
-                            if isinstance(tags, str):
-                                tags = [tags]
-                            # Rassembler tous les tags connus pour tous les thèmes de la question
-                            known_tags_all_themes = set()
-                            for theme in themes:
-                                known_tags_all_themes.update(disciplines_dict.get(discipline, {}).get(theme, set()))
-                            for tag in tags:
-                                if tag not in known_tags_all_themes:
-                                    msg = f"Tag '{tag}' inconnu pour les thèmes {themes} de la discipline '{discipline}' (uid={q.get('uid')}) dans {yaml_path}"
-                                    print_colored('ERROR', msg)
-                                    all_errors.append(msg)
-                                    total_errors += 1
-                                    return
-                        if not q.get("title"):
-                            msg = f"Question sans titre (uid={q.get('uid')}) dans {yaml_path}"
-                            if verbose:
-                                print_colored('WARNING', msg)
-                            all_warnings.append(msg)
-                            total_warnings += 1
+                        usage_index.add(d, q, yaml_path, positions[idx][0] if idx < len(positions) else 1)
                         # Determine discipline/theme folder for summary
                         rel_path = os.path.relpath(yaml_path, questions_dir)
                         # Remove filename, keep folder path (discipline/theme)
                         folder = os.path.dirname(rel_path)
                         questions_per_folder[folder] += 1
                         all_questions.append((q, yaml_path))
+                        questions_per_level[d].append(q)
                         # Vérification des doublons de uid
                         uid = q.get('uid')
                         if uid:
@@ -319,6 +256,8 @@ def import_questions():
         logging.error("Corrigez les erreurs avant de relancer l'import.")
         return
 
+    write_usage_index(questions_dir, usage_index)
+
     # Si aucune erreur, on upload
     try:
         conn = get_conn()
@@ -327,34 +266,25 @@ def import_questions():
         # cur.execute('DELETE FROM questions') # DANGEREUX : supprime les liens en cascade vers GameTemplate !!
         # conn.commit()
         # Insérer les questions seulement après suppression
-        VALID_PLAYMODES = {"quiz", "practice", "tournament"}
         for q, yaml_path in all_questions:
-            # Validate excludedFrom
+            # excludedFrom a déjà été validé par le schéma, on ne fait que normaliser
             excluded_from = q.get('excludedFrom', [])
             if isinstance(excluded_from, str):
                 excluded_from = [excluded_from]
             if not isinstance(excluded_from, list):
                 excluded_from = []
-            invalid_modes = [mode for mode in excluded_from if mode not in VALID_PLAYMODES]
-            if invalid_modes:
-                msg = f"excludedFrom contient des valeurs invalides {invalid_modes} (uid={q.get('uid')}) dans {yaml_path}"
-                logging.error(msg)
-                all_errors.append(msg)
-                total_errors += 1
-                continue
             try:
                 # Normalize question type for DB
-                question_type = q.get('questionType')
-                if question_type == 'multiple_choice':
-                    question_type = 'multipleChoice'
-                elif question_type == 'single_choice':
-                    question_type = 'singleChoice'
+                question_type = normalize_question_type(q.get('questionType'))
+
+                # Texte découpé en segments texte / math, stocké à côté du texte brut
+                segments, _ = question_segments(q)
 
                 # Insert or update the main question record
                 cur.execute(
                     '''INSERT INTO questions
-                    (uid, title, question_text, question_type, discipline, themes, difficulty, grade_level, author, explanation, tags, time_limit_seconds, excluded_from, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                    (uid, title, question_text, question_type, discipline, themes, difficulty, grade_level, author, explanation, tags, time_limit_seconds, excluded_from, segments, created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW(), NOW())
                     ON CONFLICT (uid) DO UPDATE SET
                     title = EXCLUDED.title,
                     question_text = EXCLUDED.question_text,
@@ -368,6 +298,7 @@ def import_questions():
                     tags = EXCLUDED.tags,
                     time_limit_seconds = EXCLUDED.time_limit_seconds,
                     excluded_from = EXCLUDED.excluded_from,
+                    segments = EXCLUDED.segments,
                     updated_at = NOW()''',
                     [
                         q.get('uid'),
@@ -382,7 +313,8 @@ def import_questions():
                         q.get('explanation'),
                         q.get('tags'),
                         q.get('timeLimit'),
-                        excluded_from
+                        excluded_from,
+                        json.dumps(segments, ensure_ascii=False)
                     ]
                 )
 
@@ -437,6 +369,9 @@ def import_questions():
         print_colored('INFO', 'Cleaning orphaned polymorphic question records...')
         cur.execute('DELETE FROM multiple_choice_questions WHERE question_uid NOT IN (SELECT uid FROM questions WHERE question_type IN (%s, %s))', ('multipleChoice', 'singleChoice'))
         cur.execute('DELETE FROM numeric_questions WHERE question_uid NOT IN (SELECT uid FROM questions WHERE question_type = %s)', ('numeric',))
+        # Manifest de versions : un hash par niveau, servi comme ETag par le backend
+        print_colored('INFO', 'Publishing the data_versions manifest...')
+        publish_versions(cur, question_bundle_hashes(questions_per_level))
         conn.commit()
         cur.close()
         conn.close()
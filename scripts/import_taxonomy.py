@@ -2,9 +2,11 @@
     Manual import script to push taxonomy (grade-level nomenclatures) into the DB.
 
     This script is intentionally manual-only and should be run by a maintainer.
-    It reads YAML files located at the root of the `questions/` folder (not subdirectories),
-    validates a minimal schema, computes a content hash, and upserts rows into the
-    `taxonomy` table (Postgres JSONB column).
+    It reads YAML files located at the root of the `questions/` folder (not subdirectories)
+    through the compiled taxonomy artifact (see taxonomy/artifact.py), which
+    validates a minimal schema and computes a content hash, and upserts rows into the
+    `taxonomy` table (Postgres JSONB column). Grade levels whose hash matches the
+    stored one are skipped; the others are written in a single transaction.
 
     Usage:
       python3 scripts/import_taxonomy.py --questions-dir ../questions
@@ -13,14 +15,17 @@
 
 import os
 import sys
-import yaml
 import json
 import uuid
-import hashlib
 import logging
 import argparse
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from taxonomy.artifact import load_taxonomy
 
 
 class Colors:
@@ -71,75 +76,87 @@ def get_conn(cfg):
     )
 
 
-def validate_taxonomy(obj):
-    """Perform a minimal validation of the taxonomy YAML structure.
-
-    Expected shape (minimal):
-      { 'disciplines': [ { 'nom': str, 'themes': [ { 'nom': str, 'tags': [str, ...] }, ... ] }, ... ] }
-
-    Returns: (True, None) on success or (False, error_message) on failure.
-    """
-    if not isinstance(obj, dict):
-        return False, 'Top-level taxonomy must be a mapping/object'
-    if 'disciplines' not in obj:
-        return False, "Missing key 'disciplines'"
-    if not isinstance(obj['disciplines'], list):
-        return False, "'disciplines' must be a list"
-    for i, disc in enumerate(obj['disciplines']):
-        if not isinstance(disc, dict):
-            return False, f'disciplines[{i}] must be an object'
-        if 'nom' not in disc or not isinstance(disc['nom'], str) or not disc['nom'].strip():
-            return False, f"discipline at index {i} missing valid 'nom'"
-        themes = disc.get('themes', [])
-        if not isinstance(themes, list):
-            return False, f"'themes' for discipline {disc.get('nom')} must be a list"
-        for j, theme in enumerate(themes):
-            if not isinstance(theme, dict):
-                return False, f'disciplines[{i}].themes[{j}] must be an object'
-            if 'nom' not in theme or not isinstance(theme['nom'], str) or not theme['nom'].strip():
-                return False, f"theme at index {j} for discipline {disc.get('nom')} missing valid 'nom'"
-            tags = theme.get('tags', [])
-            if not isinstance(tags, list):
-                return False, f"'tags' for theme {theme.get('nom')} must be a list"
-            for k, tag in enumerate(tags):
-                if not isinstance(tag, str):
-                    return False, f'tag at index {k} in theme {theme.get("nom")} must be a string'
-    return True, None
-
-
-def compute_hash(obj):
-    # canonical JSON (sorted keys) ensures stable hash
-    s = json.dumps(obj, ensure_ascii=False, sort_keys=True)
-    h = hashlib.sha256(s.encode('utf-8')).hexdigest()
-    return h
-
-
-def upsert_taxonomy(conn, grade_level, content_json, content_hash):
+def fetch_stored_hashes(conn):
+    """Return {grade_level: content_hash} for every taxonomy row, in a single query."""
     cur = conn.cursor()
-    # Use explicit cast to jsonb
-    new_id = str(uuid.uuid4())
-    cur.execute(
-        '''INSERT INTO taxonomy (id, grade_level, content, content_hash, updated_at)
-           VALUES (%s, %s, %s::jsonb, %s, now())
-           ON CONFLICT (grade_level) DO UPDATE SET
-             content = EXCLUDED.content,
-             content_hash = EXCLUDED.content_hash,
-             updated_at = now()
-        ''',
-        [new_id, grade_level, json.dumps(content_json, ensure_ascii=False), content_hash]
-    )
-    conn.commit()
+    cur.execute('SELECT grade_level, content_hash FROM taxonomy')
+    hashes = dict(cur.fetchall())
     cur.close()
+    return hashes
 
 
-def find_root_yaml_files(questions_dir):
-    # Only list files at the root of questions_dir (no subdirectories)
-    files = []
-    for entry in os.listdir(questions_dir):
-        p = os.path.join(questions_dir, entry)
-        if os.path.isfile(p) and entry.lower().endswith('.yaml'):
-            files.append(p)
-    return sorted(files)
+def upsert_taxonomies(conn, rows):
+    """Write all changed grade levels with one multi-row statement, in one transaction.
+
+    rows: list of (grade_level, content_json, content_hash).
+    Unchanged rows are never touched, so taxonomy.updated_at only moves when the
+    content actually changed.
+    """
+    if not rows:
+        return
+    values = [
+        (str(uuid.uuid4()), grade_level, json.dumps(content_json, ensure_ascii=False), content_hash)
+        for grade_level, content_json, content_hash in rows
+    ]
+    cur = conn.cursor()
+    try:
+        # Use explicit cast to jsonb
+        execute_values(
+            cur,
+            '''INSERT INTO taxonomy (id, grade_level, content, content_hash, updated_at)
+               VALUES %s
+               ON CONFLICT (grade_level) DO UPDATE SET
+                 content = EXCLUDED.content,
+                 content_hash = EXCLUDED.content_hash,
+                 updated_at = now()
+               WHERE taxonomy.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+            ''',
+            values,
+            template='(%s, %s, %s::jsonb, %s, now())',
+            page_size=len(values),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def publish_versions(conn, hashes):
+    """Replace the 'taxonomy' entries of the data_versions manifest.
+
+    hashes: {grade_level: content_hash} of every level stored in the taxonomy
+    table (including levels whose YAML failed validation this run: their rows
+    are still served). The backend serves these hashes as ETags; rows are only
+    rewritten when a hash changed.
+    """
+    cur = conn.cursor()
+    try:
+        if hashes:
+            execute_values(
+                cur,
+                '''INSERT INTO data_versions (kind, grade_level, content_hash, updated_at)
+                   VALUES %s
+                   ON CONFLICT (kind, grade_level) DO UPDATE SET
+                     content_hash = EXCLUDED.content_hash,
+                     updated_at = now()
+                   WHERE data_versions.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+                ''',
+                [('taxonomy', level, h) for level, h in sorted(hashes.items())],
+                template='(%s, %s, %s, now())',
+                page_size=len(hashes),
+            )
+        cur.execute(
+            "DELETE FROM data_versions WHERE kind = 'taxonomy' AND grade_level != ALL(%s)",
+            (list(hashes),),
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
 
 
 def main():
@@ -162,14 +179,16 @@ def main():
         print_err(f'Questions directory not found: {qdir}')
         sys.exit(1)
 
-    files = find_root_yaml_files(qdir)
-    if not files:
+    # Nomenclatures parsed and validated once by the shared compiled artifact
+    taxonomy = load_taxonomy(qdir)
+    levels = sorted(taxonomy.levels() + list(taxonomy.errors))
+    if not levels:
         print_warn(f'No YAML files found in {qdir} (only root-level .yaml files are considered)')
         return
 
-    print_ok(f'Found {len(files)} taxonomy files in {qdir}')
-    for fpath in files:
-        print_ok(f'  - {os.path.basename(fpath)}')
+    print_ok(f'Found {len(levels)} taxonomy files in {qdir}')
+    for level in levels:
+        print_ok(f'  - {level}.yaml')
 
     if not args.yes:
         resp = input('Proceed to import these taxonomy files into DB? [y/N]: ').strip().lower()
@@ -184,39 +203,56 @@ def main():
         print_err(f'Failed to connect to DB: {e}')
         sys.exit(1)
 
-    successful = 0
+    try:
+        stored_hashes = fetch_stored_hashes(conn)
+    except Exception as e:
+        print_err(f'Failed to read stored taxonomy hashes: {e}')
+        conn.close()
+        sys.exit(1)
+
+    changed = []
+    skipped = 0
     failed = 0
-    for fpath in files:
-        name = os.path.basename(fpath)
-        grade_level = os.path.splitext(name)[0]
-        try:
-            with open(fpath, 'r', encoding='utf-8') as fh:
-                content = yaml.safe_load(fh)
-        except Exception as e:
-            print_err(f'Failed to read {fpath}: {e}')
-            failed += 1
+    for grade_level, err in taxonomy.errors.items():
+        print_err(f'Validation failed for {grade_level}: {err}')
+        failed += 1
+
+    for grade_level in taxonomy.levels():
+        h = taxonomy.content_hash(grade_level)
+        if stored_hashes.get(grade_level) == h:
+            print(f'Unchanged taxonomy for {grade_level} (hash={h[:8]}), skipped')
+            skipped += 1
             continue
+        changed.append((grade_level, taxonomy.content(grade_level), h))
 
-        ok, err = validate_taxonomy(content)
-        if not ok:
-            print_err(f'Validation failed for {name}: {err}')
-            failed += 1
-            continue
+    inserted = [row for row in changed if row[0] not in stored_hashes]
+    updated = [row for row in changed if row[0] in stored_hashes]
+    try:
+        upsert_taxonomies(conn, changed)
+        stored_hashes.update({grade_level: h for grade_level, _, h in changed})
+        for grade_level, _, h in inserted:
+            print_ok(f'Inserted taxonomy for {grade_level} (hash={h[:8]})')
+        for grade_level, _, h in updated:
+            print_ok(f'Updated taxonomy for {grade_level} (hash={h[:8]})')
+    except Exception as e:
+        print_err(f'Failed to upsert {[row[0] for row in changed]}: {e}')
+        failed += len(changed)
+        inserted, updated = [], []
 
-        h = compute_hash(content)
-        try:
-            upsert_taxonomy(conn, grade_level, content, h)
-            print_ok(f'Imported taxonomy for {grade_level} (hash={h[:8]})')
-            successful += 1
-        except Exception as e:
-            print_err(f'Failed to upsert {grade_level}: {e}')
-            failed += 1
+    # Manifest de versions (un hash par niveau), servi comme ETag par le backend.
+    # Toujours publié, avec les hashs de ce qui est réellement en base : un niveau invalide
+    # ne doit pas masquer la mise à jour des autres
+    try:
+        publish_versions(conn, {level: h for level, h in stored_hashes.items() if h})
+    except Exception as e:
+        print_err(f'Failed to publish the data_versions manifest: {e}')
+        failed += 1
 
     if conn:
         conn.close()
 
     print('\n' + '='*40)
-    print_ok(f'Import finished: {successful} succeeded, {failed} failed')
+    print_ok(f'Import finished: {len(inserted)} inserted, {len(updated)} updated, {skipped} skipped (unchanged), {failed} failed')
     print('='*40 + '\n')
 
 
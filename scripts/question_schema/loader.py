@@ -0,0 +1,31 @@
+"""
+    Load a questions YAML file together with the source position of each question
+
+    The file is parsed once: the node graph is composed with yaml.SafeLoader, the
+    start mark of each top-level sequence item gives its line / column, and the
+    same nodes are then constructed into plain Python objects.
+"""
+
+import yaml
+
+
+def load_questions_with_positions(path):
+    """Return (data, positions).
+
+    data is exactly what yaml.safe_load would return. positions is a list of
+    (line, column) pairs, 1-indexed, one per item when data is a list (empty
+    otherwise).
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        loader = yaml.SafeLoader(f)
+        try:
+            node = loader.get_single_node()
+            if node is None:
+                return None, []
+            data = loader.construct_document(node)
+        finally:
+            loader.dispose()
+    positions = []
+    if isinstance(node, yaml.SequenceNode):
+        positions = [(item.start_mark.line + 1, item.start_mark.column + 1) for item in node.value]
+    return data, positions
@@ -0,0 +1,102 @@
+"""
+    Declarative schema for MathQuest questions (YAML / DB)
+
+    Each question type is described by an ordered mapping field -> rules. The
+    rules are compiled once into specialized validator functions by
+    `question_schema.validator`, so the importer, yaml2latex and editor tooling
+    all apply exactly the same checks.
+
+    Supported rules:
+      required      champ absent, None ou "" => champ manquant
+      nonEmpty      une liste vide compte aussi comme champ manquant
+      list          la valeur doit être une liste
+      stringAsList  une chaîne isolée est acceptée et vaut [chaîne]
+      items         {'type': 'boolean'} ou {'enum': [...]} appliqué à chaque élément
+      sameLengthAs  longueur identique à celle d'un autre champ liste
+      countTrue     nombre exact d'éléments à True
+      number        float(valeur) doit réussir
+      positiveInt   int(valeur) doit réussir et être > 0
+      warnIfMissing message d'avertissement (et non erreur) si le champ est absent ou vide
+"""
+
+VALID_PLAYMODES = ("quiz", "practice", "tournament")
+
+# Les fichiers YAML historiques utilisent encore la forme snake_case
+QUESTION_TYPE_ALIASES = {
+    "single_choice": "singleChoice",
+    "multiple_choice": "multipleChoice",
+}
+
+COMMON_FIELDS = {
+    "uid": {"required": True},
+    "text": {"required": True},
+    "questionType": {"required": True},
+    "discipline": {"required": True},
+    "themes": {"required": True, "nonEmpty": True},
+    "difficulty": {"required": True},
+    "gradeLevel": {"required": True},
+    "author": {"required": True},
+    "timeLimit": {"required": True, "positiveInt": True},
+    "excludedFrom": {"stringAsList": True, "items": {"enum": VALID_PLAYMODES}},
+    "title": {"warnIfMissing": "Question sans titre"},
+}
+
+_CHOICE_FIELDS = {
+    "answerOptions": {"required": True, "nonEmpty": True, "list": True},
+    "correctAnswers": {
+        "required": True,
+        "nonEmpty": True,
+        "list": True,
+        "sameLengthAs": "answerOptions",
+        "items": {"type": "boolean"},
+    },
+}
+
+TYPE_FIELDS = {
+    "singleChoice": {
+        **_CHOICE_FIELDS,
+        "correctAnswers": {**_CHOICE_FIELDS["correctAnswers"], "countTrue": 1},
+    },
+    "multipleChoice": dict(_CHOICE_FIELDS),
+    "numeric": {
+        "correctAnswer": {"required": True, "number": True},
+    },
+}
+
+
+def normalize_question_type(question_type):
+    # Valeur YAML qui n'est pas une chaîne (liste, objet...) : type inconnu, sans lookup
+    # (une liste n'est pas hashable et ferait planter la validation)
+    if not isinstance(question_type, str):
+        return None
+    return QUESTION_TYPE_ALIASES.get(question_type, question_type)
+
+
+def schema_for(question_type):
+    """Return the merged field rules for a (normalized) question type, or None if unknown."""
+    if question_type not in TYPE_FIELDS:
+        return None
+    return {**COMMON_FIELDS, **TYPE_FIELDS[question_type]}
+
+
+# Ordre des champs tel qu'écrit dans les fichiers de questions/ (utilisé par les exports)
+CANONICAL_FIELD_ORDER = (
+    "uid",
+    "author",
+    "gradeLevel",
+    "discipline",
+    "themes",
+    "tags",
+    "title",
+    "questionType",
+    "timeLimit",
+    "difficulty",
+    "excludedFrom",
+    "text",
+    "answerOptions",
+    "correctAnswers",
+    "correctAnswer",
+    "tolerance",
+    "unit",
+    "explanation",
+)
@@ -0,0 +1,107 @@
+"""
+    Split question text into text / math segments
+
+    Question fields mix plain text and LaTeX math delimited by \\( ... \\) (inline)
+    or \\[ ... \\] (display). The importer tokenizes each field once and stores
+    the result next to the raw text, so renderers (frontend, projection page,
+    yaml2latex) no longer need to re-scan for delimiters.
+
+    A segment is either
+      {"type": "text", "value": "..."}
+      {"type": "math", "display": False, "value": "..."}   (value without delimiters)
+"""
+
+import re
+
+# Délimiteur précédé d'un nombre pair de backslashs seulement : dans \\( le \\ est un saut de ligne
+_DELIMITER = re.compile(r'(?<!\\)(?:\\\\)*\\([()\[\]])')
+
+_OPENERS = {'(': False, '[': True}
+_CLOSERS = {')': False, ']': True}
+
+
+def split_math(s):
+    """Tokenize a string in one linear pass.
+
+    Returns (segments, errors). Unbalanced or mismatched delimiters are reported in
+    errors; the offending part is then kept as plain text so that callers can
+    still render something.
+    """
+    segments = []
+    errors = []
+    if not isinstance(s, str) or not s:
+        return segments, errors
+    pos = 0
+    open_at = None
+    display = False
+    for m in _DELIMITER.finditer(s):
+        char = m.group(1)
+        # Début du délimiteur lui-même (les paires de backslashs qui le précèdent n'en font pas partie)
+        start = m.start(1) - 1
+        if open_at is None:
+            if char in _OPENERS:
+                if start > pos:
+                    segments.append({"type": "text", "value": s[pos:start]})
+                open_at = start
+                display = _OPENERS[char]
+                pos = m.end()
+            else:
+                errors.append(f"délimiteur '\\{char}' sans ouverture (position {start})")
+        elif char in _OPENERS:
+            errors.append(f"délimiteur '\\{char}' imbriqué dans un bloc math ouvert en position {open_at}")
+        elif _CLOSERS[char] != display:
+            errors.append(f"délimiteur '\\{char}' ne correspond pas à l'ouverture en position {open_at}")
+        else:
+            segments.append({"type": "math", "display": display, "value": s[pos:start]})
+            open_at = None
+            pos = m.end()
+    if open_at is not None:
+        errors.append(f"bloc math ouvert en position {open_at} jamais fermé")
+        pos = open_at
+    if pos < len(s):
+        if segments and segments[-1]["type"] == "text":
+            segments[-1]["value"] += s[pos:]
+        else:
+            segments.append({"type": "text", "value": s[pos:]})
+    return segments, errors
+
+
+def join_segments(segments, text=lambda v: v):
+    """Rebuild a string from segments, transforming text parts with `text`."""
+    parts = []
+    for seg in segments:
+        if seg["type"] == "math":
+            if seg["display"]:
+                parts.append('\\[' + seg["value"] + '\\]')
+            else:
+                parts.append('\\(' + seg["value"] + '\\)')
+        else:
+            parts.append(text(seg["value"]))
+    return ''.join(parts)
+
+
+# Champs texte d'une question qui peuvent contenir des formules
+SEGMENTED_FIELDS = ("text", "explanation")
+
+
+def question_segments(q):
+    """Tokenize every text field of a question.
+
+    Returns (segments, errors) where segments is the JSON document stored in
+    questions.segments: {"text": [...], "explanation": [...], "answerOptions": [[...], ...]}.
+    """
+    result = {}
+    errors = []
+    for field in SEGMENTED_FIELDS:
+        value = q.get(field)
+        if isinstance(value, str):
+            result[field], field_errors = split_math(value)
+            errors.extend(f"{field} : {e}" for e in field_errors)
+    options = q.get("answerOptions")
+    if isinstance(options, list):
+        result["answerOptions"] = []
+        for i, opt in enumerate(options):
+            segs, opt_errors = split_math(str(opt))
+            result["answerOptions"].append(segs)
+            errors.extend(f"answerOptions[{i}] : {e}" for e in opt_errors)
+    return result, errors
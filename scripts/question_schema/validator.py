@@ -0,0 +1,167 @@
+"""
+    Compile the declarative question schema into specialized validators
+
+    Same idea as fastjsonschema: instead of interpreting the rules for every
+    question, we generate the Python source of one validator per question type
+    (only the checks that apply to that type, inlined), exec it once and cache
+    the resulting function. Validating a question is then a single function call
+    with no rule lookups.
+
+    A validator takes a question dict and returns (errors, warnings), two lists of
+    French messages ending with "(uid=...)" so that callers can append the file
+    location.
+"""
+
+from .schema import COMMON_FIELDS, TYPE_FIELDS, normalize_question_type, schema_for
+from .segments import question_segments
+
+
+class _CodeGenerator:
+    def __init__(self, func_name, fields, label):
+        self.func_name = func_name
+        self.label = label
+        self.fields = fields
+        self.lines = []
+        self.constants = {}
+
+    def emit(self, line, indent=1):
+        self.lines.append('    ' * indent + line)
+
+    def constant(self, value):
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def generate(self):
+        self.lines = [f"def {self.func_name}(q):"]
+        self.emit("errors = []")
+        self.emit("warnings = []")
+        self.emit("missing = []")
+        self.emit("invalid = []")
+        self.emit("uid = q.get('uid')")
+        for field, rules in self.fields.items():
+            self._field(field, rules)
+        # Champs manquants et entiers invalides (positiveInt) dans un même message
+        positive = [field for field, rules in self.fields.items() if rules.get('positiveInt')]
+        summary = "champs manquants" + (f" ou {', '.join(positive)} invalide" if positive else "")
+        self.emit("if missing or invalid:")
+        self.emit("details = ''.join(f' ({name} must be a positive integer)' for name in invalid)", 2)
+        self.emit(f"errors.append(f\"Question manquante ou incomplète (uid={{uid}}) : {summary} : "
+                  "{missing if missing else ''}{details}\")", 2)
+        self.emit("return errors, warnings")
+        return '\n'.join(self.lines) + '\n'
+
+    def _field(self, field, rules):
+        self.emit(f"# {field}")
+        self.emit(f"v = q.get({field!r})")
+        empty_test = "v is None or v == ''"
+        if rules.get('nonEmpty'):
+            empty_test += " or (isinstance(v, list) and not v)"
+
+        if rules.get('warnIfMissing'):
+            self.emit(f"if {empty_test}:")
+            self.emit(f"warnings.append(f\"{rules['warnIfMissing']} (uid={{uid}})\")", 2)
+
+        checks = [k for k in ('list', 'stringAsList', 'items', 'sameLengthAs', 'countTrue', 'number', 'positiveInt') if k in rules]
+        if rules.get('required'):
+            self.emit(f"if {empty_test}:")
+            self.emit(f"missing.append({field!r})", 2)
+            if not checks:
+                return
+            self.emit("else:")
+            indent = 2
+        elif checks:
+            self.emit(f"if not ({empty_test}):")
+            indent = 2
+        else:
+            return
+
+        if rules.get('stringAsList'):
+            self.emit("if isinstance(v, str):", indent)
+            self.emit("v = [v]", indent + 1)
+            self.emit("elif not isinstance(v, list):", indent)
+            self.emit("v = []", indent + 1)
+        if rules.get('list'):
+            self.emit("if not isinstance(v, list):", indent)
+            self.emit(f"errors.append(f\"{field} doit être une liste (uid={{uid}})\")", indent + 1)
+            if any(k in rules for k in ('sameLengthAs', 'items', 'number', 'positiveInt')):
+                self.emit("else:", indent)
+                indent += 1
+        if 'sameLengthAs' in rules:
+            other = rules['sameLengthAs']
+            self.emit(f"other = q.get({other!r})", indent)
+            self.emit("if isinstance(other, list) and len(other) != len(v):", indent)
+            self.emit(f"errors.append(f\"{field} doit être de même longueur que {other} (uid={{uid}})\")", indent + 1)
+        items = rules.get('items')
+        if items and items.get('type') == 'boolean':
+            self.emit("if not all(isinstance(b, bool) for b in v):", indent)
+            self.emit(f"errors.append(f\"{field} doit être un tableau de booléens (uid={{uid}})\")", indent + 1)
+            if 'countTrue' in rules:
+                n = rules['countTrue']
+                label = 'un' if n == 1 else str(n)
+                self.emit(f"elif v.count(True) != {n}:", indent)
+                self.emit(f"errors.append(f\"{self.label} : {field} doit contenir exactement {label} booléen à True (uid={{uid}})\")", indent + 1)
+        elif items and 'enum' in items:
+            allowed = self.constant(frozenset(items['enum']))
+            self.emit(f"bad = [x for x in v if x not in {allowed}]", indent)
+            self.emit("if bad:", indent)
+            self.emit(f"errors.append(f\"{field} contient des valeurs invalides {{bad}} (uid={{uid}})\")", indent + 1)
+        if rules.get('number'):
+            self.emit("try:", indent)
+            self.emit("float(v)", indent + 1)
+            self.emit("except (ValueError, TypeError):", indent)
+            self.emit(f"errors.append(f\"{field} doit être un nombre (uid={{uid}})\")", indent + 1)
+        if rules.get('positiveInt'):
+            self.emit("try:", indent)
+            self.emit("if int(v) <= 0:", indent + 1)
+            self.emit(f"invalid.append({field!r})", indent + 2)
+            self.emit("except Exception:", indent)
+            self.emit(f"invalid.append({field!r})", indent + 1)
+
+
+def compile_validator(question_type, fields):
+    """Generate, exec and return a validator function for the given field rules."""
+    func_name = f"validate_{question_type}"
+    gen = _CodeGenerator(func_name, fields, question_type)
+    source = gen.generate()
+    namespace = dict(gen.constants)
+    exec(compile(source, f"<question_schema:{func_name}>", 'exec'), namespace)
+    func = namespace[func_name]
+    func.source = source
+    return func
+
+
+_VALIDATORS = {}
+
+
+def get_validator(question_type):
+    """Return the compiled validator for a normalized question type (compiled on first use)."""
+    func = _VALIDATORS.get(question_type)
+    if func is None:
+        fields = schema_for(question_type)
+        if fields is None:
+            func = _VALIDATORS.get(None)
+            if func is None:
+                func = _VALIDATORS[None] = compile_validator('unknown', COMMON_FIELDS)
+            return func
+        func = _VALIDATORS[question_type] = compile_validator(question_type, fields)
+    return func
+
+
+def validate_question(q):
+    """Validate one question dict against its type schema.
+
+    Returns (errors, warnings). Unbalanced math delimiters are errors too. Taxonomy
+    membership (discipline / themes / tags) is not part of the schema: it depends
+    on the grade-level nomenclature.
+    """
+    if not isinstance(q, dict):
+        return [f"Question invalide : un objet YAML est attendu, reçu {type(q).__name__}"], []
+    question_type = normalize_question_type(q.get('questionType'))
+    validator = get_validator(question_type)
+    errors, warnings = validator(q)
+    if question_type not in TYPE_FIELDS:
+        errors.insert(0, f"Unknown questionType '{q.get('questionType')}' for question (uid={q.get('uid')})")
+    _, segment_errors = question_segments(q)
+    errors.extend(f"Formule mal délimitée, {e} (uid={q.get('uid')})" for e in segment_errors)
+    return errors, warnings
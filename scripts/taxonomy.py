@@ -0,0 +1,72 @@
+"""
+    Outils autour de la nomenclature (questions/<niveau>.yaml)
+
+    Usage:
+      python3 scripts/taxonomy.py compile [--questions-dir ../questions]
+      python3 scripts/taxonomy.py diff [--questions-dir ../questions]
+"""
+
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from taxonomy.artifact import compile_taxonomy, write_artifact, load_taxonomy
+from taxonomy.usage import load_usage_index, diff_taxonomy
+
+DEFAULT_QUESTIONS_DIR = str(Path(__file__).parent.parent.resolve() / 'questions')
+
+
+def cmd_compile(args):
+    data = compile_taxonomy(args.questions_dir)
+    path = write_artifact(args.questions_dir, data)
+    for level, entry in data['levels'].items():
+        print(f"[taxonomy] {level}: {entry['content_hash'][:8]}")
+    for level, err in data['errors'].items():
+        print(f"[taxonomy] {level}: {err}")
+    print(f"[taxonomy] {len(data['disciplines'])} disciplines, {len(data['themes'])} thèmes, {len(data['tags'])} tags")
+    print(f"[taxonomy] artefact écrit dans {path} (source {data['source_hash'][:8]})")
+    return 1 if data['errors'] else 0
+
+
+def cmd_diff(args):
+    index = load_usage_index(args.questions_dir)
+    if index is None:
+        print("[taxonomy] Aucun index d'utilisation : lancez d'abord import_questions.py")
+        return 2
+    # Nomenclature actuelle (artefact recompilé si les YAML ont changé)
+    new = load_taxonomy(args.questions_dir)
+    for level, err in new.errors.items():
+        print(f"[taxonomy] {level}: {err}")
+    removed, broken = diff_taxonomy(index, new)
+    if not removed:
+        print("[taxonomy] Aucune entrée supprimée ou renommée depuis le dernier import")
+    for level, disc, theme, tag in removed:
+        print(f"[taxonomy] supprimé : {' > '.join(p for p in (level, disc, theme, tag) if p is not None)}")
+    for info, uid, err in broken:
+        print(f"{info['file']}:{info['line']}: {uid}: {err}")
+    print(f"[taxonomy] {len(broken)} question(s) cassée(s) par {len(removed)} suppression(s)")
+    return 1 if broken or new.errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outils pour la nomenclature des questions.")
+    parser.add_argument('--questions-dir', default=DEFAULT_QUESTIONS_DIR, help='Dossier questions/ (par défaut ../questions)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('compile', help="Compile les nomenclatures en un artefact indexé (questions/.cache/taxonomy.json)")
+    sub.add_parser('diff', help="Liste les questions cassées par les modifications de nomenclature depuis le dernier import")
+    args = parser.parse_args()
+    args.questions_dir = os.path.abspath(args.questions_dir)
+
+    commands = {
+        'compile': cmd_compile,
+        'diff': cmd_diff,
+    }
+    sys.exit(commands[args.command](args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+    Compiled taxonomy artifact shared by the importers and the docs generator
+
+    The root-level nomenclatures (questions/CP.yaml, questions/L2.yaml, ...) are
+    parsed and validated once by `taxonomy.py compile` into a single JSON file
+    (questions/.cache/taxonomy.json) containing:
+
+      - the raw content and content hash of each grade level (same hash as the
+        `taxonomy.content_hash` column),
+      - interned discipline / theme / tag ids (one string table per kind),
+      - a lookup tree level -> discipline id -> theme id -> [tag ids],
+      - reverse maps tag id / theme id -> places where they are used.
+
+    `source_hash` is a hash of the YAML bytes: tools compare it with the current
+    files and only recompile when a nomenclature changed.
+"""
+
+import os
+import json
+import hashlib
+import yaml
+
+from .lookup import LevelLookup
+
+ARTIFACT_VERSION = 1
+ARTIFACT_RELPATH = os.path.join('.cache', 'taxonomy.json')
+
+
+def validate_taxonomy(obj):
+    """Perform a minimal validation of the taxonomy YAML structure.
+
+    Expected shape (minimal):
+      { 'disciplines': [ { 'nom': str, 'themes': [ { 'nom': str, 'tags': [str, ...] }, ... ] }, ... ] }
+
+    Returns: (True, None) on success or (False, error_message) on failure.
+    """
+    if not isinstance(obj, dict):
+        return False, 'Top-level taxonomy must be a mapping/object'
+    if 'disciplines' not in obj:
+        return False, "Missing key 'disciplines'"
+    if not isinstance(obj['disciplines'], list):
+        return False, "'disciplines' must be a list"
+    for i, disc in enumerate(obj['disciplines']):
+        if not isinstance(disc, dict):
+            return False, f'disciplines[{i}] must be an object'
+        if 'nom' not in disc or not isinstance(disc['nom'], str) or not disc['nom'].strip():
+            return False, f"discipline at index {i} missing valid 'nom'"
+        themes = disc.get('themes', [])
+        if not isinstance(themes, list):
+            return False, f"'themes' for discipline {disc.get('nom')} must be a list"
+        for j, theme in enumerate(themes):
+            if not isinstance(theme, dict):
+                return False, f'disciplines[{i}].themes[{j}] must be an object'
+            if 'nom' not in theme or not isinstance(theme['nom'], str) or not theme['nom'].strip():
+                return False, f"theme at index {j} for discipline {disc.get('nom')} missing valid 'nom'"
+            tags = theme.get('tags', [])
+            if not isinstance(tags, list):
+                return False, f"'tags' for theme {theme.get('nom')} must be a list"
+            for k, tag in enumerate(tags):
+                if not isinstance(tag, str):
+                    return False, f'tag at index {k} in theme {theme.get("nom")} must be a string'
+    return True, None
+
+
+def compute_hash(obj):
+    # canonical JSON (sorted keys) ensures stable hash
+    s = json.dumps(obj, ensure_ascii=False, sort_keys=True)
+    h = hashlib.sha256(s.encode('utf-8')).hexdigest()
+    return h
+
+
+def find_root_yaml_files(questions_dir):
+    # Only list files at the root of questions_dir (no subdirectories)
+    files = []
+    for entry in os.listdir(questions_dir):
+        p = os.path.join(questions_dir, entry)
+        if os.path.isfile(p) and entry.lower().endswith('.yaml'):
+            files.append(p)
+    return sorted(files)
+
+
+def source_fingerprint(files):
+    """Hash of the raw nomenclature bytes (no YAML parsing)."""
+    h = hashlib.sha256()
+    h.update(str(ARTIFACT_VERSION).encode())
+    for path in files:
+        h.update(os.path.basename(path).encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class _Interner:
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def __call__(self, name):
+        idx = self.ids.get(name)
+        if idx is None:
+            idx = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+
+def compile_taxonomy(questions_dir):
+    """Parse and validate every root-level nomenclature into an artifact dict."""
+    files = find_root_yaml_files(questions_dir)
+    disciplines, themes, tags = _Interner(), _Interner(), _Interner()
+    levels = {}
+    errors = {}
+    reverse_themes = {}
+    reverse_tags = {}
+    for path in files:
+        level = os.path.splitext(os.path.basename(path))[0]
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = yaml.safe_load(f)
+        except Exception as e:
+            errors[level] = f"Erreur lors de la lecture de la nomenclature {path} : {e}"
+            continue
+        ok, err = validate_taxonomy(content)
+        if not ok:
+            errors[level] = f"Nomenclature invalide {path} : {err}"
+            continue
+        tree = {}
+        for disc in content['disciplines']:
+            d = disciplines(disc['nom'])
+            theme_tree = tree.setdefault(str(d), {})
+            for theme in disc.get('themes', []):
+                t = themes(theme['nom'])
+                tag_ids = theme_tree.setdefault(str(t), [])
+                reverse_themes.setdefault(str(t), []).append([level, d])
+                for tag in theme.get('tags', []):
+                    g = tags(tag)
+                    if g not in tag_ids:
+                        tag_ids.append(g)
+                    reverse_tags.setdefault(str(g), []).append([level, d, t])
+        levels[level] = {
+            'content_hash': compute_hash(content),
+            'content': content,
+            'tree': tree,
+        }
+    return {
+        'version': ARTIFACT_VERSION,
+        'source_hash': source_fingerprint(files),
+        'disciplines': disciplines.names,
+        'themes': themes.names,
+        'tags': tags.names,
+        'levels': levels,
+        'errors': errors,
+        'reverse': {'themes': reverse_themes, 'tags': reverse_tags},
+    }
+
+
+def artifact_path(questions_dir):
+    return os.path.join(questions_dir, ARTIFACT_RELPATH)
+
+
+def write_artifact(questions_dir, data):
+    path = artifact_path(questions_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+    return path
+
+
+class Taxonomy:
+    """Read-only view over a compiled artifact."""
+
+    def __init__(self, data):
+        self.data = data
+        self.source_hash = data['source_hash']
+        self.errors = data['errors']
+        self.disciplines = data['disciplines']
+        self.themes = data['themes']
+        self.tags = data['tags']
+        self._dict_cache = {}
+        self._lookups = {}
+        self._theme_ids = {name: i for i, name in enumerate(self.themes)}
+        self._tag_ids = {name: i for i, name in enumerate(self.tags)}
+
+    def levels(self):
+        return list(self.data['levels'])
+
+    def content(self, level):
+        entry = self.data['levels'].get(level)
+        return entry['content'] if entry else None
+
+    def content_hash(self, level):
+        entry = self.data['levels'].get(level)
+        return entry['content_hash'] if entry else None
+
+    def disciplines_dict(self, level):
+        """{discipline: {theme: set(tags)}} for one level ({} if the level is unknown)."""
+        cached = self._dict_cache.get(level)
+        if cached is None:
+            cached = {}
+            entry = self.data['levels'].get(level)
+            if entry:
+                for d, theme_tree in entry['tree'].items():
+                    cached[self.disciplines[int(d)]] = {
+                        self.themes[int(t)]: {self.tags[g] for g in tag_ids}
+                        for t, tag_ids in theme_tree.items()
+                    }
+            self._dict_cache[level] = cached
+        return cached
+
+    def lookup(self, level):
+        """Cached LevelLookup (accent / case insensitive names, suggestions) for one level."""
+        cached = self._lookups.get(level)
+        if cached is None:
+            cached = self._lookups[level] = LevelLookup(self.disciplines_dict(level))
+        return cached
+
+    def theme_usages(self, theme):
+        """[(level, discipline)] where a theme name is defined."""
+        t = self._theme_ids.get(theme)
+        if t is None:
+            return []
+        return [(level, self.disciplines[d]) for level, d in self.data['reverse']['themes'].get(str(t), [])]
+
+    def tag_usages(self, tag):
+        """[(level, discipline, theme)] where a tag name is defined."""
+        g = self._tag_ids.get(tag)
+        if g is None:
+            return []
+        return [
+            (level, self.disciplines[d], self.themes[t])
+            for level, d, t in self.data['reverse']['tags'].get(str(g), [])
+        ]
+
+
+def load_taxonomy(questions_dir, rebuild=True):
+    """Return the compiled Taxonomy, recompiling (and caching) it when stale.
+
+    The cached artifact is reused as long as its source_hash matches the current
+    root-level YAML files. With rebuild=False a stale or missing artifact returns None.
+    """
+    path = artifact_path(questions_dir)
+    current = source_fingerprint(find_root_yaml_files(questions_dir))
+    if os.path.isfile(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == ARTIFACT_VERSION and data.get('source_hash') == current:
+                return Taxonomy(data)
+        except (OSError, ValueError):
+            pass
+    if not rebuild:
+        return None
+    data = compile_taxonomy(questions_dir)
+    write_artifact(questions_dir, data)
+    return Taxonomy(data)
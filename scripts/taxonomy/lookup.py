@@ -0,0 +1,136 @@
+"""
+    Accent-, case- and spacing-insensitive lookup of taxonomy names
+
+    Names are normalized with NFKD accent folding, casefolding and whitespace
+    collapsing ("Géométrie", "geometrie" and " GÉOMÉTRIE " share one key).
+    A NameIndex answers exact and normalized lookups with a dict access. It also
+    keeps a trigram index, so suggestions for an unknown name only score the
+    names that share at least one trigram with it. This stays fast with
+    thousands of tags.
+"""
+
+import re
+import heapq
+import unicodedata
+from collections import Counter
+
+from .usage import as_list
+
+_SPACES = re.compile(r'\s+')
+
+# Au-dessous de ce score (coefficient de Dice sur les trigrammes), pas de suggestion
+MIN_SUGGESTION_SCORE = 0.3
+
+
+def normalize_name(name):
+    folded = unicodedata.normalize('NFKD', str(name))
+    folded = ''.join(c for c in folded if not unicodedata.combining(c))
+    return _SPACES.sub(' ', folded.casefold()).strip()
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    def __init__(self, names):
+        self.names = []
+        self._exact = set()
+        self._normalized = {}
+        self._grams = []
+        self._postings = {}
+        for name in names:
+            if name in self._exact:
+                continue
+            idx = len(self.names)
+            self.names.append(name)
+            self._exact.add(name)
+            key = normalize_name(name)
+            # Deux noms distincts de même forme normalisée : ambigu, pas de résolution
+            self._normalized[key] = None if key in self._normalized else name
+            grams = _trigrams(key)
+            self._grams.append(len(grams))
+            for g in grams:
+                self._postings.setdefault(g, []).append(idx)
+
+    def __contains__(self, name):
+        return name in self._exact
+
+    def resolve(self, name):
+        """Return the taxonomy spelling of name, or None if unknown or ambiguous."""
+        # Valeur YAML qui n'est pas un nom (nombre, liste imbriquée...) : jamais résolue
+        if not isinstance(name, str):
+            return None
+        if name in self._exact:
+            return name
+        return self._normalized.get(normalize_name(name))
+
+    def suggest(self, name, k=3):
+        """Up to k closest names, best first."""
+        grams = _trigrams(normalize_name(name))
+        shared = Counter()
+        for g in grams:
+            shared.update(self._postings.get(g, ()))
+        scored = (
+            (2 * count / (len(grams) + self._grams[idx]), idx)
+            for idx, count in shared.items()
+        )
+        best = heapq.nlargest(k, (s for s in scored if s[0] >= MIN_SUGGESTION_SCORE),
+                              key=lambda s: (s[0], -s[1]))
+        return [self.names[idx] for _, idx in best]
+
+
+class LevelLookup:
+    """NameIndex views over one level's {discipline: {theme: set(tags)}} structure."""
+
+    def __init__(self, disciplines_dict):
+        self.tree = disciplines_dict
+        self.disciplines = NameIndex(sorted(disciplines_dict))
+        self._themes = {}
+        self._tags = {}
+
+    def themes(self, discipline):
+        if not isinstance(discipline, str):
+            return NameIndex(())
+        index = self._themes.get(discipline)
+        if index is None:
+            index = self._themes[discipline] = NameIndex(sorted(self.tree.get(discipline, {})))
+        return index
+
+    def tags(self, discipline, themes):
+        # Thèmes tels que lus dans le YAML : chaîne seule, valeurs non textuelles possibles
+        themes = sorted({t for t in as_list(themes) if isinstance(t, str)})
+        if not isinstance(discipline, str):
+            return NameIndex(())
+        key = (discipline, tuple(themes))
+        index = self._tags.get(key)
+        if index is None:
+            known = self.tree.get(discipline, {})
+            names = set()
+            for theme in themes:
+                names.update(known.get(theme, ()))
+            index = self._tags[key] = NameIndex(sorted(names))
+        return index
+
+    def canonicalize(self, discipline, themes, tags):
+        """Replace names that only differ by accents / case / spacing by their
+        taxonomy spelling.
+
+        Returns (discipline, themes, tags, fixes) where fixes lists the
+        (kind, old, new) replacements made. Unknown names are left untouched.
+        """
+        fixes = []
+
+        def fix(kind, index, name):
+            new = index.resolve(name) if name is not None else None
+            if new is None or new == name:
+                return name
+            fixes.append((kind, name, new))
+            return new
+
+        discipline = fix('discipline', self.disciplines, discipline)
+        themes = [fix('thème', self.themes(discipline), t) for t in themes]
+        tag_index = self.tags(discipline, themes)
+        tags = [fix('tag', tag_index, t) for t in tags]
+        return discipline, themes, tags, fixes
@@ -0,0 +1,188 @@
+"""
+    Reverse index from taxonomy entries to the questions that use them
+
+    Written by import_questions.py after a successful validation
+    (questions/.cache/usage-index.json), it maps each (level, discipline),
+    (level, discipline, theme) and (level, discipline, theme, tag) to the uids of
+    the questions that depend on it, and keeps each question's file / line and the
+    taxonomy it was validated against. `taxonomy.py diff` uses it to list the
+    questions broken by a nomenclature change by looking only at the entries that
+    were removed, instead of re-running the whole import.
+"""
+
+import os
+import json
+
+USAGE_INDEX_VERSION = 2
+USAGE_INDEX_RELPATH = os.path.join('.cache', 'usage-index.json')
+
+
+def as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def _suggest(message, index, name):
+    if index is None:
+        return message
+    suggestions = index.suggest(name)
+    if not suggestions:
+        return message
+    return f"{message} ; vouliez-vous dire {', '.join(repr(s) for s in suggestions)} ?"
+
+
+def taxonomy_errors(discipline, themes, tags, disciplines_dict, lookup=None):
+    """Check a question's discipline / themes / tags against a level nomenclature.
+
+    Returns a list holding the first problem found (empty if valid), without uid
+    nor file location so that callers can append them. With a LevelLookup, the
+    message lists the closest known names.
+    """
+    # isinstance d'abord : une valeur YAML non hashable (liste, objet) ne doit pas faire planter le test
+    if not isinstance(discipline, str) or discipline not in disciplines_dict:
+        return [_suggest(f"Discipline '{discipline}' inconnue pour la question",
+                         lookup and lookup.disciplines, discipline)]
+    known_themes = disciplines_dict[discipline]
+    for theme in themes:
+        if not isinstance(theme, str) or theme not in known_themes:
+            return [_suggest(f"Thème '{theme}' inconnu pour la discipline '{discipline}'",
+                             lookup and lookup.themes(discipline), theme)]
+    if tags:
+        # Un tag est valide s'il appartient à l'un des thèmes de la question
+        known_tags_all_themes = set()
+        for theme in themes:
+            known_tags_all_themes.update(known_themes.get(theme, set()))
+        for tag in tags:
+            if not isinstance(tag, str) or tag not in known_tags_all_themes:
+                return [_suggest(f"Tag '{tag}' inconnu pour les thèmes {themes} de la discipline '{discipline}'",
+                                 lookup and lookup.tags(discipline, themes), tag)]
+    return []
+
+
+def _key(*parts):
+    # Tableau JSON plutôt qu'un séparateur : un nom peut contenir n'importe quel caractère
+    return json.dumps(parts, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+class UsageIndexBuilder:
+    def __init__(self):
+        self.questions = {}
+        self.disciplines = {}
+        self.themes = {}
+        self.tags = {}
+        self.taxonomy = {}
+
+    def add_level(self, level, disciplines_dict):
+        self.taxonomy[level] = {
+            disc: {theme: sorted(tags) for theme, tags in themes.items()}
+            for disc, themes in disciplines_dict.items()
+        }
+
+    def add(self, level, q, yaml_path, line):
+        uid = q.get('uid')
+        if not uid:
+            return
+        discipline = q.get('discipline')
+        themes = as_list(q.get('themes'))
+        tags = as_list(q.get('tags'))
+        self.questions[uid] = {
+            'file': yaml_path,
+            'line': line,
+            'level': level,
+            'discipline': discipline,
+            'themes': themes,
+            'tags': tags,
+        }
+        self.disciplines.setdefault(_key(level, discipline), []).append(uid)
+        level_tree = self.taxonomy.get(level, {}).get(discipline, {})
+        for theme in themes:
+            self.themes.setdefault(_key(level, discipline, theme), []).append(uid)
+            theme_tags = set(level_tree.get(theme, []))
+            for tag in tags:
+                # Only index the theme(s) that actually provide the tag
+                if tag in theme_tags:
+                    self.tags.setdefault(_key(level, discipline, theme, tag), []).append(uid)
+
+    def to_dict(self):
+        return {
+            'version': USAGE_INDEX_VERSION,
+            'taxonomy': self.taxonomy,
+            'questions': self.questions,
+            'disciplines': self.disciplines,
+            'themes': self.themes,
+            'tags': self.tags,
+        }
+
+
+def usage_index_path(questions_dir):
+    return os.path.join(questions_dir, USAGE_INDEX_RELPATH)
+
+
+def write_usage_index(questions_dir, builder):
+    path = usage_index_path(questions_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(builder.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+    return path
+
+
+def load_usage_index(questions_dir):
+    path = usage_index_path(questions_dir)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != USAGE_INDEX_VERSION:
+        return None
+    return data
+
+
+def _entries(tree):
+    """Flatten {disc: {theme: tags}} into sets of discipline / theme / tag keys."""
+    discs, themes, tags = set(), set(), set()
+    for disc, theme_tree in tree.items():
+        discs.add((disc,))
+        for theme, theme_tags in theme_tree.items():
+            themes.add((disc, theme))
+            for tag in theme_tags:
+                tags.add((disc, theme, tag))
+    return discs, themes, tags
+
+
+def diff_taxonomy(index, new_taxonomy):
+    """Compare the taxonomy recorded in the usage index with a new Taxonomy.
+
+    Returns (removed, broken):
+      removed: list of (level, discipline, theme or None, tag or None) entries
+               that no longer exist;
+      broken:  list of (question info dict, uid, error message) for the questions
+               that would now fail validation, sorted by file and line.
+    Only the questions indexed under a removed entry are re-checked.
+    """
+    removed = []
+    candidates = set()
+    old_levels = index['taxonomy']
+    for level, old_tree in old_levels.items():
+        old_sets = _entries(old_tree)
+        new_sets = _entries(new_taxonomy.disciplines_dict(level))
+        for kind, old, new in zip(('disciplines', 'themes', 'tags'), old_sets, new_sets):
+            for entry in sorted(old - new):
+                padded = entry + (None,) * (3 - len(entry))
+                removed.append((level,) + padded)
+                candidates.update(index[kind].get(_key(level, *entry), []))
+
+    broken = []
+    for uid in candidates:
+        info = index['questions'][uid]
+        errors = taxonomy_errors(info['discipline'], info['themes'], info['tags'],
+                                 new_taxonomy.disciplines_dict(info['level']))
+        if errors:
+            broken.append((info, uid, errors[0]))
+    broken.sort(key=lambda b: (b[0]['file'], b[0]['line']))
+    return removed, broken
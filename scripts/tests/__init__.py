@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Same import path as the scripts themselves (they add scripts/ to sys.path)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,140 @@
+import importlib.util
+import json
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ..question_schema.loader import load_questions_with_positions
+from ..question_schema.validator import validate_question
+
+
+def load_script(name):
+    path = Path(__file__).resolve().parents[1] / f'{name}.py'
+    spec = importlib.util.spec_from_file_location(f'{name}_script', path)
+    if spec is None or spec.loader is None:
+        raise RuntimeError(f'Unable to load {name} module for testing')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+export_questions = load_script('export_questions')
+export_analytics = load_script('export_analytics')
+
+
+class FakeCursor:
+    """Named cursor returning canned rows (itersize / fetchmany like psycopg2)."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.itersize = None
+
+    def execute(self, query, params=None):
+        self.query = query
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self, name=None):
+        return FakeCursor(self.rows)
+
+
+def make_row(uid, grade_level='L1', discipline='Mathématiques', **overrides):
+    values = {
+        'uid': uid, 'author': 'demo', 'gradeLevel': grade_level, 'discipline': discipline,
+        'themes': ['Algèbre'], 'tags': ['démo'], 'title': f'Question {uid}',
+        'questionType': 'single_choice', 'timeLimit': 30, 'difficulty': 2, 'excludedFrom': [],
+        'text': 'Que vaut \\(1+1\\) ?\nDeux lignes : # pas un commentaire', 'answerOptions': ['1', '2'],
+        'correctAnswers': [False, True], 'correctAnswer': None, 'tolerance': None, 'unit': None,
+        'explanation': "C'est \\(2\\).",
+    }
+    values.update(overrides)
+    return tuple(values[field] for field in export_questions.ROW_FIELDS)
+
+
+class ExportQuestionsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_yaml_round_trip(self):
+        rows = [
+            make_row('choice-001'),
+            make_row('numeric-001', questionType='numeric', answerOptions=None, correctAnswers=None,
+                     correctAnswer=3.5, tolerance=0.1, unit='cm', excludedFrom=['tournament']),
+        ]
+        counts = export_questions.export_questions(FakeConnection(rows), str(self.out), batch_size=1)
+        self.assertEqual(list(counts.values()), [2])
+        data, positions = load_questions_with_positions(next(iter(counts)))
+        self.assertEqual(data, [export_questions.row_to_question(row) for row in rows])
+        self.assertEqual(len(positions), 2)
+        for q in data:
+            self.assertEqual(validate_question(q), ([], []))
+
+    def test_disciplines_differing_by_case_share_one_file(self):
+        rows = [make_row('a-001', discipline='Maths'), make_row('b-001', discipline='Physique'),
+                make_row('c-001', discipline='maths')]
+        counts = export_questions.export_questions(FakeConnection(rows), str(self.out))
+        path = export_questions.group_path(str(self.out), 'L1', 'maths', 'yaml')
+        self.assertEqual(counts[path], 2)
+        data, _ = load_questions_with_positions(path)
+        self.assertEqual([q['uid'] for q in data], ['a-001', 'c-001'])
+
+    def test_path_components_are_sanitized(self):
+        path = Path(export_questions.group_path(str(self.out), '..', 'SVT/Physique', 'jsonl'))
+        self.assertEqual(path.relative_to(self.out).parts,
+                         ('_sans-niveau', 'svt-physique', 'export-_sans-niveau-svt-physique.jsonl'))
+
+
+class IncrementalStateTests(unittest.TestCase):
+    T0 = datetime(2026, 3, 1, 12, 0, 0, 123000)
+
+    def test_query_reads_the_overlap_window_again(self):
+        query = export_analytics.build_query(export_analytics.TABLES['questions'])
+        self.assertIn('updated_at >= %(since)s::timestamp', query)
+        self.assertIn("date_trunc('milliseconds', updated_at) AS _watermark", query)
+
+    def test_rows_of_the_overlap_window_are_exported_once(self):
+        state = export_analytics.TableState(overlap=timedelta(minutes=10))
+        self.assertIsNone(state.since())
+        state.add(('a',), self.T0)
+        state.add(('b',), self.T0 + timedelta(minutes=5))
+        # Le run suivant relit 10 minutes avant le dernier watermark
+        saved = export_analytics.TableState(json.loads(json.dumps(state.to_json())), overlap=timedelta(minutes=10))
+        self.assertEqual(saved.since(), '2026-03-01T11:55:00.123')
+        self.assertFalse(saved.is_new(('a',), self.T0))
+        self.assertFalse(saved.is_new(('b',), self.T0 + timedelta(minutes=5)))
+        # Ligne validée en retard, avec un timestamp antérieur au watermark
+        self.assertTrue(saved.is_new(('c',), self.T0 + timedelta(minutes=1)))
+        # Ligne déjà exportée puis modifiée
+        self.assertTrue(saved.is_new(('a',), self.T0 + timedelta(minutes=6)))
+
+    def test_window_is_pruned_and_watermark_has_millisecond_precision(self):
+        state = export_analytics.TableState(overlap=timedelta(minutes=10))
+        state.add(('old',), self.T0)
+        state.add(('new',), self.T0 + timedelta(hours=1))
+        entry = state.to_json()
+        self.assertEqual(entry['watermark'], '2026-03-01T13:00:00.123')
+        self.assertEqual(entry['recent'], [[['new'], '2026-03-01T13:00:00.123']])
+
+    def test_watermark_only_state_is_still_read(self):
+        state = export_analytics.TableState('2026-03-01T12:00:00.123456', overlap=timedelta(0))
+        self.assertEqual(state.since(), '2026-03-01T12:00:00.123')
+        self.assertEqual(state.recent, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
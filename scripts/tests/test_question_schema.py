@@ -0,0 +1,115 @@
+import unittest
+
+from ..question_schema import segments, validator
+
+
+def make_question(**overrides):
+    question = {
+        'uid': 'demo-001',
+        'author': 'demo',
+        'gradeLevel': 'L2',
+        'discipline': 'Mathématiques',
+        'themes': ['Algèbre'],
+        'title': 'Démo',
+        'questionType': 'single_choice',
+        'timeLimit': 30,
+        'difficulty': 1,
+        'text': 'Quel est le résultat ?',
+        'answerOptions': ['A', 'B'],
+        'correctAnswers': [True, False],
+    }
+    question.update(overrides)
+    return question
+
+
+class ValidateQuestionTests(unittest.TestCase):
+    def test_valid_question_has_no_errors(self):
+        errors, warnings = validator.validate_question(make_question())
+        self.assertEqual(errors, [])
+        self.assertEqual(warnings, [])
+
+    def test_single_choice_requires_exactly_one_true(self):
+        errors, _ = validator.validate_question(make_question(correctAnswers=[True, True]))
+        self.assertEqual(len(errors), 1)
+        self.assertIn('exactement un booléen à True', errors[0])
+
+    def test_missing_fields_and_invalid_time_limit_are_reported_together(self):
+        q = make_question(timeLimit=0)
+        del q['author']
+        errors, _ = validator.validate_question(q)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("['author']", errors[0])
+        self.assertIn('timeLimit must be a positive integer', errors[0])
+
+    def test_excluded_from_is_checked_at_validation_time(self):
+        errors, _ = validator.validate_question(make_question(excludedFrom='duel'))
+        self.assertEqual(errors, ["excludedFrom contient des valeurs invalides ['duel'] (uid=demo-001)"])
+
+    def test_numeric_and_unknown_types(self):
+        numeric = make_question(questionType='numeric', correctAnswer='abc')
+        errors, _ = validator.validate_question(numeric)
+        self.assertEqual(errors, ['correctAnswer doit être un nombre (uid=demo-001)'])
+
+        errors, _ = validator.validate_question(make_question(questionType='essay'))
+        self.assertTrue(errors[0].startswith("Unknown questionType 'essay'"))
+
+    def test_missing_title_is_a_warning(self):
+        errors, warnings = validator.validate_question(make_question(title=''))
+        self.assertEqual(errors, [])
+        self.assertEqual(warnings, ['Question sans titre (uid=demo-001)'])
+
+    def test_validators_are_compiled_once(self):
+        self.assertIs(validator.get_validator('numeric'), validator.get_validator('numeric'))
+
+    def test_positive_int_rule_names_its_field(self):
+        fields = {'uid': {'required': True}, 'timeLimit': {'positiveInt': True}, 'points': {'positiveInt': True}}
+        check = validator.compile_validator('demo', fields)
+        errors, _ = check({'uid': 'demo-001', 'timeLimit': 30, 'points': -1})
+        self.assertEqual(errors, ["Question manquante ou incomplète (uid=demo-001) : champs manquants ou "
+                                  "timeLimit, points invalide :  (points must be a positive integer)"])
+
+    def test_non_string_question_type_is_an_unknown_type(self):
+        errors, _ = validator.validate_question(make_question(questionType=['single_choice']))
+        self.assertIn("Unknown questionType '['single_choice']'", errors[0])
+
+
+class SplitMathTests(unittest.TestCase):
+    def test_text_and_math_segments(self):
+        segs, errors = segments.split_math('Soit \\(x\\) et \\[y^2\\] fin')
+        self.assertEqual(errors, [])
+        self.assertEqual(segs, [
+            {'type': 'text', 'value': 'Soit '},
+            {'type': 'math', 'display': False, 'value': 'x'},
+            {'type': 'text', 'value': ' et '},
+            {'type': 'math', 'display': True, 'value': 'y^2'},
+            {'type': 'text', 'value': ' fin'},
+        ])
+        self.assertEqual(segments.join_segments(segs), 'Soit \\(x\\) et \\[y^2\\] fin')
+
+    def test_unbalanced_delimiters_are_errors(self):
+        segs, errors = segments.split_math('a \\(x + 1')
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(segs, [{'type': 'text', 'value': 'a \\(x + 1'}])
+
+        _, errors = segments.split_math('\\(x\\]')
+        self.assertEqual(len(errors), 2)
+
+    def test_escaped_backslash_is_not_a_delimiter(self):
+        # \\ (saut de ligne) suivi de "(" : pas de formule
+        segs, errors = segments.split_math('a \\\\(b) c')
+        self.assertEqual(errors, [])
+        self.assertEqual(segs, [{'type': 'text', 'value': 'a \\\\(b) c'}])
+        # Trois backslashs : saut de ligne puis ouverture
+        segs, errors = segments.split_math('a \\\\\\(x\\)')
+        self.assertEqual(errors, [])
+        self.assertEqual(segs, [{'type': 'text', 'value': 'a \\\\'},
+                                {'type': 'math', 'display': False, 'value': 'x'}])
+
+    def test_validation_flags_unbalanced_answer_option(self):
+        errors, _ = validator.validate_question(make_question(answerOptions=['\\(a', 'B']))
+        self.assertEqual(len(errors), 1)
+        self.assertIn('answerOptions[0]', errors[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+
+from ..taxonomy import artifact, lookup, usage
+
+CP_YAML = """niveau: "CP"
+disciplines:
+  - nom: "Mathématiques"
+    themes:
+      - nom: "Calcul"
+        tags: ["additions simples", "compléments à 10"]
+      - nom: "Géométrie"
+        tags: ["tracer des segments"]
+"""
+
+
+class TaxonomyDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.qdir = self.tmp.name
+        self.write('CP.yaml', CP_YAML)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        with open(os.path.join(self.qdir, name), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+class TaxonomyArtifactTests(TaxonomyDirTestCase):
+    def test_lookup_and_reverse_maps(self):
+        taxonomy = artifact.load_taxonomy(self.qdir)
+        self.assertEqual(taxonomy.levels(), ['CP'])
+        self.assertEqual(
+            taxonomy.disciplines_dict('CP'),
+            {'Mathématiques': {'Calcul': {'additions simples', 'compléments à 10'}, 'Géométrie': {'tracer des segments'}}},
+        )
+        self.assertEqual(taxonomy.tag_usages('compléments à 10'), [('CP', 'Mathématiques', 'Calcul')])
+        self.assertEqual(taxonomy.disciplines_dict('L2'), {})
+
+    def test_artifact_is_reused_until_sources_change(self):
+        first = artifact.load_taxonomy(self.qdir)
+        self.assertIsNotNone(artifact.load_taxonomy(self.qdir, rebuild=False))
+
+        self.write('CE1.yaml', 'disciplines: "pas une liste"\n')
+        self.assertIsNone(artifact.load_taxonomy(self.qdir, rebuild=False))
+        second = artifact.load_taxonomy(self.qdir)
+        self.assertNotEqual(first.source_hash, second.source_hash)
+        self.assertIn('CE1', second.errors)
+        self.assertEqual(second.content_hash('CP'), first.content_hash('CP'))
+
+
+class TaxonomyDiffTests(TaxonomyDirTestCase):
+    def test_diff_reports_only_questions_using_removed_entries(self):
+        taxonomy = artifact.load_taxonomy(self.qdir)
+        builder = usage.UsageIndexBuilder()
+        builder.add_level('CP', taxonomy.disciplines_dict('CP'))
+        base = {'discipline': 'Mathématiques', 'themes': ['Calcul']}
+        builder.add('CP', {**base, 'uid': 'q1', 'tags': ['compléments à 10']}, 'a.yaml', 5)
+        builder.add('CP', {**base, 'uid': 'q2', 'tags': ['additions simples']}, 'a.yaml', 20)
+        builder.add('CP', {**base, 'uid': 'q3', 'themes': ['Géométrie']}, 'b.yaml', 3)
+        usage.write_usage_index(self.qdir, builder)
+
+        self.write('CP.yaml', CP_YAML.replace('compléments à 10', 'compléments à dix'))
+        removed, broken = usage.diff_taxonomy(usage.load_usage_index(self.qdir), artifact.load_taxonomy(self.qdir))
+
+        self.assertEqual(removed, [('CP', 'Mathématiques', 'Calcul', 'compléments à 10')])
+        self.assertEqual([(uid, info['line']) for info, uid, _ in broken], [('q1', 5)])
+
+    def test_keys_do_not_collide_on_separators(self):
+        self.assertNotEqual(usage._key('CP', 'a|b', 'c'), usage._key('CP', 'a', 'b|c'))
+        self.assertNotEqual(usage._key('CP', None), usage._key('CP', 'None'))
+
+
+class NameLookupTests(TaxonomyDirTestCase):
+    def test_normalized_resolution_and_suggestions(self):
+        self.assertEqual(lookup.normalize_name('  Compléments   À 10 '), 'complements a 10')
+        level = artifact.load_taxonomy(self.qdir).lookup('CP')
+        discipline, themes, tags, fixes = level.canonicalize(
+            'mathematiques', ['géométrie'], ['Tracer  des segments'])
+        self.assertEqual((discipline, themes, tags), ('Mathématiques', ['Géométrie'], ['tracer des segments']))
+        self.assertEqual(len(fixes), 3)
+
+        index = level.tags('Mathématiques', ['Calcul'])
+        self.assertIsNone(index.resolve('complement a 10'))
+        self.assertEqual(index.suggest('complement a 10', k=1), ['compléments à 10'])
+        errors = usage.taxonomy_errors('Mathématiques', ['Calcul'], ['complement a 10'],
+                                       level.tree, level)
+        self.assertIn("vouliez-vous dire 'compléments à 10'", errors[0])
+
+    def test_non_string_names_do_not_crash(self):
+        level = artifact.load_taxonomy(self.qdir).lookup('CP')
+        self.assertEqual(level.tags('Mathématiques', 'Calcul').names, level.tags('Mathématiques', ['Calcul']).names)
+        themes = ['Calcul', 3, ['Géométrie'], {'nom': 'x'}]
+        discipline, fixed, tags, fixes = level.canonicalize('Mathématiques', themes, [None, ['tag']])
+        self.assertEqual((fixed, fixes), (themes, []))
+        errors = usage.taxonomy_errors('Mathématiques', themes, tags, level.tree, level)
+        self.assertIn("Thème '3' inconnu", errors[0])
+        self.assertIn("Discipline '['Mathématiques']' inconnue",
+                      usage.taxonomy_errors(['Mathématiques'], [], [], level.tree, level)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,20 @@
 import importlib.util
+import json
 import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+import unittest.mock
 from unittest.mock import patch
 
-from ..yaml2latex import latex
+from ..yaml2latex import bench_sanitize, latex, utils
+from ..yaml2latex.manifest import BuildManifest
+from ..yaml2latex.fragments import FragmentCache
+from ..yaml2latex import bench, compiler, diagnose, fmt, mathlint, thumbnails, timing, toolchain, watch
 
 MODULE_PATH = Path(__file__).resolve().parents[1] / 'yaml2latex.py'
 SPEC = importlib.util.spec_from_file_location('yaml2latex_script', MODULE_PATH)
@@ -13,6 +23,39 @@ if SPEC is None or SPEC.loader is None:
 yaml2latex = importlib.util.module_from_spec(SPEC)
 SPEC.loader.exec_module(yaml2latex)
 
+FAKE_TOOLCHAIN = {'version': toolchain.TOOLCHAIN_VERSION, 'engines': {}, 'emoji_font_available': False,
+                  'emoji_font_file': None, 'mylatexformat': None, 'tools': {}}
+# Le script charge son propre exemplaire des modules yaml2latex (import absolu)
+TOOLCHAIN_MODULES = [toolchain, sys.modules['yaml2latex.toolchain']]
+
+
+class Yaml2LatexTestCase(unittest.TestCase):
+    """Temporary directory, private cache home and fixed toolchain probe.
+
+    No which / fc-list / --version is run and nothing is written to the real
+    ~/.cache. fake_compile stands for compile_latex: it records the compiled
+    sources in self.compiled and writes a dummy pdf.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        cache_home = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_home.cleanup)
+        patches = [patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home.name})]
+        patches += [patch.object(module, '_toolchain', dict(FAKE_TOOLCHAIN)) for module in TOOLCHAIN_MODULES]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.base = Path(self.tmp.name)
+        self.compiled = []
+
+    def fake_compile(self, tex_path, **kwargs):
+        tex_path = Path(tex_path)
+        self.compiled.append((tex_path.name, tex_path.read_text(encoding='utf-8')))
+        tex_path.with_suffix('.pdf').write_bytes(b'%PDF')
+        return True
+
 
 class ToFileUriTests(unittest.TestCase):
     def test_wsl_uri_conversion(self):
@@ -41,7 +84,7 @@ class ToFileUriTests(unittest.TestCase):
         self.assertTrue(uri.endswith('demo.yaml'))
 
 
-class LatexQuestionLinkTests(unittest.TestCase):
+class LatexQuestionLinkTests(Yaml2LatexTestCase):
     def test_uid_hyperlink_uses_file_uri(self):
         question = {
             'uid': 'demo-question-001',
@@ -63,5 +106,520 @@ class LatexQuestionLinkTests(unittest.TestCase):
         self.assertIn('(ligne 37)', rendered)
 
 
+
+QUESTION_YAML = """- uid: demo-001
+  questionType: numeric
+  title: Démo
+  text: "Combien font \\\\(2+2\\\\) ?"
+  correctAnswer: 4
+"""
+
+
+class RendererVersionTests(unittest.TestCase):
+    def test_version_follows_renderer_sources(self):
+        self.assertEqual(latex.RENDERER_VERSION, latex.renderer_version())
+        with patch.object(latex, 'RENDERER_SOURCES', ('latex.py',)):
+            self.assertNotEqual(latex.renderer_version(), latex.RENDERER_VERSION)
+
+
+class SinglePassSanitizeTests(unittest.TestCase):
+    SAMPLES = [
+        'a_b 50% & #1 $x$ {y} ^ ~ \\_ok',
+        'Calcule \\(x_1^2\\) puis \\[\\frac{a}{b}\\] _fin',
+        'ouvert \\( a_b sans fin',
+        '\\) fermant seul \\( a \\] b \\) c_d',
+        '😀 \\(x_1 😀 y\\) ☀_',
+        '',
+    ]
+    # Différences voulues avec la version d'origine (entrée, sortie attendue de sanitize_latex_smart) :
+    # - un fermant de l'autre type ne termine pas le bloc math
+    # - un délimiteur précédé d'un \\\\ échappé n'en est pas un (changé par user-029)
+    INTENDED_DIFFERENCES = [
+        ('\\( a \\] b_c \\)', '\\( a \\] b_c \\)'),
+        ('ligne\\\\(a_b) puis \\\\\\(x_1\\) fin_', 'ligne\\\\(a\\_b) puis \\\\\\(x_1\\) fin\\_'),
+    ]
+
+    def test_same_output_as_previous_implementation(self):
+        for name, legacy, new in bench_sanitize.PAIRS:
+            for sample in self.SAMPLES:
+                with self.subTest(name=name, sample=sample):
+                    self.assertEqual(new(sample), legacy(sample))
+
+    def test_intended_differences_with_previous_implementation(self):
+        for sample, expected in self.INTENDED_DIFFERENCES:
+            with self.subTest(sample=sample):
+                self.assertEqual(utils.sanitize_latex_smart(sample), expected)
+                self.assertNotEqual(bench_sanitize.legacy_sanitize_latex_smart(sample), expected)
+
+    def test_math_kept_and_emoji_replaced(self):
+        self.assertEqual(utils.sanitize_preserve_emoji('a_b \\(c_d\\) 😀'), 'a\\_b \\(c_d\\) [emoji]')
+        self.assertEqual(utils.sanitize_latex_smart('\\\\(c_d)'), '\\\\(c\\_d)')
+
+class IncrementalBuildTests(Yaml2LatexTestCase):
+    def setUp(self):
+        super().setUp()
+        self.folder = self.base / 'CP' / 'demo'
+        self.folder.mkdir(parents=True)
+        (self.folder / 'q.yaml').write_text(QUESTION_YAML, encoding='utf-8')
+
+    def build(self):
+        manifest = BuildManifest(self.base)
+        result = yaml2latex.build_folder(self.folder, self.base, manifest)
+        manifest.save()
+        return result
+
+    def test_unchanged_folder_is_skipped(self):
+        with patch.object(yaml2latex, 'compile_latex', side_effect=self.fake_compile) as compile_mock:
+            self.assertEqual(self.build(), 'compiled')
+            self.assertEqual(self.build(), 'skipped')
+            (self.folder / 'q.yaml').write_text(QUESTION_YAML.replace('Démo', 'Démo 2'), encoding='utf-8')
+            self.assertEqual(self.build(), 'compiled')
+            (self.folder / 'demo.pdf').unlink()
+            self.assertEqual(self.build(), 'compiled')
+        self.assertEqual(compile_mock.call_count, 3)
+
+    def test_isolated_build_uses_private_dir_and_captures_log(self):
+        seen = []
+
+        def fake_compile(tex_path, build_dir=None, log=print, **kwargs):
+            seen.append(build_dir)
+            log('[yaml2latex] fake engine')
+            return self.fake_compile(tex_path)
+
+        with patch.object(yaml2latex, 'compile_latex', side_effect=fake_compile):
+            status, lines = yaml2latex.build_folder_isolated(
+                self.folder, self.base, BuildManifest(self.base), self.tmp.name)
+        self.assertEqual(status, 'compiled')
+        self.assertIn('[yaml2latex] fake engine', lines)
+        self.assertTrue(seen[0].startswith(os.path.join(self.tmp.name, 'yaml2latex-')))
+        self.assertFalse(os.path.exists(seen[0]))
+
+
+    def test_source_lines_come_from_the_yaml_parser(self):
+        # 'demo-001' is a substring of 'demo-0010': line lookup must not be fooled
+        (self.folder / 'q.yaml').write_text(
+            QUESTION_YAML.replace('demo-001', 'demo-0010') + '\n' + QUESTION_YAML, encoding='utf-8')
+        tex = yaml2latex.render_folder(self.folder, ['q.yaml'], '')
+        self.assertIn('{demo-0010} - Démo} (ligne 1)', tex)
+        self.assertIn('{demo-001} - Démo} (ligne 7)', tex)
+
+    def test_fragments_are_reused_across_documents(self):
+        cache = FragmentCache(self.base)
+        first = yaml2latex.render_folder(self.folder, ['q.yaml'], '', fragments=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        with patch.object(cache, 'render', side_effect=AssertionError('rendered twice')):
+            second = yaml2latex.render_folder(self.folder, ['q.yaml'], '', fragments=cache)
+        self.assertEqual(first, second)
+        self.assertEqual(first, yaml2latex.render_folder(self.folder, ['q.yaml'], ''))
+        self.assertEqual(cache.hits, 1)
+
+    def test_fragments_survive_lines_inserted_above(self):
+        cache = FragmentCache(self.base)
+        yaml2latex.render_folder(self.folder, ['q.yaml'], '', fragments=cache)
+        (self.folder / 'q.yaml').write_text('# commentaire\n\n' + QUESTION_YAML, encoding='utf-8')
+        with patch.object(cache, 'render', side_effect=AssertionError('rendered again')):
+            moved = yaml2latex.render_folder(self.folder, ['q.yaml'], '', fragments=cache)
+        self.assertIn('{demo-001} - Démo} (ligne 3)', moved)
+        self.assertEqual(moved, yaml2latex.render_folder(self.folder, ['q.yaml'], ''))
+
+    def test_html_preview_without_tex_engine(self):
+        (self.folder / 'q.yaml').write_text(QUESTION_YAML + """- uid: demo-002
+  questionType: single_choice
+  title: Choix <b>
+  text: "x & y"
+  answerOptions: ["\\\\(a<b\\\\)", "non"]
+  correctAnswers: [true, false]
+  excludedFrom: [tournament]
+""", encoding='utf-8')
+        with patch.object(yaml2latex, 'compile_latex', side_effect=AssertionError('no TeX')):
+            out = yaml2latex.build_folder_html(self.folder, self.base)
+        page = out.read_text(encoding='utf-8')
+        self.assertEqual(out, self.folder / 'demo.html')
+        self.assertIn('<title>CP - demo</title>', page)
+        self.assertIn('Combien font \\(2+2\\) ?', page)
+        self.assertIn('demo-002</a> - Choix &lt;b&gt;</strong>', page)
+        self.assertIn('x &amp; y', page)
+        self.assertIn('<li class="correct">✓ \\(a&lt;b\\)</li>', page)
+        self.assertIn('<li class="wrong">✗ non</li>', page)
+        self.assertIn('⛔ tournoi', page)
+
+class WatchModeTests(Yaml2LatexTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ('a', 'b'):
+            (self.base / 'CP' / name).mkdir(parents=True)
+            (self.base / 'CP' / name / 'q.yaml').write_text(QUESTION_YAML, encoding='utf-8')
+
+    def test_changed_folders(self):
+        before = watch.scan(self.base)
+        (self.base / 'CP' / 'b' / 'q.yaml').write_text(QUESTION_YAML + '\n', encoding='utf-8')
+        (self.base / 'CP' / 'c').mkdir()
+        (self.base / 'CP' / 'c' / 'new.yaml').write_text(QUESTION_YAML, encoding='utf-8')
+        (self.base / 'CP' / 'a' / 'q.yaml').unlink()
+        self.assertEqual(watch.changed_folders(before, watch.scan(self.base)),
+                         [self.base / 'CP' / 'b', self.base / 'CP' / 'c'])
+
+    def test_only_the_edited_folder_is_rebuilt(self):
+        stop = threading.Event()
+        rebuilt = []
+
+        def rebuild(folder):
+            rebuilt.append(folder)
+            stop.set()
+            return folder / 'out.pdf'
+
+        thread = threading.Thread(target=watch.watch, args=(self.base, self.base, rebuild),
+                                  kwargs={'interval': 0.02, 'debounce': 0.02, 'log': lambda m: None, 'stop': stop})
+        thread.start()
+        time.sleep(0.1)
+        (self.base / 'CP' / 'a' / 'q.yaml').write_text(QUESTION_YAML.replace('Démo', 'Démo 2'), encoding='utf-8')
+        thread.join(5)
+        stop.set()
+        self.assertEqual(rebuilt, [self.base / 'CP' / 'a'])
+        stamp = (self.base / watch.STAMP_RELPATH).read_text(encoding='utf-8')
+        self.assertEqual(stamp, f"{self.base / 'CP' / 'a' / 'out.pdf'}\n")
+
+
+class BookTests(Yaml2LatexTestCase):
+    def setUp(self):
+        super().setUp()
+        self.level = self.base / 'CP'
+        for name in ('algèbre', 'géométrie'):
+            (self.level / name).mkdir(parents=True)
+            (self.level / name / 'q.yaml').write_text(QUESTION_YAML.replace('demo-001', f'demo-{name}'), encoding='utf-8')
+
+    def build(self, partial=False):
+        with patch.object(yaml2latex, 'compile_latex', side_effect=self.fake_compile):
+            return yaml2latex.build_book(self.level, self.base, partial=partial, log=lambda m: None)
+
+    def test_full_then_partial_rebuild(self):
+        self.assertEqual(self.build(), self.level / 'CP.pdf')
+        name, source = self.compiled[-1]
+        self.assertEqual(name, 'CP.tex')
+        self.assertIn('\\tableofcontents', source)
+        self.assertIn('\\include{chapitres/algebre}\n\\include{chapitres/geometrie}', source)
+        self.assertNotIn('\\includeonly', source)
+        self.assertEqual(self.build(), self.level / 'CP.pdf')
+        self.assertEqual(len(self.compiled), 1)
+
+        (self.level / 'géométrie' / 'q.yaml').write_text(QUESTION_YAML.replace('Démo', 'Démo 2'), encoding='utf-8')
+        self.assertEqual(self.build(partial=True), self.level / 'CP-partiel.pdf')
+        name, source = self.compiled[-1]
+        self.assertEqual(name, 'CP-partiel.tex')
+        self.assertIn('\\includeonly{chapitres/geometrie}', source)
+        self.assertIn('\\include{chapitres/algebre}', source)
+        # Le livre complet n'a pas encore la modification
+        self.build()
+        self.assertEqual(self.compiled[-1][0], 'CP.tex')
+        self.assertEqual(len(self.compiled), 3)
+
+
+class ThumbnailTests(Yaml2LatexTestCase):
+    def setUp(self):
+        super().setUp()
+        self.out = self.base / 'vignettes'
+
+    def runs(self):
+        """Questions per engine run."""
+        return [source.count('\\begin{preview}') for _, source in self.compiled]
+
+    def fake_split(self, pdf_path, fmt, log=print):
+        pages = []
+        for i in range(1, self.runs()[-1] + 1):
+            page = Path(pdf_path).with_name(f'page-{i:02d}.{fmt}')
+            page.write_text(str(i))
+            pages.append(page)
+        return pages
+
+    def update(self, questions):
+        store = thumbnails.ThumbnailStore(self.out)
+        with patch.object(thumbnails, 'compile_latex', side_effect=self.fake_compile), \
+                patch.object(thumbnails, 'split_pages', side_effect=self.fake_split):
+            result = store.update(questions, self.tmp.name, log=lambda m: None)
+        store.save()
+        return result
+
+    def question(self, uid, title, line):
+        return {'uid': uid, 'questionType': 'numeric', 'title': title, 'text': '\\(x\\)', '_line_number': line}
+
+    def test_one_batch_then_cache_by_content(self):
+        self.assertEqual(self.update([self.question('a', 'A', 1), self.question('b', 'B', 9)]), (2, 0, 0))
+        self.assertEqual(self.runs(), [2])
+        # Déplacer une question dans son fichier ne change pas sa vignette
+        self.assertEqual(self.update([self.question('a', 'A', 5), self.question('b', 'B 2', 9)]), (1, 1, 0))
+        self.assertEqual(self.runs(), [2, 1])
+        index = json.loads((self.out / 'index.json').read_text(encoding='utf-8'))
+        self.assertEqual(sorted(index), ['a', 'b'])
+        self.assertEqual(len({index['a'], index['b']}), 2)
+        self.assertTrue(all((self.out / name).is_file() for name in index.values()))
+
+
+class MathLintTests(Yaml2LatexTestCase):
+    def test_valid_formulas_pass(self):
+        q = {'text': 'Soit \\(f \\colon \\mathbb{R} \\to \\mathbb{R}\\) et \\[\\left( \\frac{1}{2} \\right)^{n} \\begin{pmatrix} 1 \\\\ 0 \\end{pmatrix}\\]',
+             'answerOptions': ['\\(x_{n+1}\\)', '50 % & {texte}']}
+        self.assertEqual(mathlint.lint_question(q), [])
+
+    def test_problems_are_reported_per_field(self):
+        q = {'text': '\\(\\frac{1}{2\\) puis \\(\\left( x\\)', 'explanation': '\\(\\mathscr{F}\\)',
+             'answerOptions': ['\\(a\\)', '\\(\\begin{pmatrix} 1 \\end{bmatrix}\\)', '\\(x']}
+        self.assertEqual(mathlint.lint_question(q), [
+            "text : 1 accolade(s) non fermée(s)",
+            "text : \\left sans \\right",
+            "explanation : macro inconnue \\mathscr",
+            "answerOptions[1] : \\end{bmatrix} sans \\begin{bmatrix} correspondant",
+            "answerOptions[2] : bloc math ouvert en position 0 jamais fermé",
+        ])
+
+    def test_broken_formula_skips_the_engine(self):
+        folder = self.base / 'CP' / 'demo'
+        folder.mkdir(parents=True)
+        (folder / 'q.yaml').write_text(QUESTION_YAML.replace('2+2', '\\\\frac{2}{2'), encoding='utf-8')
+        lines = []
+        with patch.object(yaml2latex, 'compile_latex', side_effect=AssertionError('engine started')):
+            status = yaml2latex.build_folder(folder, self.base, BuildManifest(self.base), log=lines.append)
+        self.assertEqual(status, 'failed')
+        self.assertIn(f"[yaml2latex] {folder / 'q.yaml'}:1: uid=demo-001 : text : 1 accolade(s) non fermée(s)", lines)
+
+
+class ErrorLocationTests(Yaml2LatexTestCase):
+    def test_errors_are_mapped_to_questions(self):
+        source_map = diagnose.SourceMap()
+        source_map.add('\\documentclass{article}\n\\begin{document}\n')
+        source_map.add('a\nb\nc\n', {'uid': 'q1', '_source_file': 'f.yaml', '_line_number': 1})
+        source_map.add('d\ne\n', {'uid': 'q2', '_source_file': 'f.yaml', '_line_number': 9})
+        output = "./doc.tex:6: Undefined control sequence.\n./other.tex:1: Ignored\n"
+        self.assertEqual(diagnose.parse_errors(output, 'doc.tex'), [(6, 'Undefined control sequence.')])
+        lines, located = diagnose.explain_failure(output, source_map, 'doc.tex')
+        self.assertTrue(located)
+        self.assertEqual(lines, ['[yaml2latex] f.yaml:9: uid=q2 : Undefined control sequence. (ligne 6 du .tex)'])
+        # Format sans -file-line-error, et erreur sans ligne utilisable
+        self.assertEqual(diagnose.parse_errors("! Missing $ inserted.\n<inserted text>\nl.4 a", 'doc.tex'),
+                         [(4, 'Missing $ inserted.')])
+        lines, located = diagnose.explain_failure("! Emergency stop.\n", source_map, 'doc.tex')
+        self.assertFalse(located)
+
+    def test_bisect_finds_single_and_combined_culprits(self):
+        calls = []
+
+        def fails(group):
+            calls.append(group)
+            return 3 in group or 7 in group
+
+        self.assertEqual(diagnose.bisect_failures(list(range(10)), fails), [[3], [7]])
+        self.assertEqual(diagnose.bisect_failures(list(range(64, 128)), fails), [])
+        calls.clear()
+        self.assertEqual(diagnose.bisect_failures(list(range(64)), lambda g: calls.append(g) or 42 in g), [[42]])
+        self.assertEqual(len(calls), 1 + 2 * 6)
+        self.assertEqual(diagnose.bisect_failures(list(range(4)), lambda g: {1, 2} <= set(g)), [[0, 1, 2, 3]])
+        self.assertEqual(diagnose.bisect_failures(list(range(4)), lambda g: False), [])
+
+    def test_failed_build_names_the_question(self):
+        def fake_compile(tex_path, log=print, diagnose=None, **kwargs):
+            tex_lines = tex_path.read_text(encoding='utf-8').splitlines()
+            line = next(i for i, l in enumerate(tex_lines, 1) if 'demo-002' in l)
+            for message in diagnose(f"./{tex_path.name}:{line}: Undefined control sequence.\n"):
+                log(message)
+            return False
+
+        folder = self.base / 'CP' / 'demo'
+        folder.mkdir(parents=True)
+        (folder / 'q.yaml').write_text(QUESTION_YAML + '\n' + QUESTION_YAML.replace('demo-001', 'demo-002'), encoding='utf-8')
+        lines = []
+        with patch.object(yaml2latex, 'compile_latex', side_effect=fake_compile):
+            status = yaml2latex.build_folder(folder, self.base, BuildManifest(self.base), log=lines.append)
+        self.assertTrue((BuildManifest(self.base).aux_dir(folder) / 'demo.map.json').is_file())
+        self.assertEqual(status, 'failed')
+        self.assertTrue(any(l.startswith(f"[yaml2latex] {folder / 'q.yaml'}:7: uid=demo-002 : Undefined control sequence.")
+                            for l in lines), lines)
+
+
+class TimingTests(Yaml2LatexTestCase):
+    def test_stages_and_subprocesses_are_recorded_per_folder(self):
+        timings = timing.Timings()
+        original = subprocess.Popen
+        with timings.stage('load'):
+            pass  # disabled: nothing recorded
+        timings.enable()
+        try:
+            with timings.folder('CP/a'), timings.stage('compile'):
+                subprocess.run([sys.executable, '-c', 'pass'], check=True)
+                subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        finally:
+            timings.disable()
+        self.assertIs(subprocess.Popen, original)
+        report = timings.report()
+        program = os.path.basename(sys.executable)
+        self.assertEqual(list(report['folders']), ['CP/a'])
+        self.assertEqual(report['folders']['CP/a']['subprocesses'], {program: 2})
+        self.assertEqual(report['totals']['stages']['compile']['calls'], 1)
+        self.assertNotIn('load', report['totals']['stages'])
+
+    def test_tex_only_build_of_a_generated_corpus(self):
+        folders = bench.generate_corpus(self.base, 45)
+        self.assertEqual(len(folders), 1)
+        self.assertEqual(len(list(folders[0].glob('*.yaml'))), 3)
+        TIMINGS = yaml2latex.TIMINGS
+        TIMINGS.reset()
+        TIMINGS.enable()
+        try:
+            results = yaml2latex.build_folders(folders, self.base, BuildManifest(self.base), log=lambda m: None, compile=False)
+        finally:
+            TIMINGS.disable()
+        self.assertEqual(results['written'], 1)
+        self.assertTrue((folders[0] / 'dossier-00.tex').is_file())
+        stages = TIMINGS.report()['folders'][str(folders[0])]['stages']
+        self.assertEqual(stages['load']['calls'], 3)
+        self.assertEqual(stages['render']['calls'], 45)
+        self.assertEqual(stages['write']['calls'], 1)
+        self.assertNotIn('compile', stages)
+
+    def test_regressions_against_a_baseline(self):
+        baseline = {'questions': 10, 'runs': {'froid': {'seconds': 1.0}, 'caches chauds': {'seconds': 0.5}}}
+        lines, regressed = bench.compare_runs({'questions': 10, 'runs': {'froid': {'seconds': 1.1}}}, baseline)
+        self.assertFalse(regressed)
+        lines, regressed = bench.compare_runs({'questions': 10, 'runs': {'caches chauds': {'seconds': 0.7}}}, baseline)
+        self.assertTrue(regressed)
+        self.assertIn('RÉGRESSION', lines[0])
+
+
+class ToolchainProbeTests(unittest.TestCase):
+    def test_probe_is_cached_on_disk_until_path_changes(self):
+        fake = {'version': toolchain.TOOLCHAIN_VERSION, 'engines': {}, 'emoji_font_available': False, 'emoji_font_file': None}
+        with tempfile.TemporaryDirectory() as cache_home, \
+                patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home, 'PATH': '/usr/bin'}), \
+                patch.object(toolchain, 'probe_toolchain', return_value=fake) as probe, \
+                patch.object(toolchain, '_toolchain', None):
+            toolchain.get_toolchain()
+            toolchain.get_toolchain()
+            toolchain._toolchain = None  # new process: read from the cache file
+            toolchain.get_toolchain()
+            self.assertEqual(probe.call_count, 1)
+
+            toolchain._toolchain = None
+            os.environ['PATH'] = '/usr/bin:/opt/texlive/bin'
+            toolchain.get_toolchain()
+            self.assertEqual(probe.call_count, 2)
+
+    def test_key_follows_engine_binaries_and_fontconfig_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'bin').mkdir()
+            engine = root / 'bin' / 'xelatex'
+            engine.write_text('#!/bin/sh\n')
+            engine.chmod(0o755)
+            with patch.dict(os.environ, {'XDG_CACHE_HOME': str(root / 'cache'), 'PATH': str(root / 'bin')}):
+                key = toolchain.environment_key()
+                self.assertEqual(toolchain.environment_key(), key)
+                # Mise à jour sur place : même chemin, autre binaire
+                engine.write_text('#!/bin/sh\n# 2026\n')
+                upgraded = toolchain.environment_key()
+                self.assertNotEqual(upgraded, key)
+                # fc-cache après l'ajout d'une police dans un sous-dossier
+                (root / 'cache' / 'fontconfig').mkdir(parents=True)
+                self.assertNotEqual(toolchain.environment_key(), upgraded)
+
+
+class PreambleFormatTests(Yaml2LatexTestCase):
+    def test_failed_dump_falls_back_and_is_not_retried(self):
+        fake = {'engines': {'xelatex': {'path': '/usr/bin/xelatex', 'version': 'XeTeX 3.14'}},
+                'mylatexformat': '/texmf/mylatexformat.ltx'}
+        failed_run = unittest.mock.Mock(returncode=1, stdout='! Cannot dump native fonts', stderr='')
+        preamble = latex.latex_preamble()
+        with tempfile.TemporaryDirectory() as cache_home, \
+                patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home}), \
+                patch.object(fmt, 'get_toolchain', return_value=fake), \
+                patch.object(fmt.subprocess, 'run', return_value=failed_run) as run:
+            self.assertIsNone(fmt.get_format('xelatex', preamble, log=lambda m: None))
+            self.assertIsNone(fmt.get_format('xelatex', preamble, log=lambda m: None))
+            self.assertEqual(run.call_count, 1)
+            self.assertIn('mylatexformat.ltx', run.call_args[0][0])
+
+    def compile_with_format(self, results):
+        tex = Path(self.tmp.name) / 'doc.tex'
+        tex.write_text('\\documentclass{article}')
+        fake = {'engines': {'xelatex': {'path': '/usr/bin/xelatex', 'version': ''}}, 'emoji_font_available': False}
+        runs = [unittest.mock.Mock(returncode=rc, stdout=out, stderr='') for rc, out in results]
+        with patch.object(compiler, 'get_toolchain', return_value=fake), \
+                patch.object(compiler, 'engine_path', side_effect=lambda e: fake['engines'].get(e, {}).get('path')), \
+                patch.object(compiler, 'get_format', return_value=(Path(self.tmp.name), 'fmt-demo')), \
+                patch.object(compiler, 'mark_failed') as mark_failed, \
+                patch.object(compiler.subprocess, 'run', side_effect=runs) as run:
+            compiler.compile_latex(tex, log=lambda m: None, preamble='preamble')
+        return run.call_count, mark_failed.call_count
+
+    def test_document_error_does_not_disable_the_format(self):
+        # Erreur localisée dans le document : pas de seconde compilation, format conservé
+        self.assertEqual(self.compile_with_format([(1, './doc.tex:12: Undefined control sequence.')]), (1, 0))
+
+    def test_format_disabled_only_when_plain_preamble_works(self):
+        self.assertEqual(self.compile_with_format([(1, '! Fatal format file error'), (0, '')]), (2, 1))
+        self.assertEqual(self.compile_with_format([(1, '! Fatal format file error'), (1, '! Emergency stop')]), (2, 0))
+
+    def test_mark_failed_keeps_the_format_file(self):
+        directory = Path(self.tmp.name)
+        (directory / 'fmt-demo.fmt').write_bytes(b'fmt')
+        fmt.mark_failed(directory, 'fmt-demo', 'boom')
+        self.assertTrue((directory / 'fmt-demo.fmt').is_file())
+        with patch.object(fmt, 'formats_dir', return_value=directory), \
+                patch.object(fmt, 'get_toolchain', return_value={'engines': {}, 'mylatexformat': '/texmf/mylatexformat.ltx'}), \
+                patch.object(fmt, 'format_name', return_value='fmt-demo'):
+            self.assertIsNone(fmt.get_format('xelatex', 'preamble'))
+
+    def test_no_format_without_mylatexformat(self):
+        with patch.object(fmt, 'get_toolchain', return_value={'engines': {}, 'mylatexformat': None}):
+            self.assertIsNone(fmt.get_format('xelatex', 'preamble'))
+
+
+FAKE_ENGINE = """#!/usr/bin/env python3
+import sys
+from pathlib import Path
+args = sys.argv[1:]
+tex = Path(args[-1])
+out = next((Path(a.split('=', 1)[1]) for a in args if a.startswith('-output-directory=')), tex.parent)
+with open(out / 'passes', 'a') as f:
+    f.write('x')
+(out / (tex.stem + '.aux')).write_text('\\\\relax\\n')
+(out / (tex.stem + '.out')).write_text('\\\\BOOKMARK [1][-]{section.1}{demo}{}\\n')
+(out / (tex.stem + '.log')).write_text('')
+(out / (tex.stem + '.pdf')).write_bytes(b'%PDF')
+"""
+
+
+class RerunDetectionTests(Yaml2LatexTestCase):
+    def setUp(self):
+        super().setUp()
+        root = self.base
+        self.bin = root / 'bin'
+        self.bin.mkdir()
+        engine = self.bin / 'xelatex'
+        engine.write_text(FAKE_ENGINE)
+        engine.chmod(0o755)
+        self.tex = root / 'doc' / 'doc.tex'
+        self.tex.parent.mkdir()
+        self.tex.write_text('\\documentclass{article}')
+        self.state = root / 'state'
+
+    def compile(self):
+        fake = {'engines': {'xelatex': {'path': str(self.bin / 'xelatex'), 'version': ''}}, 'emoji_font_available': False}
+        with patch.dict(os.environ, {'PATH': f"{self.bin}{os.pathsep}{os.environ.get('PATH', '')}"}), \
+                patch.object(compiler, 'get_toolchain', return_value=fake), \
+                patch.object(compiler, 'engine_path', side_effect=lambda e: fake['engines'].get(e, {}).get('path')):
+            ok = compiler.compile_latex(self.tex, log=lambda m: None, state_dir=self.state)
+        passes = (self.tex.parent / 'passes').read_text()
+        (self.tex.parent / 'passes').unlink()
+        compiler.clean_aux_files(self.tex.parent)
+        return ok, len(passes)
+
+    def test_second_pass_only_when_aux_files_change(self):
+        # Premier build : les signets (.out) n'existaient pas, il faut relancer
+        self.assertEqual(self.compile(), (True, 2))
+        # Build suivant : .aux / .out repris de state_dir et inchangés, une seule passe
+        self.assertEqual(self.compile(), (True, 1))
+
+    def test_log_can_request_a_rerun(self):
+        self.assertTrue(compiler.needs_rerun("LaTeX Warning: Label(s) may have changed. Rerun to get cross-references right.", {}, {}))
+        self.assertFalse(compiler.needs_rerun("Output written on doc.pdf", {'aux': None}, {'aux': None}))
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,28 +4,32 @@
 
 #!/usr/bin/env python3
 import os
+import json
+import time
 import shutil
-import yaml
+import tempfile
 from pathlib import Path
 import sys
 from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 sys.path.insert(0, str(Path(__file__).parent))
 
 from yaml2latex.utils import sanitize_latex
-from yaml2latex.latex import latex_header, latex_footer, latex_question
+from yaml2latex.latex import latex_header, latex_footer, latex_question, latex_preamble
 from yaml2latex.compiler import compile_latex, clean_aux_files
-
-def find_question_line_number(yaml_path, uid):
-    """Find the line number where a question with given uid starts in the YAML file."""
-    with open(yaml_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    for i, line in enumerate(lines, 1):  # 1-indexed
-        if f'uid: {uid}' in line or f"uid: '{uid}'" in line or f'uid: "{uid}"' in line:
-            return i
-    return 1  # fallback
-
+from yaml2latex.manifest import BuildManifest, folder_hash, write_if_changed
+from yaml2latex.fragments import FragmentCache
+from yaml2latex.watch import watch
+from yaml2latex.book import Book, chapter_name
+from yaml2latex.thumbnails import ThumbnailStore
+from yaml2latex.mathlint import lint_question, format_problem
+from yaml2latex.diagnose import SourceMap, explain_failure, bisect_failures
+from yaml2latex.timing import TIMINGS, TIMINGS_RELPATH, summary_lines
+from yaml2latex.bench import SCENARIOS, generate_corpus, edit_one_question, compare_runs
+from yaml2latex.html_preview import html_header, html_footer, html_section, html_question
+from question_schema.validator import validate_question
+from question_schema.loader import load_questions_with_positions
 
 def to_file_uri(source_file: Path) -> str:
     """Return a file:// URI accessible from Windows or local viewers."""
@@ -46,6 +50,320 @@ def remove_legacy_launchers(folder: Path):
     if legacy_dir.exists() and legacy_dir.is_dir():
         shutil.rmtree(legacy_dir)
 
+def target_dir(base_dir, dossier=None, sous_dossier=None):
+    target = base_dir
+    if dossier:
+        target = target / dossier
+        if sous_dossier:
+            target = target / sous_dossier
+    return target
+
+
+def find_folders(base_dir, dossier=None, sous_dossier=None):
+    """Folders (recursively) under base_dir[/dossier[/sous_dossier]] holding YAML files."""
+    target = target_dir(base_dir, dossier, sous_dossier)
+    return [Path(root) for root, dirs, files in os.walk(target) if any(f.endswith('.yaml') for f in files)]
+
+
+def load_folder(folder, yaml_files, log=print):
+    """Yield (yaml file name, questions) for each file, questions annotated with their source location."""
+    for yf in yaml_files:
+        yaml_path = folder / yf
+        with TIMINGS.stage('load'):
+            # Une seule lecture du YAML : la position de chaque question vient des marques du parseur
+            data, positions = load_questions_with_positions(yaml_path)
+            questions = data if isinstance(data, list) else [data]
+            for idx, q in enumerate(questions):
+                # Mêmes règles que import_questions.py : on signale sans bloquer le pdf
+                errors, _ = validate_question(q)
+                for err in errors:
+                    log(f"[yaml2latex] {yaml_path}: {err}")
+                # Add source location info
+                line_number, column = positions[idx] if idx < len(positions) else (1, 1)
+                q['_source_file'] = str(yaml_path)
+                q['_line_number'] = line_number
+                q['_column_number'] = column
+                q['_file_uri'] = to_file_uri(yaml_path)
+        yield yf, questions
+
+
+def render_questions(folder, yaml_files, log=print, fragments=None, section='section', problems=None, source_map=None):
+    """LaTeX of the questions of one folder, one \\section (or other sectioning command) per YAML file.
+
+    With a FragmentCache, unchanged questions are not rendered again.
+    With a problems list, the formula problems found by mathlint are appended to it.
+    With a SourceMap, the .tex lines of every question are recorded in it.
+    """
+    parts = []
+
+    def emit(text, q=None):
+        parts.append(source_map.add(text, q) if source_map is not None else text)
+
+    for yf, questions in load_folder(folder, yaml_files, log=log):
+        emit(f"\\{section}{{{sanitize_latex(os.path.splitext(yf)[0])}}}\n")
+        for q in questions:
+            if problems is not None:
+                with TIMINGS.stage('lint'):
+                    problems.extend(format_problem(q, p) for p in lint_question(q))
+            with TIMINGS.stage('render'):
+                emit(fragments.get(q) if fragments is not None else latex_question(q), q)
+    return ''.join(parts)
+
+
+def render_folder(folder, yaml_files, header, log=print, fragments=None, problems=None, source_map=None):
+    """Return the LaTeX source of one folder (header, one section per YAML file, footer)."""
+    if source_map is not None:
+        source_map.add(header)
+    body = render_questions(folder, yaml_files, log=log, fragments=fragments, problems=problems, source_map=source_map)
+    return header + body + latex_footer()
+
+
+def bisect_folder(tex, header, source_map, jobs=2, use_format=True, log=print):
+    """Compile halves of the questions of a failed document in isolation until the failing ones are found."""
+    lines = tex.splitlines(keepends=True)
+    fragment = {id(e): ''.join(lines[e['start'] - 1:e['end']]) for e in source_map.entries}
+
+    def fails(entries):
+        with tempfile.TemporaryDirectory(prefix='yaml2latex-bisect-') as tmp:
+            tex_path = Path(tmp) / 'bisect.tex'
+            tex_path.write_text(header + ''.join(fragment[id(e)] for e in entries) + latex_footer(), encoding='utf-8')
+            return not compile_latex(tex_path, log=lambda m: None, preamble=latex_preamble() if use_format else None)
+
+    log(f"[yaml2latex] Recherche des questions en cause parmi {len(source_map.entries)} (compilations isolées, {jobs} en parallèle)")
+    culprits = bisect_failures(source_map.entries, fails, jobs=jobs)
+    for group in culprits:
+        what = "fait échouer la compilation" if len(group) == 1 else f"fait échouer la compilation avec {len(group) - 1} autre(s) question(s)"
+        for e in group:
+            log(f"[yaml2latex] {e['file']}:{e['line']}: uid={e['uid']} : {what}")
+    if not culprits:
+        log("[yaml2latex] Aucune question n'échoue isolément : erreur dans l'en-tête ou l'environnement")
+    return culprits
+
+
+def report_problems(name, problems, log=print):
+    """Log the formula problems of a document; True when the compilation must be skipped."""
+    for problem in problems:
+        log(f"[yaml2latex] {problem}")
+    if problems:
+        log(f"[yaml2latex] {name}: {len(problems)} problème(s) dans les formules, compilation annulée (--no-lint pour compiler quand même)")
+    return bool(problems)
+
+
+def render_folder_html(folder, yaml_files, title, subtitle, log=print):
+    """Same document as render_folder, as a static HTML page (math typeset by MathJax)."""
+    parts = [html_header(title, subtitle)]
+    for yf, questions in load_folder(folder, yaml_files, log=log):
+        parts.append(html_section(os.path.splitext(yf)[0]))
+        parts.extend(html_question(q) for q in questions)
+    parts.append(html_footer())
+    return ''.join(parts)
+
+
+def build_folder(folder, base_dir, manifest, force=False, build_dir=None, log=print, use_format=True, fragments=None,
+                 lint=True, bisect=0, compile=True):
+    """Generate and compile one folder unless its inputs are unchanged.
+
+    build_dir: directory for the engine's aux / log files (see compile_latex).
+    use_format: compile with the precompiled preamble format when available.
+    fragments: FragmentCache used to assemble the .tex (see render_folder).
+    lint: check the formulas first (mathlint) and do not run the engine if one is broken.
+    bisect: when > 0 and the engine log does not name the failing question, isolate it
+    with that many compilations in parallel (see bisect_folder).
+    compile: False to only write the .tex (no engine).
+    Returns 'compiled', 'skipped' or 'failed'.
+    """
+    with TIMINGS.folder(folder):
+        return _build_folder(folder, base_dir, manifest, force, build_dir, log, use_format, fragments, lint, bisect, compile)
+
+
+def _build_folder(folder, base_dir, manifest, force, build_dir, log, use_format, fragments, lint, bisect, compile):
+    # Ordre stable des sections : le .tex (et son hash) ne dépend pas de l'ordre du système de fichiers
+    yaml_files = sorted(f for f in os.listdir(folder) if f.endswith('.yaml'))
+    remove_legacy_launchers(folder)
+    title = folder.name
+    subtitle = folder.parent.name if folder.parent != base_dir else ''
+    out_tex = folder / f'{title}.tex'
+    header = latex_header(title, subtitle)
+    digest = folder_hash([folder / yf for yf in yaml_files], header)
+    if not force and manifest.is_up_to_date(folder, digest, out_tex.with_suffix('.pdf')):
+        log(f"[yaml2latex] {folder}: inchangé, compilation ignorée")
+        return 'skipped'
+    problems = [] if lint else None
+    source_map = SourceMap()
+    tex = render_folder(folder, yaml_files, header, log=log, fragments=fragments, problems=problems, source_map=source_map)
+    with TIMINGS.stage('write'):
+        write_if_changed(out_tex, tex)
+    if problems and report_problems(folder, problems, log=log):
+        manifest.forget(folder)
+        return 'failed'
+    if not compile:
+        return 'written'
+    # Lignes du .tex -> uid / fichier / ligne YAML, pour les erreurs LaTeX
+    source_map.save(manifest.aux_dir(folder) / f'{title}.map.json')
+    located = []
+
+    def diagnose(output):
+        lines, ok = explain_failure(output, source_map, out_tex.name)
+        located.append(ok)
+        return lines
+
+    with TIMINGS.stage('compile'):
+        ok = compile_latex(out_tex, build_dir=build_dir, log=log, preamble=latex_preamble() if use_format else None,
+                           state_dir=manifest.aux_dir(folder), diagnose=diagnose)
+    if not ok and bisect and not any(located):
+        bisect_folder(tex, header, source_map, jobs=bisect, use_format=use_format, log=log)
+    with TIMINGS.stage('cleanup'):
+        clean_aux_files(folder)
+    if ok:
+        manifest.record(folder, digest)
+    else:
+        manifest.forget(folder)
+    return 'compiled' if ok else 'failed'
+
+
+def build_folder_html(folder, base_dir, log=print):
+    """Write <folder>/<folder name>.html next to the .tex; no TeX engine involved. Returns its path."""
+    yaml_files = sorted(f for f in os.listdir(folder) if f.endswith('.yaml'))
+    title = folder.name
+    subtitle = folder.parent.name if folder.parent != base_dir else ''
+    out_html = folder / f'{title}.html'
+    write_if_changed(out_html, render_folder_html(folder, yaml_files, title, subtitle, log=log))
+    return out_html
+
+
+def build_book(level_dir, base_dir, partial=False, force=False, log=print, use_format=True, fragments=None, lint=True):
+    """Generate and compile the master document of a level (see yaml2latex/book.py).
+
+    Every folder of the level becomes a chapter file (\\section for the folder,
+    \\subsection per YAML file). With partial, only the chapters changed since
+    the last build are typeset, into <level>-partiel.pdf.
+    Returns the path of the PDF next to the level folder, or None if the compilation failed.
+    """
+    book = Book(base_dir, level_dir.name)
+    problems = [] if lint else None
+    chapters = []
+    for folder in sorted(find_folders(level_dir)):
+        rel = folder.relative_to(level_dir)
+        yaml_files = sorted(f for f in os.listdir(folder) if f.endswith('.yaml'))
+        text = f"\\section{{{sanitize_latex(' / '.join(rel.parts) or level_dir.name)}}}\n"
+        text += render_questions(folder, yaml_files, log=log, fragments=fragments, section='subsection', problems=problems)
+        chapters.append((chapter_name(rel), text))
+    if problems and report_problems(f"Livre {level_dir.name}", problems, log=log):
+        return None
+    hashes = book.write_chapters(chapters)
+    kind, changed = book.plan(hashes, partial=partial, force=force)
+    if kind is None:
+        log(f"[yaml2latex] Livre {level_dir.name}: inchangé, compilation ignorée")
+        out_pdf = level_dir / (book.partial_tex if partial else book.main_tex).with_suffix('.pdf').name
+        return out_pdf if out_pdf.is_file() else None
+    if kind == 'partial':
+        tex_path = book.partial_tex
+        write_if_changed(tex_path, book.source(hashes, includeonly=changed))
+        log(f"[yaml2latex] Livre {level_dir.name}: {len(changed)}/{len(hashes)} chapitre(s) recomposé(s)")
+    else:
+        tex_path = book.main_tex
+        write_if_changed(tex_path, book.source(hashes))
+        log(f"[yaml2latex] Livre {level_dir.name}: {len(hashes)} chapitre(s)")
+    # Compilation sur place : les .aux des chapitres restent dans le dossier du livre
+    if not compile_latex(tex_path, log=log, preamble=latex_preamble() if use_format else None):
+        return None
+    book.record(kind, hashes)
+    out_pdf = level_dir / tex_path.with_suffix('.pdf').name
+    shutil.copy2(tex_path.with_suffix('.pdf'), out_pdf)
+    return out_pdf
+
+
+def build_folder_isolated(folder, base_dir, manifest, build_root, **options):
+    """build_folder in a private build directory, with its messages captured.
+
+    Returns (status, log lines). Used by the -j worker pool.
+    """
+    lines = []
+    with tempfile.TemporaryDirectory(prefix='yaml2latex-', dir=build_root) as build_dir:
+        try:
+            status = build_folder(folder, base_dir, manifest, build_dir=build_dir, log=lines.append, **options)
+        except Exception as e:
+            lines.append(f"[yaml2latex] {folder}: {e}")
+            status = 'failed'
+    return status, lines
+
+
+def build_folders(folders, base_dir, manifest, jobs=1, build_root=None, log=print, **options):
+    """Build every folder, -j style when jobs > 1 or build_root is given. Returns the count per status."""
+    results = {'compiled': 0, 'written': 0, 'skipped': 0, 'failed': 0}
+    if jobs > 1 or build_root:
+        # Un répertoire de build par job : les .aux/.log ne se mélangent jamais
+        logs = {}
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = {
+                pool.submit(build_folder_isolated, folder, base_dir, manifest, build_root, **options): folder
+                for folder in folders
+            }
+            for future in as_completed(futures):
+                status, logs[futures[future]] = future.result()
+                results[status] += 1
+                log(f"[yaml2latex] {futures[future]}: {status}")
+        for folder in folders:
+            if logs.get(folder):
+                log(f"\n===== {folder} =====")
+                log("\n".join(logs[folder]))
+    else:
+        for folder in folders:
+            results[build_folder(folder, base_dir, manifest, log=log, **options)] += 1
+    return results
+
+
+def run_benchmark(n_questions, jobs=1, compile=True, use_format=True, baseline=None, out=None, repeat=3):
+    """Build a generated corpus three times (see yaml2latex/bench.py) and report the stage timings.
+
+    The whole sequence is repeated on a fresh corpus and the fastest run of each
+    scenario is kept, to limit the noise. Returns the exit code: 1 when a
+    scenario is a regression against baseline.
+    """
+    runs = {}
+    for _ in range(max(1, repeat)):
+        with tempfile.TemporaryDirectory(prefix='yaml2latex-bench-') as tmp:
+            base = Path(tmp) / 'questions'
+            folders = sorted(generate_corpus(base, n_questions))
+            TIMINGS.enable()
+            try:
+                for scenario in SCENARIOS:
+                    if scenario == 'une question modifiée':
+                        edit_one_question(folders[0])
+                    TIMINGS.reset()
+                    manifest = BuildManifest(base)
+                    fragments = FragmentCache(base)
+                    start = time.perf_counter()
+                    results = build_folders(folders, base, manifest, jobs=jobs, log=lambda m: None, fragments=fragments,
+                                            use_format=use_format, compile=compile)
+                    elapsed = time.perf_counter() - start
+                    manifest.save()
+                    if scenario not in runs or elapsed < runs[scenario]['seconds']:
+                        runs[scenario] = dict(TIMINGS.report()['totals'], seconds=elapsed, results=results,
+                                              fragments={'hits': fragments.hits, 'misses': fragments.misses})
+            finally:
+                TIMINGS.disable()
+    print(f"[bench] {n_questions} question(s) dans {len(folders)} dossier(s), moteur LaTeX : {'oui' if compile else 'non'},"
+          f" meilleur de {max(1, repeat)} essai(s)")
+    for scenario, run in runs.items():
+        print(f"\n[bench] {scenario} : {run['seconds'] * 1e3:.1f} ms"
+              f" (fragments : {run['fragments']['hits']} repris, {run['fragments']['misses']} générés)")
+        for line in summary_lines(run):
+            print(f"[bench]   {line}")
+    result = {'questions': n_questions, 'folders': len(folders), 'compile': compile, 'jobs': jobs, 'runs': runs}
+    if out:
+        Path(out).parent.mkdir(parents=True, exist_ok=True)
+        Path(out).write_text(json.dumps(result, ensure_ascii=False, indent=1), encoding='utf-8')
+        print(f"\n[bench] Résultats écrits dans {out}")
+    if baseline:
+        lines, regressed = compare_runs(result, json.loads(Path(baseline).read_text(encoding='utf-8')))
+        print(f"\n[bench] Comparaison avec {baseline}")
+        for line in lines:
+            print(f"[bench]   {line}")
+        return 1 if regressed else 0
+    return 0
+
+
 def main():
 
     import argparse
@@ -54,50 +372,128 @@ def main():
     parser = argparse.ArgumentParser(description="Compile les fichiers YAML en LaTeX.")
     parser.add_argument('dossier', nargs='?', help='Nom du dossier à compiler (optionnel)')
     parser.add_argument('sous_dossier', nargs='?', help='Nom du sous-dossier à compiler (optionnel)')
+    parser.add_argument('--force', action='store_true', help='Recompile même les dossiers inchangés depuis le dernier build')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='Nombre de dossiers compilés en parallèle (défaut : 1)')
+    parser.add_argument('--no-format', action='store_true', help='Ne pas utiliser de format précompilé pour le préambule')
+    parser.add_argument('--html', action='store_true', help="Aperçu HTML (MathJax) de chaque dossier au lieu du pdf, sans LaTeX")
+    parser.add_argument('--book', action='store_true', help="Un seul pdf par niveau (dossier), avec table des matières, un \\include par sous-dossier")
+    parser.add_argument('--partial', action='store_true', help="Avec --book : ne recompose que les sous-dossiers modifiés (\\includeonly) dans <niveau>-partiel.pdf")
+    parser.add_argument('--thumbnails', nargs='?', const=str(Path(__file__).parent.parent.resolve() / 'app' / 'frontend' / 'public' / 'question-thumbnails'),
+                        help="Vignette de chaque question (une image par question, index.json uid -> image) dans ce dossier (défaut : app/frontend/public/question-thumbnails)")
+    parser.add_argument('--thumbnail-format', choices=['png', 'svg'], default='png', help='Format des vignettes (défaut : png)')
+    parser.add_argument('--lint', action='store_true', help="Vérifie seulement les formules (délimiteurs, accolades, macros connues), sans LaTeX")
+    parser.add_argument('--no-lint', action='store_true', help="Compile même si la vérification des formules signale des problèmes")
+    parser.add_argument('--bisect', action='store_true', help="Si le log LaTeX ne désigne pas la question en cause, la cherche par compilations isolées (en parallèle, -j)")
+    parser.add_argument('--tex-only', action='store_true', help="Écrit les .tex sans lancer LaTeX")
+    parser.add_argument('--timings', nargs='?', const=str(base_dir / TIMINGS_RELPATH),
+                        help="Écrit le temps de chaque étape et le nombre de processus par dossier en JSON (défaut : questions/.cache/yaml2latex-timings.json)")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Mesure le pipeline sur un corpus généré de N questions (dossier temporaire)")
+    parser.add_argument('--bench-repeat', type=int, default=3, help="Nombre d'essais du --benchmark, le meilleur est gardé (défaut : 3)")
+    parser.add_argument('--bench-baseline', help="Résultat JSON d'un --benchmark précédent : code de sortie 1 si un scénario est plus lent de 25 %%")
+    parser.add_argument('--watch', action='store_true', help="Après le build, surveille les YAML et recompile le dossier modifié à chaque sauvegarde")
+    parser.add_argument('--build-dir', help="Dossier des fichiers auxiliaires de chaque job (ex. /dev/shm) ; par défaut, le dossier temporaire système avec -j")
     args = parser.parse_args()
 
+    if args.benchmark:
+        sys.exit(run_benchmark(args.benchmark, jobs=args.jobs, compile=not args.tex_only, use_format=not args.no_format,
+                               baseline=args.bench_baseline, out=args.timings, repeat=args.bench_repeat))
+
     # Détermine le(s) dossier(s) à compiler
-    if not args.dossier:
-        # Tout compiler
-        folders = [Path(root) for root, dirs, files in os.walk(base_dir) if any(f.endswith('.yaml') for f in files)]
-    elif not args.sous_dossier:
-        # Un dossier
-        target = base_dir / args.dossier
-        folders = [Path(root) for root, dirs, files in os.walk(target) if any(f.endswith('.yaml') for f in files)]
-    else:
-        # Dossier + sous-dossier
-        target = base_dir / args.dossier / args.sous_dossier
-        folders = [Path(root) for root, dirs, files in os.walk(target) if any(f.endswith('.yaml') for f in files)]
-
-    for folder in folders:
-        yaml_files = [f for f in os.listdir(folder) if f.endswith('.yaml')]
-        if not yaml_files:
-            continue
-        remove_legacy_launchers(folder)
-        title = folder.name
-        subtitle = folder.parent.name if folder.parent != base_dir else ''
-        out_tex = folder / f'{title}.tex'
-        with open(out_tex, 'w', encoding='utf-8') as f:
-            f.write(latex_header(title, subtitle))
-            for yf in yaml_files:
-                yaml_path = folder / yf
-                section_name = os.path.splitext(yf)[0]
-                f.write(f"\\section{{{sanitize_latex(section_name)}}}\n")
-                with open(yaml_path, 'r', encoding='utf-8') as yfile:
-                    data = yaml.safe_load(yfile)
-                questions = data if isinstance(data, list) else [data]
-                for q in questions:
-                    # Add source location info
-                    uid = q.get('uid', '')
-                    line_number = find_question_line_number(yaml_path, uid)
-                    q['_source_file'] = str(yaml_path)
-                    q['_line_number'] = line_number
-                    q['_file_uri'] = to_file_uri(yaml_path)
-                    f.write(latex_question(q))
-            f.write(latex_footer())
-        compile_latex(out_tex)
-        clean_aux_files(folder)
+    folders = find_folders(base_dir, args.dossier, args.sous_dossier)
+
+    if args.lint:
+        problems = []
+        # Les YAML à la racine de questions/ sont les nomenclatures, pas des questions
+        for folder in (f for f in folders if f != base_dir):
+            yaml_files = sorted(f for f in os.listdir(folder) if f.endswith('.yaml'))
+            for _, qs in load_folder(folder, yaml_files):
+                problems.extend(format_problem(q, p) for q in qs for p in lint_question(q))
+        for problem in problems:
+            print(f"[yaml2latex] {problem}")
+        print(f"[yaml2latex] {len(problems)} problème(s) dans les formules")
+        sys.exit(1 if problems else 0)
+
+    if args.html:
+        for folder in folders:
+            print(f"[yaml2latex] {build_folder_html(folder, base_dir)}")
+        print(f"[yaml2latex] {len(folders)} aperçu(s) HTML généré(s)")
+        if args.watch:
+            watch(target_dir(base_dir, args.dossier, args.sous_dossier), base_dir,
+                  lambda folder: build_folder_html(folder, base_dir))
+        return
+
+    if args.thumbnails:
+        fragments = FragmentCache(base_dir)
+        store = ThumbnailStore(args.thumbnails, args.thumbnail_format, render=fragments.get)
+        questions = []
+        # Les YAML à la racine de questions/ sont les nomenclatures, pas des questions
+        for folder in (f for f in folders if f != base_dir):
+            yaml_files = sorted(f for f in os.listdir(folder) if f.endswith('.yaml'))
+            for _, qs in load_folder(folder, yaml_files):
+                questions.extend(qs)
+        if not args.no_lint:
+            # Une formule cassée ferait échouer tout son lot : la question est écartée
+            broken = [(q, p) for q in questions for p in lint_question(q)]
+            for q, p in broken:
+                print(f"[yaml2latex] {format_problem(q, p)}")
+            broken_ids = {id(q) for q, _ in broken}
+            questions = [q for q in questions if id(q) not in broken_ids]
+        with tempfile.TemporaryDirectory(prefix='yaml2latex-', dir=args.build_dir) as work_dir:
+            rendered, reused, failed = store.update(questions, work_dir)
+        # Nettoyage des vignettes orphelines seulement quand toute la banque a été parcourue
+        store.save(keep_only={q.get('uid') for q in questions} if not args.dossier else None)
+        fragments.prune()
+        print(f"[yaml2latex] Vignettes : {rendered} générée(s), {reused} reprise(s) du cache, {failed} en échec")
+        return
+
+    if args.book:
+        fragments = FragmentCache(base_dir)
+        levels = [base_dir / args.dossier] if args.dossier else sorted(
+            d for d in base_dir.iterdir() if d.is_dir() and not d.name.startswith('.'))
+        for level_dir in levels:
+            out = build_book(level_dir, base_dir, partial=args.partial, force=args.force,
+                             use_format=not args.no_format, fragments=fragments, lint=not args.no_lint)
+            print(f"[yaml2latex] {out or f'Livre {level_dir.name}: échec de la compilation'}")
+        fragments.prune()
+        if args.watch:
+            def rebuild_book(folder):
+                level_dir = base_dir / folder.relative_to(base_dir).parts[0]
+                return build_book(level_dir, base_dir, partial=args.partial,
+                                  use_format=not args.no_format, fragments=fragments, lint=not args.no_lint)
+
+            watch(target_dir(base_dir, args.dossier), base_dir, rebuild_book)
+        return
+
+    manifest = BuildManifest(base_dir)
+    fragments = FragmentCache(base_dir)
+    options = {'force': args.force, 'use_format': not args.no_format, 'fragments': fragments, 'lint': not args.no_lint,
+               'bisect': max(2, args.jobs) if args.bisect else 0, 'compile': not args.tex_only}
+    if args.timings:
+        TIMINGS.enable()
+    try:
+        results = build_folders(folders, base_dir, manifest, jobs=args.jobs, build_root=args.build_dir, **options)
+    finally:
+        manifest.save()
+        fragments.prune()
+    print(f"[yaml2latex] {results['compiled']} compilé(s), {results['skipped']} inchangé(s), {results['failed']} en échec"
+          + (f", {results['written']} .tex écrit(s) sans compilation" if results['written'] else ""))
+    if fragments.hits or fragments.misses:
+        print(f"[yaml2latex] fragments : {fragments.hits} repris du cache, {fragments.misses} générés")
+    if args.timings:
+        TIMINGS.disable()
+        TIMINGS.save(args.timings)
+        for line in summary_lines(TIMINGS.report()['totals']):
+            print(f"[yaml2latex] {line}")
+        print(f"[yaml2latex] Temps par dossier et par étape écrits dans {args.timings}")
+
+    if args.watch:
+        def rebuild(folder):
+            # Manifeste, fragments et .aux conservés : seul le dossier modifié est régénéré
+            status = build_folder(folder, base_dir, manifest, **dict(options, force=False))
+            manifest.save()
+            return folder / f'{folder.name}.pdf' if status != 'failed' else None
+
+        watch(target_dir(base_dir, args.dossier, args.sous_dossier), base_dir, rebuild)
 
 if __name__ == '__main__':
     main()
-
@@ -0,0 +1,106 @@
+"""
+    Generated corpus and comparison helpers for `yaml2latex.py --benchmark N`
+
+    generate_corpus writes N questions (numeric, single and multiple choice,
+    with formulas, LaTeX special characters and emoji, like the real bank) as
+    CP/dossier-XX/fichier-YY.yaml under a temporary questions/ directory; the
+    same seed always gives the same corpus. The benchmark builds it three times
+    (cold caches, warm caches, one question edited) with TIMINGS enabled.
+
+    compare_runs checks a result against a previous one (--bench-baseline):
+    a scenario slower than REGRESSION_THRESHOLD times the baseline is a
+    regression.
+"""
+
+import random
+from pathlib import Path
+
+import yaml
+
+QUESTIONS_PER_FILE = 20
+FILES_PER_FOLDER = 5
+REGRESSION_THRESHOLD = 1.25
+SCENARIOS = ('froid', 'caches chauds', 'une question modifiée')
+
+_TEXTS = [
+    "Combien font \\({a}+{b}\\) ?",
+    "Résoudre \\(x^2 - {a}x + {b} = 0\\) dans \\(\\mathbb{{R}}\\).",
+    "Calculer \\[\\int_0^{a} t^{b} \\, dt\\]",
+    "Le prix passe de {a} € à {b} € : quelle évolution en % ?",
+    "Soit \\(f(x) = \\frac{{{a}}}{{x+{b}}}\\) : que vaut \\(f'(0)\\) ? 🤔",
+    "Quel est le reste de la division de {a} par {b} (a_n & b_n) ?",
+]
+_OPTIONS = ["\\({a}\\)", "\\(\\frac{{{a}}}{{{b}}}\\)", "{a} %", "{b}_{a}", "Aucune des réponses 😅", "\\(\\sqrt{{{a}}}\\)"]
+_THEMES = ["Calcul", "Fractions", "Équations", "Intégrales", "Pourcentages", "Arithmétique"]
+
+
+def _question(rng, uid):
+    values = {'a': rng.randint(2, 99), 'b': rng.randint(2, 99)}
+    kind = rng.choice(['numeric', 'single_choice', 'multiple_choice'])
+    q = {
+        'uid': uid,
+        'author': 'bench',
+        'discipline': 'Mathématiques',
+        'title': f"Question {uid}",
+        'questionType': kind,
+        'themes': rng.sample(_THEMES, 2),
+        'tags': [f"tag-{rng.randint(1, 20)}"],
+        'difficulty': rng.randint(1, 5),
+        'timeLimit': rng.choice([20, 30, 60]),
+        'text': rng.choice(_TEXTS).format(**values),
+        'explanation': rng.choice(_TEXTS).format(**values),
+    }
+    if kind == 'numeric':
+        q['correctAnswer'] = values['a'] + values['b']
+    else:
+        options = [o.format(**values) for o in rng.sample(_OPTIONS, 4)]
+        corrects = [False] * 4
+        for i in rng.sample(range(4), 1 if kind == 'single_choice' else rng.randint(1, 3)):
+            corrects[i] = True
+        q['answerOptions'] = options
+        q['correctAnswers'] = corrects
+    return q
+
+
+def generate_corpus(base_dir, n_questions, seed=0):
+    """Write n_questions questions under base_dir; returns the folders created."""
+    rng = random.Random(seed)
+    per_folder = QUESTIONS_PER_FILE * FILES_PER_FOLDER
+    folders = []
+    for start in range(0, n_questions, per_folder):
+        folder = Path(base_dir) / 'CP' / f'dossier-{start // per_folder:02d}'
+        folder.mkdir(parents=True, exist_ok=True)
+        folders.append(folder)
+        count = min(per_folder, n_questions - start)
+        for f_start in range(0, count, QUESTIONS_PER_FILE):
+            questions = [_question(rng, f"bench-{start + f_start + i:05d}")
+                         for i in range(min(QUESTIONS_PER_FILE, count - f_start))]
+            path = folder / f'fichier-{f_start // QUESTIONS_PER_FILE:02d}.yaml'
+            path.write_text(yaml.safe_dump(questions, allow_unicode=True, sort_keys=False), encoding='utf-8')
+    return folders
+
+
+def edit_one_question(folder):
+    """Change the title of the first question of the first file of folder."""
+    path = sorted(Path(folder).glob('*.yaml'))[0]
+    questions = yaml.safe_load(path.read_text(encoding='utf-8'))
+    questions[0]['title'] += ' (modifiée)'
+    path.write_text(yaml.safe_dump(questions, allow_unicode=True, sort_keys=False), encoding='utf-8')
+
+
+def compare_runs(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """(lines, regressed) comparing the scenario durations of two benchmark results."""
+    lines = []
+    regressed = False
+    for scenario, run in current['runs'].items():
+        before = baseline.get('runs', {}).get(scenario)
+        if not before or not before.get('seconds'):
+            continue
+        ratio = run['seconds'] / before['seconds']
+        slower = ratio > threshold
+        regressed = regressed or slower
+        lines.append(f"{scenario:<22} {before['seconds']:.3f} s -> {run['seconds']:.3f} s (x{ratio:.2f})"
+                     + ("  RÉGRESSION" if slower else ""))
+    if baseline.get('questions') != current.get('questions'):
+        lines.append(f"attention : corpus de {baseline.get('questions')} question(s) dans la référence, {current.get('questions')} ici")
+    return lines, regressed
@@ -0,0 +1,178 @@
+"""
+    Micro-benchmark of the LaTeX escaping functions
+
+    Compares the single-pass, memoized engine of yaml2latex.utils with the
+    previous implementation (one re.sub per special character, emoji regexes
+    compiled on each call, math blocks found by a non-greedy regex), on every
+    string of the questions corpus, and checks that both produce the same output.
+
+    The new engine differs on purpose in two cases, absent from the corpus:
+    a closer of the other kind (\\( ... \\]) does not end a math block, and a
+    delimiter preceded by an escaped backslash (\\\\( is a line break then "(")
+    is not a delimiter.
+
+    Usage (from scripts/):
+      python3 -m yaml2latex.bench_sanitize [--questions-dir ../questions] [--repeat 5]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import yaml
+
+from . import utils
+
+
+def legacy_sanitize_latex(s):
+    if not isinstance(s, str):
+        return s
+    s2 = s
+    replacements = [
+        (r'(?<!\\)_', r'\\_'),
+        (r'(?<!\\)%', r'\\%'),
+        (r'(?<!\\)&', r'\\&'),
+        (r'(?<!\\)#', r'\\#'),
+        (r'(?<!\\)\$', r'\\$'),
+        (r'(?<!\\){', r'\\{'),
+        (r'(?<!\\)}', r'\\}'),
+    ]
+    for pat, repl in replacements:
+        s2 = re.sub(pat, repl, s2)
+    s2 = re.sub(r'(?<!\\)\^', r'\\^{}', s2)
+    s2 = re.sub(r'(?<!\\)~', r'\\~{}', s2)
+    return s2
+
+
+def legacy_sanitize_latex_smart(s):
+    # Version d'origine, recopiée telle quelle (seuls les appels passent par legacy_sanitize_latex)
+    if not isinstance(s, str):
+        return s
+    # Regex pour trouver les blocs math \( ... \) et \[ ... \] sur plusieurs lignes
+    pattern = r'(\\\(|\\\[)(.*?)(\\\)|\\\])'
+    # Version améliorée :
+    # - \( ... \)  ou  \[ ... \]  sur plusieurs lignes
+    # - non greedy, mais inclut tout jusqu'à le bon séparateur
+    pattern = r'(\\\(|\\\[)(.*?)(\\\)|\\\])'
+    matches = list(re.finditer(pattern, s, re.DOTALL))
+    if not matches:
+        return legacy_sanitize_latex(s)
+    parts = []
+    last_end = 0
+    for m in matches:
+        before = s[last_end:m.start()]
+        if before:
+            parts.append(legacy_sanitize_latex(before))
+        parts.append(m.group(0))
+        last_end = m.end()
+    if last_end < len(s):
+        parts.append(legacy_sanitize_latex(s[last_end:]))
+    return ''.join(parts)
+
+
+def legacy_sanitize_preserve_emoji(s):
+    if not isinstance(s, str) or not s:
+        return s
+    emoji_pattern = re.compile(r'([\U0001F300-\U0001FAFF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\u2600-\u26FF\u2700-\u27BF])')
+    parts = []
+    placeholders = {}
+    idx = 0
+    last = 0
+    for m in emoji_pattern.finditer(s):
+        if m.start() > last:
+            parts.append(s[last:m.start()])
+        ph = f"\x01{idx}\x02"
+        placeholders[ph] = m.group(0)
+        parts.append(ph)
+        idx += 1
+        last = m.end()
+    if last < len(s):
+        parts.append(s[last:])
+    sanitized = ''.join(legacy_sanitize_latex_smart(p) if not (p.startswith('\x01') and p.endswith('\x02')) else p for p in parts)
+    for ph, emo in placeholders.items():
+        sanitized = sanitized.replace(ph, utils.EMOJI_PLACEHOLDER)
+    return sanitized
+
+
+PAIRS = [
+    ('sanitize_latex', legacy_sanitize_latex, utils.sanitize_latex),
+    ('sanitize_latex_smart', legacy_sanitize_latex_smart, utils.sanitize_latex_smart),
+    ('sanitize_preserve_emoji', legacy_sanitize_preserve_emoji, utils.sanitize_preserve_emoji),
+]
+
+
+def corpus_strings(questions_dir):
+    """Every string field / answer option of the question files, in file order."""
+    strings = []
+    for root, dirs, files in os.walk(questions_dir):
+        if root == str(questions_dir):
+            continue  # nomenclatures
+        for f in sorted(files):
+            if not f.endswith('.yaml'):
+                continue
+            with open(os.path.join(root, f), 'r', encoding='utf-8') as fh:
+                data = yaml.safe_load(fh)
+            for q in data if isinstance(data, list) else [data]:
+                if not isinstance(q, dict):
+                    continue
+                for value in q.values():
+                    if isinstance(value, str):
+                        strings.append(value)
+                    elif isinstance(value, list):
+                        strings.extend(str(v) for v in value)
+    return strings
+
+
+def clear_caches():
+    utils._escape.cache_clear()
+    utils._render.cache_clear()
+
+
+def run(strings, repeat):
+    """Return [(name, legacy seconds, new cold seconds, new warm seconds, mismatches)]."""
+    results = []
+    for name, legacy, new in PAIRS:
+        mismatches = sum(1 for s in strings if legacy(s) != new(s))
+        t = time.perf_counter()
+        for _ in range(repeat):
+            for s in strings:
+                legacy(s)
+        legacy_time = (time.perf_counter() - t) / repeat
+        cold = 0.0
+        for _ in range(repeat):
+            clear_caches()
+            t = time.perf_counter()
+            for s in strings:
+                new(s)
+            cold += time.perf_counter() - t
+        t = time.perf_counter()
+        for _ in range(repeat):
+            for s in strings:
+                new(s)
+        warm = (time.perf_counter() - t) / repeat
+        results.append((name, legacy_time, cold / repeat, warm, mismatches))
+    return results
+
+
+def main():
+    default_dir = Path(__file__).resolve().parents[2] / 'questions'
+    parser = argparse.ArgumentParser(description="Micro-benchmark des fonctions d'échappement LaTeX.")
+    parser.add_argument('--questions-dir', default=str(default_dir), help='Dossier questions/ (par défaut ../questions)')
+    parser.add_argument('--repeat', type=int, default=5, help='Nombre de répétitions (défaut : 5)')
+    args = parser.parse_args()
+
+    strings = corpus_strings(args.questions_dir)
+    print(f"[bench] {len(strings)} chaînes, {len(set(strings))} distinctes")
+    failed = False
+    for name, legacy, cold, warm, mismatches in run(strings, args.repeat):
+        print(f"[bench] {name:<24} avant {legacy * 1e3:7.2f} ms | sans cache {cold * 1e3:7.2f} ms (x{legacy / cold:.1f})"
+              f" | avec cache {warm * 1e3:7.2f} ms (x{legacy / warm:.1f}) | différences : {mismatches}")
+        failed = failed or mismatches > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
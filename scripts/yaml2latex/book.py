@@ -0,0 +1,111 @@
+"""
+    Master document ("book") for a whole level
+
+    All the folders of a level (questions/L2/...) are gathered into one
+    document with a table of contents: every folder is written to its own
+    chapter file, pulled in by the master file with \\include. The book and
+    the engine's files live under questions/.cache/yaml2latex-book/<level>/, so
+    the .aux of each chapter survives between runs.
+
+    book.json keeps the hash of every chapter as it was last typeset:
+    - a full build (<level>.tex) is needed when a chapter changed since the
+      last full build, or when chapters were added / removed;
+    - a partial build (<level>-partiel.tex) typesets only the chapters changed
+      since the last build, with \\includeonly: the other chapters are not
+      typeset, their .aux (page numbers, table of contents) are reused.
+"""
+
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from pathlib import Path
+
+from .latex import RENDERER_VERSION, END_OF_DUMP, latex_preamble, latex_footer
+from .manifest import write_if_changed
+from .utils import sanitize_latex
+
+BOOK_VERSION = 1
+BOOK_RELPATH = Path('.cache') / 'yaml2latex-book'
+CHAPTERS_DIR = 'chapitres'
+
+
+def chapter_name(rel_path):
+    """ASCII file name for a folder path (\\include does not like spaces or accents)."""
+    ascii_path = unicodedata.normalize('NFKD', str(rel_path)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^A-Za-z0-9]+', '-', ascii_path).strip('-').lower() or 'racine'
+
+
+def chapter_hash(text):
+    return hashlib.sha256(f"{BOOK_VERSION}:{RENDERER_VERSION}\0{text}".encode('utf-8')).hexdigest()
+
+
+class Book:
+    def __init__(self, base_dir, level):
+        self.level = level
+        self.dir = Path(base_dir) / BOOK_RELPATH / level
+        self.state_path = self.dir / 'book.json'
+        self.built = {'full': {}, 'partial': {}}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == BOOK_VERSION:
+                self.built = {kind: data.get(kind, {}) for kind in self.built}
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def main_tex(self):
+        return self.dir / f'{self.level}.tex'
+
+    @property
+    def partial_tex(self):
+        return self.dir / f'{self.level}-partiel.tex'
+
+    def write_chapters(self, chapters):
+        """Write [(name, LaTeX text)] as chapter files and drop the stale ones. Returns {name: hash}."""
+        chapters_dir = self.dir / CHAPTERS_DIR
+        chapters_dir.mkdir(parents=True, exist_ok=True)
+        hashes = {}
+        for name, text in chapters:
+            write_if_changed(chapters_dir / f'{name}.tex', text)
+            hashes[name] = chapter_hash(text)
+        for path in chapters_dir.iterdir():
+            if path.stem not in hashes:
+                path.unlink()
+        return hashes
+
+    def source(self, names, includeonly=None):
+        """Master file: preamble, table of contents and one \\include per chapter."""
+        parts = [latex_preamble(), END_OF_DUMP]
+        if includeonly is not None:
+            parts.append("\\includeonly{" + ",".join(f"{CHAPTERS_DIR}/{n}" for n in includeonly) + "}\n")
+        parts.append(f"\\title{{{sanitize_latex(self.level)}}}\n\\author{{}}\n\\date{{}}\n"
+                     "\\begin{document}\n\\maketitle\n\\tableofcontents\n")
+        parts.extend(f"\\include{{{CHAPTERS_DIR}/{n}}}\n" for n in names)
+        parts.append(latex_footer())
+        return ''.join(parts)
+
+    def plan(self, hashes, partial=False, force=False):
+        """What to typeset: ('full', None), ('partial', [changed chapters]) or (None, None) when up to date."""
+        full_done = self.built['full'] == hashes and self.main_tex.with_suffix('.pdf').is_file()
+        if force or (not partial and not full_done):
+            return 'full', None
+        if not partial:
+            return None, None
+        # Ajout / suppression de chapitres : numérotation et table des matières à refaire entièrement
+        if set(hashes) != set(self.built['partial']) or set(hashes) != set(self.built['full']):
+            return 'full', None
+        changed = [n for n in hashes if hashes[n] != self.built['partial'].get(n)]
+        return ('partial', changed) if changed else (None, None)
+
+    def record(self, kind, hashes):
+        if kind == 'full':
+            self.built['full'] = dict(hashes)
+        self.built['partial'] = dict(hashes)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.built, version=BOOK_VERSION), f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
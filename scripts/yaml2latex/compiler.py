@@ -4,25 +4,81 @@
 
 import subprocess
 import re
+import shutil
+import hashlib
 from pathlib import Path
 
-def compile_latex(tex_path):
+from .toolchain import get_toolchain, engine_path
+from .fmt import get_format, mark_failed, format_env
+
+# Fichiers écrits par une passe et relus par la suivante
+RERUN_EXTS = ('aux', 'out', 'toc')
+# Nombre maximal de passes (comme latexmk)
+MAX_PASSES = 5
+_RERUN_RE = re.compile(r'Rerun to get|Please rerun LaTeX|Rerun LaTeX|Label\(s\) may have changed')
+# Lignes du .aux qui changent le résultat de la passe suivante (références, biblio, listes utilisées)
+_AUX_LINE_RE = re.compile(r'\\(newlabel|bibcite|@writefile\{(\w+)\})')
+
+
+def aux_state(out_dir, stem):
+    """Hash of what the next pass would read back: {ext: sha256 or None if missing / empty}.
+
+    For the .aux only references / citations and entries of lists that the
+    document actually prints (.toc present...) are kept, so that page shifts
+    of unreferenced sections do not force a rerun.
+    """
+    out_dir = Path(out_dir)
+    state = {}
+    for ext in RERUN_EXTS:
+        try:
+            data = (out_dir / f'{stem}.{ext}').read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            state[ext] = None
+            continue
+        if ext == 'aux':
+            kept = []
+            for line in data.splitlines():
+                m = _AUX_LINE_RE.match(line)
+                if m and (m.group(2) is None or (out_dir / f'{stem}.{m.group(2)}').exists()):
+                    kept.append(line)
+            data = '\n'.join(kept)
+        # Fichier absent ou sans contenu utile : rien à relire
+        state[ext] = hashlib.sha256(data.encode('utf-8')).hexdigest() if data.strip() else None
+    return state
+
+
+def needs_rerun(log_text, before, after):
+    """latexmk-style decision: the engine asked for it, or a file it reads back changed."""
+    return bool(_RERUN_RE.search(log_text or '')) or before != after
+
+def document_error(output, tex_name):
+    """True when the engine reports an error at a line of the document itself (not a format problem)."""
+    return re.search(r'^(?:\./)?(?:[^\n:]*/)?' + re.escape(tex_name) + r':\d+: ', output or '', re.M) is not None
+
+def compile_latex(tex_path, build_dir=None, log=print, preamble=None, state_dir=None, diagnose=None):
+    """Compile tex_path into <same folder>/<name>.pdf; returns True on success.
+
+    With build_dir, the engine writes its aux / log / pdf files there (one
+    directory per job, so parallel builds never share aux files) and only the
+    pdf is moved next to the .tex. Messages go through log.
+    With preamble (the static part of the document header, see
+    latex.latex_preamble), a precompiled format of it is used when available.
+    state_dir keeps the .aux / .out / .toc of the last successful build, so that
+    the next build starts from them and usually needs a single pass.
+    On failure, diagnose(engine output) may return the log lines to print instead
+    of the raw output (see diagnose.explain_failure).
+    """
     # Prefer lualatex if available (better color emoji support via fontspec + HarfBuzz),
     # otherwise fallback to xelatex.
-    def has_cmd(cmd):
-        from shutil import which
-        return which(cmd) is not None
+    # Engines and fonts come from the cached toolchain probe (no which / fc-list per compile)
+    toolchain = get_toolchain()
+    emoji_font = toolchain['emoji_font_available']
 
-    # Detect presence of Noto Color Emoji
-    def has_emoji_font():
-        try:
-            out = subprocess.check_output(['fc-list', ':family'], stderr=subprocess.DEVNULL).decode('utf-8')
-            return 'Noto Color Emoji' in out
-        except Exception:
-            return False
+    def has_cmd(cmd):
+        return engine_path(cmd) is not None
 
     engine = None
-    if has_cmd('lualatex') and has_emoji_font():
+    if has_cmd('lualatex') and emoji_font:
         engine = 'lualatex'
     elif has_cmd('xelatex'):
         engine = 'xelatex'
@@ -30,8 +86,9 @@ def compile_latex(tex_path):
         engine = 'xelatex'  # fallback; will error if absent
 
     # Diagnostics for debugging emoji rendering
-    print(f"[yaml2latex] Using LaTeX engine: {engine}")
-    print(f"[yaml2latex] Noto Color Emoji available: {has_emoji_font()}")
+    version = toolchain['engines'].get(engine, {}).get('version')
+    log(f"[yaml2latex] Using LaTeX engine: {engine}" + (f" ({version})" if version else ""))
+    log(f"[yaml2latex] Noto Color Emoji available: {emoji_font}")
 
 
 
@@ -43,42 +100,99 @@ def compile_latex(tex_path):
             start = max(0, m.start() - 40)
             end = min(len(txt), m.end() + 40)
             excerpt = txt[start:end]
-            print("[yaml2latex] .tex excerpt around first emoji:")
-            print(excerpt)
+            log("[yaml2latex] .tex excerpt around first emoji:")
+            log(excerpt)
     except Exception:
         pass
 
-    def run_engine(cmd):
+    def run_engine(cmd, env=None):
         try:
-            cp = subprocess.run(cmd, cwd=tex_path.parent, capture_output=True, text=True)
+            cp = subprocess.run(cmd, cwd=tex_path.parent, capture_output=True, text=True, env=env)
             if cp.returncode != 0:
-                print(f"[yaml2latex] {cmd[0]} failed with return code {cp.returncode}")
-                if cp.stdout:
-                    print("[yaml2latex] stdout:")
-                    print(cp.stdout)
-                if cp.stderr:
-                    print("[yaml2latex] stderr:")
-                    print(cp.stderr)
+                log(f"[yaml2latex] {cmd[0]} failed with return code {cp.returncode}")
             return cp.returncode, cp.stdout + "\n" + cp.stderr
         except Exception as e:
-            print(f"[yaml2latex] Error running {cmd}: {e}")
+            log(f"[yaml2latex] Error running {cmd}: {e}")
             return 1, str(e)
 
-    cmd = [engine, '-interaction=nonstopmode', tex_path]
-    rc, out = run_engine(cmd)
+    formats = {}
+
+    def engine_cmd(engine):
+        cmd = [engine, '-interaction=nonstopmode', '-file-line-error']
+        if formats.get(engine):
+            cmd.append(f'-fmt={formats[engine][1]}')
+        if build_dir:
+            cmd.append(f'-output-directory={build_dir}')
+        return cmd + [tex_path]
+
+    def run_pass(engine):
+        if preamble is not None and engine not in formats:
+            formats[engine] = get_format(engine, preamble, log)
+        fmt = formats.get(engine)
+        rc, out = run_engine(engine_cmd(engine), env=format_env(fmt[0]) if fmt else None)
+        if rc != 0 and fmt and not document_error(out, tex_path.name):
+            # Échec avant le document : le format est peut-être en cause, on réessaie sans lui
+            log(f"[yaml2latex] Compilation with format {fmt[1]} failed, retrying without it")
+            formats[engine] = None
+            failed_out = out
+            rc, out = run_engine(engine_cmd(engine))
+            if rc == 0:
+                # Sans le format ça passe : c'est bien lui qui est en cause
+                mark_failed(fmt[0], fmt[1], failed_out)
+            else:
+                formats[engine] = fmt
+        return rc, out
+
+    out_dir = Path(build_dir) if build_dir else tex_path.parent
+    stem = tex_path.stem
+    if state_dir:
+        for ext in RERUN_EXTS:
+            saved = Path(state_dir) / f'{stem}.{ext}'
+            if saved.is_file() and not (out_dir / saved.name).exists():
+                shutil.copy2(saved, out_dir / saved.name)
+
+    before = aux_state(out_dir, stem)
+    rc, out = run_pass(engine)
     if rc != 0 and engine == 'lualatex':
-        print('[yaml2latex] lualatex failed, retrying with xelatex')
+        log('[yaml2latex] lualatex failed, retrying with xelatex')
         if has_cmd('xelatex'):
             engine = 'xelatex'
-            cmd = [engine, '-interaction=nonstopmode', tex_path]
-            rc2, out2 = run_engine(cmd)
+            rc2, out2 = run_pass(engine)
             rc = rc2
             out = out2
         else:
-            print('[yaml2latex] xelatex not available as fallback')
-    # run a second pass if first succeeded
-    if rc == 0:
-        run_engine([engine, '-interaction=nonstopmode', tex_path])
+            log('[yaml2latex] xelatex not available as fallback')
+    # Nouvelle passe seulement si nécessaire (références / signets modifiés, demande du log)
+    passes = 1
+    while rc == 0 and passes < MAX_PASSES:
+        after = aux_state(out_dir, stem)
+        try:
+            log_text = (out_dir / f'{stem}.log').read_text(encoding='utf-8', errors='replace')
+        except OSError:
+            log_text = out
+        if not needs_rerun(log_text, before, after):
+            break
+        before = after
+        rc, out = run_pass(engine)
+        passes += 1
+    log(f"[yaml2latex] {passes} LaTeX pass(es)")
+    if rc != 0:
+        lines = diagnose(out) if diagnose else None
+        if lines:
+            for line in lines:
+                log(line)
+        else:
+            log("[yaml2latex] output:")
+            log(out)
+    if rc == 0 and state_dir:
+        Path(state_dir).mkdir(parents=True, exist_ok=True)
+        for ext in RERUN_EXTS:
+            produced = out_dir / f'{stem}.{ext}'
+            if produced.is_file():
+                shutil.copy2(produced, Path(state_dir) / produced.name)
+    if rc == 0 and build_dir:
+        shutil.move(str(Path(build_dir) / tex_path.with_suffix('.pdf').name), str(tex_path.with_suffix('.pdf')))
+    return rc == 0
 
 def clean_aux_files(folder):
     for ext in ['aux', 'log', 'out', 'toc']:
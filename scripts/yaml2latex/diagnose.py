@@ -0,0 +1,116 @@
+"""
+    Find the question behind a LaTeX error
+
+    While the .tex of a folder is assembled, a SourceMap records the line range
+    of every question fragment with its uid and YAML location (saved next to the
+    .aux files of the folder, see BuildManifest.aux_dir). When the engine fails,
+    the errors of its output (-file-line-error format, or "! ..." followed by
+    "l.<line>") are mapped back to the questions.
+
+    When an error has no usable line (runaway argument reported at
+    \\end{document}, fatal error...), bisect_failures compiles halves of the
+    suspect questions in isolation, in parallel, until the failing ones are
+    isolated.
+"""
+
+import re
+import json
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre maximal d'erreurs détaillées (les suivantes sont souvent des conséquences de la première)
+MAX_ERRORS = 5
+
+_FILE_LINE_RE = re.compile(r'^(?:\./)?(?P<file>[^\n:]+\.tex):(?P<line>\d+): (?P<msg>.+)$', re.M)
+_BANG_RE = re.compile(r'^! (?P<msg>.+)$', re.M)
+_LINE_RE = re.compile(r'^l\.(\d+)', re.M)
+
+
+class SourceMap:
+    """.tex line ranges -> questions, built while the document is assembled."""
+
+    def __init__(self, start_line=1):
+        self.line = start_line
+        self.entries = []
+
+    def add(self, text, q=None):
+        """Account for text appended to the document (a question fragment when q is given); returns text."""
+        lines = text.count('\n')
+        if q is not None:
+            self.entries.append({
+                'start': self.line,
+                'end': self.line + max(lines, 1) - 1,
+                'uid': q.get('uid'),
+                'file': q.get('_source_file'),
+                'line': q.get('_line_number'),
+            })
+        self.line += lines
+        return text
+
+    def locate(self, tex_line):
+        starts = [e['start'] for e in self.entries]
+        i = bisect_right(starts, tex_line) - 1
+        if i >= 0 and self.entries[i]['start'] <= tex_line <= self.entries[i]['end']:
+            return self.entries[i]
+        return None
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+
+
+def parse_errors(output, tex_name):
+    """[(line in tex_name or None, message)] from the engine output."""
+    errors = [(int(m.group('line')), m.group('msg').strip())
+              for m in _FILE_LINE_RE.finditer(output or '') if m.group('file').split('/')[-1] == tex_name]
+    if errors:
+        return errors
+    for m in _BANG_RE.finditer(output or ''):
+        line = _LINE_RE.search(output, m.end())
+        errors.append((int(line.group(1)) if line else None, m.group('msg').strip()))
+    return errors
+
+
+def explain_failure(output, source_map, tex_name):
+    """Log lines naming the failing questions, and whether every error could be located."""
+    errors = parse_errors(output, tex_name)
+    lines = []
+    located = bool(errors)
+    for tex_line, message in errors[:MAX_ERRORS]:
+        entry = source_map.locate(tex_line) if tex_line else None
+        if entry:
+            lines.append(f"[yaml2latex] {entry['file']}:{entry['line']}: uid={entry['uid']} : {message} (ligne {tex_line} du .tex)")
+        else:
+            located = False
+            lines.append(f"[yaml2latex] {tex_name}:{tex_line or '?'}: {message}")
+    return lines, located
+
+
+def bisect_failures(items, fails, jobs=4):
+    """Smallest groups of items that make fails(group) true, testing both halves of each group in parallel.
+
+    Usually single items; a group is returned whole when neither of its halves
+    fails on its own (error caused by two questions together).
+    """
+    if not items or not fails(items):
+        return []
+    if len(items) == 1:
+        return [items]
+    culprits = []
+    frontier = [items]
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while frontier:
+            halves = [(g[:len(g) // 2], g[len(g) // 2:]) for g in frontier]
+            results = list(pool.map(fails, [h for pair in halves for h in pair]))
+            next_frontier = []
+            for i, (group, pair) in enumerate(zip(frontier, halves)):
+                failing = [h for h, r in zip(pair, results[2 * i:2 * i + 2]) if r]
+                if not failing:
+                    culprits.append(group)
+                for h in failing:
+                    (culprits if len(h) == 1 else next_frontier).append(h)
+            frontier = next_frontier
+    # Dans l'ordre du document
+    position = {id(item): i for i, item in enumerate(items)}
+    return sorted(culprits, key=lambda group: position[id(group[0])])
@@ -0,0 +1,118 @@
+"""
+    Precompiled format for the static yaml2latex preamble
+
+    The packages and custom commands of latex_preamble() are the same for every
+    folder. They are dumped once per engine into a format with mylatexformat
+    (`<engine> -ini "&<engine>" mylatexformat.ltx preamble.tex`), cached under
+    ~/.cache/mathquest/formats/ by a hash of the engine version and the preamble.
+    Documents keep their full preamble: with the format loaded, mylatexformat
+    skips everything up to \\endofdump (END_OF_DUMP in latex.py); without it the
+    preamble is read normally.
+
+    When the format cannot be dumped (no mylatexformat, engine refusing to dump
+    loaded fonts...) a `.failed` marker is written and compiles fall back to the
+    plain preamble without retrying the dump until the preamble or engine changes.
+    The same marker disables a format that made a compile fail which succeeds
+    without it; the .fmt is never deleted (other jobs may be loading it) and is
+    only ever replaced atomically by a fresh dump.
+"""
+
+import os
+import hashlib
+import subprocess
+import threading
+
+from .latex import END_OF_DUMP
+from .toolchain import get_toolchain, cache_dir
+
+FORMAT_VERSION = 1
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def formats_dir():
+    return cache_dir() / 'formats'
+
+
+def format_name(engine, preamble):
+    toolchain = get_toolchain()
+    version = toolchain['engines'].get(engine, {}).get('version') or ''
+    h = hashlib.sha256(f"{FORMAT_VERSION}\0{engine}\0{version}\0{preamble}".encode('utf-8')).hexdigest()
+    return f"yaml2latex-{engine}-{h[:16]}"
+
+
+def _lock_for(name):
+    with _locks_guard:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _dump(engine, name, preamble, log):
+    directory = formats_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    source = directory / f"{name}-preamble.tex"
+    source.write_text(preamble + END_OF_DUMP + "\\begin{document}\n\\end{document}\n", encoding='utf-8')
+    # Dump sous un nom temporaire puis remplacement atomique : un autre processus peut lire <name>.fmt
+    jobname = f"{name}-{os.getpid()}-dump"
+    cmd = [engine, '-ini', '-interaction=nonstopmode', f'-jobname={jobname}', f'&{engine}',
+           'mylatexformat.ltx', source.name]
+    try:
+        cp = subprocess.run(cmd, cwd=directory, capture_output=True, text=True)
+        ok = cp.returncode == 0 and (directory / f"{jobname}.fmt").is_file()
+        output = cp.stdout + "\n" + cp.stderr
+        if ok:
+            os.replace(directory / f"{jobname}.fmt", directory / f"{name}.fmt")
+    except Exception as e:
+        ok, output = False, str(e)
+    for leftover in directory.glob(f"{jobname}.*"):
+        try:
+            leftover.unlink()
+        except OSError:
+            pass
+    if not ok:
+        (directory / f"{name}.failed").write_text(output[-4000:], encoding='utf-8')
+        log(f"[yaml2latex] Format {name} could not be dumped, using the plain preamble")
+    else:
+        log(f"[yaml2latex] Dumped preamble format {name}.fmt")
+    return ok
+
+
+def get_format(engine, preamble, log=print):
+    """Return the format directory and name for engine + preamble, dumping it if needed.
+
+    Returns (directory, name) or None when no format can be used.
+    """
+    if not get_toolchain().get('mylatexformat'):
+        return None
+    name = format_name(engine, preamble)
+    directory = formats_dir()
+    # Plusieurs jobs (-j) peuvent demander le même format : un seul le génère
+    with _lock_for(name):
+        if (directory / f"{name}.failed").is_file():
+            return None
+        if (directory / f"{name}.fmt").is_file():
+            return directory, name
+        try:
+            ok = _dump(engine, name, preamble, log)
+        except OSError as e:
+            log(f"[yaml2latex] Format {name} not available: {e}")
+            return None
+    return (directory, name) if ok else None
+
+
+def mark_failed(directory, name, reason):
+    """Disable a format that broke a compile (fallback to the plain preamble next time).
+
+    The .fmt itself is left in place: other jobs may be loading it.
+    """
+    try:
+        (directory / f"{name}.failed").write_text(reason[-4000:], encoding='utf-8')
+    except OSError:
+        pass
+
+
+def format_env(directory):
+    """Environment letting the engine find formats in directory (defaults kept)."""
+    env = dict(os.environ)
+    env['TEXFORMATS'] = f"{directory}{os.pathsep}{env.get('TEXFORMATS', '')}"
+    return env
@@ -0,0 +1,82 @@
+"""
+    Content-addressed cache of rendered question fragments
+
+    latex_question_body(q) only depends on the content of the question (not on
+    the _source_file / _line_number / _file_uri annotations) and on the renderer,
+    so its output is stored under questions/.cache/yaml2latex-fragments/ keyed by
+    a hash of both; the position of the question is filled in after the lookup
+    (latex.apply_position). Folder documents, and any other document built from
+    the same questions, are assembled from these fragments: a question is
+    rendered again only when it changed, not when lines are inserted above it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from pathlib import Path
+
+from .latex import RENDERER_VERSION, apply_position, latex_question_body
+
+FRAGMENTS_RELPATH = Path('.cache') / 'yaml2latex-fragments'
+# Fragments non utilisés depuis ce nombre de jours supprimés par prune()
+MAX_AGE_DAYS = 30
+
+
+def question_content(q):
+    """q without the annotations added by yaml2latex (_source_file, _line_number...)."""
+    return {k: v for k, v in q.items() if not str(k).startswith('_')}
+
+
+def fragment_key(q):
+    payload = json.dumps(question_content(q), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(f"{RENDERER_VERSION}\0{payload}".encode('utf-8')).hexdigest()
+
+
+class FragmentCache:
+    def __init__(self, base_dir, render=latex_question_body):
+        self.root = Path(base_dir) / FRAGMENTS_RELPATH
+        self.render = render
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.tex"
+
+    def get(self, q):
+        """Rendered LaTeX of q, from the cache when possible."""
+        key = fragment_key(q)
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding='utf-8')
+            self.hits += 1
+            # Date d'accès pour prune()
+            os.utime(path)
+            return apply_position(text, q)
+        except OSError:
+            pass
+        self.misses += 1
+        text = self.render(question_content(q))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Écriture atomique : plusieurs jobs (-j) peuvent produire le même fragment
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, suffix='.tmp', delete=False) as f:
+                f.write(text)
+            os.replace(f.name, path)
+        except OSError:
+            pass
+        return apply_position(text, q)
+
+    def prune(self, max_age_days=MAX_AGE_DAYS):
+        """Remove fragments not used for max_age_days. Returns the number removed."""
+        limit = time.time() - max_age_days * 86400
+        removed = 0
+        for path in self.root.glob('*/*.tex'):
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
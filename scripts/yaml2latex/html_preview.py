@@ -0,0 +1,124 @@
+"""
+    HTML generation functions for yaml2latex (preview backend)
+
+    Same layout as latex.py (uid, title, metadata line, options with ✓/✗,
+    explanation, excludedFrom sign) but written as one static HTML page per
+    folder, without any TeX engine. Math blocks \\( ... \\) and \\[ ... \\] are
+    left as they are and typeset in the browser by MathJax.
+"""
+
+from html import escape
+
+from .utils import get_env_type, excluded_labels, meta_parts, option_marks
+
+MATHJAX_URL = 'https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js'
+
+STYLE = """
+body { font-family: sans-serif; max-width: 50em; margin: 2em auto; padding: 0 1em; line-height: 1.4; }
+h1 { text-align: center; }
+.question { margin: 1.5em 0; }
+.sep { color: #0046c8; font-weight: bold; border-bottom: 1px solid #0046c8; margin-bottom: .5em; }
+.sep span { border: 1px solid #0046c8; padding: 0 .3em; }
+.text { white-space: pre-line; }
+.meta { color: #444; }
+.excluded { display: inline-block; color: red; border: 1px solid red; padding: 0 .3em; font-weight: bold; }
+.options { list-style: none; padding-left: 1em; }
+.correct { color: #007800; }
+.wrong { color: red; }
+"""
+
+
+def _text(value):
+    """HTML-escaped text; math delimiters are kept for MathJax."""
+    if value is None:
+        return ''
+    return escape(str(value), quote=False)
+
+
+def html_header(title, subtitle):
+    full_title = _text(subtitle + " - " + title)
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>{full_title}</title>
+<style>{STYLE}</style>
+<script defer src="{MATHJAX_URL}"></script>
+</head>
+<body>
+<h1>{full_title}</h1>
+"""
+
+
+def html_section(name):
+    return f"<h2>{_text(name)}</h2>\n"
+
+
+def html_footer():
+    return "</body>\n</html>\n"
+
+
+def html_question(q):
+    env = get_env_type(q)
+    raw_uid = q.get('uid', '')
+    title = _text(q.get('title', ''))
+    temps = _text(q.get('time', ''))
+    statement = _text(q.get('text', q.get('statement', '')))
+    feedback = _text(q.get('feedback', ''))
+    explanation = _text(q.get('explanation', ''))
+    feedback_wait_time = q.get('feedbackWaitTime', 5)
+
+    # Ligne 1 : uid (lien vers le YAML) et titre, temps, ligne dans le fichier
+    time_limit = q.get('timeLimit', q.get('time', None))
+    time_str = f" ({_text(time_limit)}s)" if time_limit is not None else ""
+    uid_display = _text(raw_uid)
+    file_uri = q.get('_file_uri')
+    uid_link = f'<a href="{escape(str(file_uri))}">{uid_display}</a>' if file_uri else uid_display
+    line_info = q.get('_line_number')
+    line_suffix = f" (ligne {line_info})" if isinstance(line_info, int) and line_info > 0 else ""
+    header_line = f"<strong>{uid_link} - {title}</strong>{time_str}{line_suffix}"
+
+    # Ligne 2 : auteur, niveau, difficulté, thèmes, tags
+    meta_line = " | ".join(meta_parts(q, _text))
+
+    labels = excluded_labels(q)
+    excluded_html = f'<p class="excluded">⛔ {_text(", ".join(labels))}</p>\n' if labels else ''
+
+    # Réponses : ✓ / ✗ pour les choix, réponse attendue pour les numériques
+    if env in ['choix_simple', 'choix_multiple']:
+        marks = option_marks(q)
+        if marks:
+            items = "".join(
+                f'<li class="{"correct" if correct else "wrong"}">{"✓" if correct else "✗"} {_text(opt)}</li>\n'
+                for opt, correct in marks
+            )
+            opts_html = f'<ul class="options">\n{items}</ul>\n'
+        else:
+            opts_html = "<p><em>Aucune réponse</em></p>\n"
+    else:
+        answer = q.get('correctAnswer', None)
+        if answer is not None:
+            opts_html = f"<p><strong>Réponse attendue</strong> : {_text(answer)}</p>\n"
+        else:
+            opts_html = "<p><em>Réponse numérique</em></p>\n"
+
+    fb_html = ""
+    if explanation:
+        fb_html = f'<p class="text"><strong>Explication</strong> ({_text(feedback_wait_time)}s) : {explanation}</p>\n'
+    elif feedback:
+        fb_html = f"<p><em>Feedback</em> : {feedback}" + (f" (Temps : {temps} s)" if temps else "") + "</p>\n"
+    elif temps:
+        fb_html = f"<p><em>Temps</em> : {temps} s</p>\n"
+
+    anchor = f' id="{escape(str(raw_uid))}"' if raw_uid else ''
+    out = ""
+    out += f'<div class="question {env}"{anchor}>\n'
+    out += f'<div class="sep"><span>{_text(env)}</span></div>\n'
+    out += f"<p>{header_line}</p>\n"
+    out += f'<p class="meta">{meta_line}</p>\n'
+    out += excluded_html
+    out += f'<p class="text">{statement}</p>\n'
+    out += opts_html
+    out += fb_html
+    out += "</div>\n"
+    return out
@@ -2,12 +2,41 @@
     LaTeX generation functions for yaml2latex
 """
 
-from .utils import sanitize_latex, sanitize_latex_smart, sanitize_preserve_emoji, wrap_emojis, get_env_type, find_emoji_font_file
+import hashlib
+from pathlib import Path
 
+from .utils import (sanitize_latex, sanitize_latex_smart, sanitize_preserve_emoji, wrap_emojis, get_env_type,
+                    find_emoji_font_file, excluded_labels, meta_parts, option_marks)
 
+# Sources dont dépend la sortie LaTeX : toute modification invalide les builds incrémentaux
+RENDERER_SOURCES = ('latex.py', 'utils.py')
 
-def latex_header(title, subtitle):
-    full_title = subtitle + " - " + title
+
+def renderer_version():
+    h = hashlib.sha256()
+    for name in RENDERER_SOURCES:
+        h.update((Path(__file__).parent / name).read_bytes() + b'\0')
+    return h.hexdigest()[:16]
+
+
+# Dérivée des sources plutôt qu'incrémentée à la main (un oubli laissait des fragments périmés)
+RENDERER_VERSION = renderer_version()
+
+# Marqueurs de la position de la question dans son YAML (lien vers le fichier, numéro de ligne),
+# remplacés par apply_position : le reste du rendu n'en dépend pas et peut être mis en cache
+_UID_MARK = '\0uid\0'
+_LINE_MARK = '\0ligne\0'
+
+# Fin de la partie statique du préambule. Sans format précompilé c'est un \relax ;
+# avec un format mylatexformat (voir fmt.py), tout ce qui précède est sauté.
+END_OF_DUMP = "\\csname endofdump\\endcsname\n"
+
+
+def latex_preamble():
+    """Static part of the header (class, packages, custom commands).
+
+    Identical for every folder, so it can be dumped once into a format file.
+    """
     # Try to find an installed Noto Color Emoji file and prefer explicit path when available
     emoji_ttf = find_emoji_font_file()
     # If we found a ttf file, add a fontspec option to load it by path
@@ -60,7 +89,13 @@ def latex_header(title, subtitle):
 \newcommand{\cross}{\textcolor{red}{\ding{55}}}
 % Ligne séparatrice personnalisée : boxée et colorée
 \newcommand{\questionsep}[1]{\vspace{0.5em}\noindent\\[0.1em]\noindent\fcolorbox{myblue}{white}{\textcolor{myblue}{\textbf{#1}}}\hrulefill\noindent}
-___TITLE___
+"""
+    return header
+
+
+def latex_header(title, subtitle):
+    full_title = subtitle + " - " + title
+    header = latex_preamble() + END_OF_DUMP + r"""___TITLE___
 \author{}
 \date{}
 \begin{document}
@@ -73,18 +108,46 @@ ___TITLE___
 def latex_footer():
     return "\n\end{document}\n"
 
+def uid_link(q):
+    """uid of q, as a link to its YAML file when q has a _file_uri annotation."""
+    uid_display = sanitize_latex(q.get('uid', ''))
+    file_uri = q.get('_file_uri')
+    if not file_uri:
+        return uid_display
+    uri_norm = str(file_uri).replace('\\', '/')
+    # Escape characters that hyperref treats specially
+    uri_safe = (
+        uri_norm
+        .replace('%', r'\%')
+        .replace('#', r'\#')
+        .replace('_', r'\_')
+        .replace('&', r'\&')
+    )
+    return f"\\href{{{uri_safe}}}{{{uid_display}}}"
+
+
+def line_suffix(q):
+    line_info = q.get('_line_number')
+    if isinstance(line_info, int) and line_info > 0:
+        return f" (ligne {sanitize_latex(str(line_info))})"
+    return ""
+
+
+def apply_position(body, q):
+    """Fill the position marks of latex_question_body(q) from the annotations of q."""
+    return body.replace(_UID_MARK, uid_link(q), 1).replace(_LINE_MARK, line_suffix(q), 1)
+
+
 def latex_question(q):
+    return apply_position(latex_question_body(q), q)
+
+
+def latex_question_body(q):
+    """LaTeX of q with marks in place of its position annotations (see apply_position)."""
 
     env = get_env_type(q)
-    raw_uid = q.get('uid', '')
     title = sanitize_latex_smart(q.get('title', ''))
-    auteur = sanitize_latex(q.get('author', ''))
-    discipline = sanitize_latex(q.get('discipline', ''))
-    themes = q.get('themes', [])
-    tags = q.get('tags', [])
     temps = sanitize_latex(q.get('time', ''))
-    difficulte = sanitize_latex(q.get('difficulty', ''))
-    niveau = sanitize_latex(q.get('level', ''))
 
     # Utilise le champ 'text' comme énoncé, en n'échappant pas les blocs math
     statement = sanitize_latex_smart(q.get('text', q.get('statement', '')))
@@ -93,58 +156,19 @@ def latex_question(q):
     feedback_wait_time = q.get('feedbackWaitTime', 5)
 
     # Panneau pour les modes exclus
-    excluded = q.get('excludedFrom', []) or []
+    labels = excluded_labels(q)
     excluded_latex = ''
-    if excluded:
-        # map internal names to friendly french labels
-        name_map = {
-            'practice': 'entraînement',
-            'tournament': 'tournoi',
-            'quiz': 'quiz',
-        }
-        labels = [name_map.get(x, x) for x in excluded]
+    if labels:
         excluded_latex = f"\\panneauInterdit{{{sanitize_latex(', '.join(labels))}}}\n"
 
     # Ligne 1 : uid et titre en gras, séparés par un tiret, sans parenthèses, avec temps
     time_limit = q.get('timeLimit', q.get('time', None))
     time_str = f" ({time_limit}s)" if time_limit is not None else ""
     
-    uid_display = sanitize_latex(raw_uid)
-    file_uri = q.get('_file_uri')
-    if file_uri:
-        uri_norm = str(file_uri).replace('\\', '/')
-        # Escape characters that hyperref treats specially
-        uri_safe = (
-            uri_norm
-            .replace('%', r'\%')
-            .replace('#', r'\#')
-            .replace('_', r'\_')
-            .replace('&', r'\&')
-        )
-        uid_link = f"\\href{{{uri_safe}}}{{{uid_display}}}"
-    else:
-        uid_link = uid_display
-    
-    line_info = q.get('_line_number')
-    line_suffix = ""
-    if isinstance(line_info, int) and line_info > 0:
-        line_suffix = f" (ligne {sanitize_latex(str(line_info))})"
-
-    header_line = f"\\textbf{{{uid_link} - {title}}}{time_str}{line_suffix}"
+    header_line = f"\\textbf{{{_UID_MARK} - {title}}}{time_str}{_LINE_MARK}"
 
     # Ligne 2 : auteur, difficulté, etc. sur une seule ligne
-    meta_parts = []
-    if auteur:
-        meta_parts.append(f"{auteur}")
-    if niveau:
-        meta_parts.append(f"{niveau}")
-    if difficulte:
-        meta_parts.append(f"Difficulté : {difficulte}")
-    if themes:
-        meta_parts.append(", ".join(sanitize_latex(t) for t in themes))
-    if tags:
-        meta_parts.append(", ".join(sanitize_latex(t) for t in tags))
-    meta_line = " \, | \, ".join(meta_parts)
+    meta_line = " \, | \, ".join(meta_parts(q, sanitize_latex))
 
     # Ligne 3 : énoncé (toujours affiché)
     # Sanitize while preserving/wrapping emoji runs so they use the emoji font
@@ -240,15 +264,11 @@ def latex_question(q):
 
     # Réponses avec checkmark/croix pour choix
     if env in ['choix_simple', 'choix_multiple']:
-        opts = q.get('answerOptions', q.get('options', []))
-        corrects = q.get('correctAnswers', [])
-        if opts:
+        marks = option_marks(q)
+        if marks:
             opts_latex = ""
-            for i, opt in enumerate(opts):
-                txt = sanitize_preserve_emoji(str(opt))
-                correct = False
-                if isinstance(corrects, list) and i < len(corrects):
-                    correct = bool(corrects[i])
+            for opt, correct in marks:
+                txt = sanitize_preserve_emoji(opt)
                 symbol = "\\checkmark\\," if correct else "\\cross\\,"
                 opts_latex += f"{symbol} {txt}\\\\\n"
         else:
@@ -0,0 +1,81 @@
+"""
+    Build manifest for incremental yaml2latex runs
+
+    For every compiled folder the manifest (questions/.cache/yaml2latex.json)
+    stores a hash of its inputs: the generator version, the rendered preamble and
+    the name and bytes of each YAML file. A folder whose hash did not change and
+    whose PDF still exists is skipped.
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+from .latex import RENDERER_VERSION
+
+MANIFEST_VERSION = 1
+MANIFEST_RELPATH = Path('.cache') / 'yaml2latex.json'
+AUX_RELPATH = Path('.cache') / 'yaml2latex-aux'
+
+
+def folder_hash(yaml_paths, preamble):
+    h = hashlib.sha256()
+    h.update(f"{MANIFEST_VERSION}:{RENDERER_VERSION}\0".encode())
+    h.update(preamble.encode('utf-8') + b'\0')
+    for path in sorted(yaml_paths):
+        h.update(Path(path).name.encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def write_if_changed(path, text):
+    """Write text to path unless the file already holds exactly that. Returns True if written."""
+    path = Path(path)
+    try:
+        if path.read_text(encoding='utf-8') == text:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    path.write_text(text, encoding='utf-8')
+    return True
+
+
+class BuildManifest:
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        self.path = self.base_dir / MANIFEST_RELPATH
+        self.folders = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.folders = data.get('folders', {})
+        except (OSError, ValueError):
+            pass
+
+    def _key(self, folder):
+        return Path(folder).resolve().relative_to(self.base_dir.resolve()).as_posix()
+
+    def aux_dir(self, folder):
+        """Where the .aux / .out / .toc of a folder's last build are kept between runs."""
+        key = hashlib.sha256(self._key(folder).encode('utf-8')).hexdigest()[:16]
+        return self.base_dir / AUX_RELPATH / key
+
+    def is_up_to_date(self, folder, digest, pdf_path):
+        return self.folders.get(self._key(folder)) == digest and Path(pdf_path).is_file()
+
+    def record(self, folder, digest):
+        self.folders[self._key(folder)] = digest
+
+    def forget(self, folder):
+        self.folders.pop(self._key(folder), None)
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'folders': self.folders}, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,132 @@
+"""
+    Static checks of the formulas before any LaTeX run
+
+    One broken formula makes the compilation of the whole folder fail, after
+    the engine (and its fallback) ran for nothing. The fields that yaml2latex
+    passes to LaTeX unescaped are checked beforehand, in one regex pass each:
+    - \\( \\) / \\[ \\] delimiters (question_schema.segments.split_math);
+    - braces, \\left / \\right and \\begin / \\end balance inside formulas;
+    - macros and environments against an allow-list of what the yaml2latex
+      preamble (amsmath, amssymb...) defines.
+    Problems are reported per question with file and line.
+"""
+
+import re
+
+from question_schema.segments import split_math
+
+# Champs dont les formules arrivent telles quelles dans le .tex
+LINTED_FIELDS = ('title', 'text', 'explanation')
+
+# Macros disponibles avec le préambule de latex.py (noyau LaTeX, amsmath, amssymb, xcolor)
+ALLOWED_MACROS = frozenset("""
+alpha beta gamma delta epsilon varepsilon zeta eta theta vartheta iota kappa lambda mu nu xi pi varpi rho
+varrho sigma varsigma tau upsilon phi varphi chi psi omega Gamma Delta Theta Lambda Xi Pi Sigma Upsilon Phi
+Psi Omega
+mathbb mathrm mathcal mathbf mathit mathsf mathtt mathfrak boldsymbol operatorname text textrm textbf textit
+emph displaystyle textstyle scriptstyle
+frac dfrac tfrac binom dbinom tbinom sqrt sum prod coprod int iint iiint oint lim limsup liminf sup inf max
+min arg deg det dim exp gcd hom ker ln lg log Pr sin cos tan cot sec csc arcsin arccos arctan sinh cosh tanh
+coth mod bmod pmod limits nolimits
+bar hat tilde vec dot ddot check breve acute grave overline underline widehat widetilde overrightarrow
+overleftarrow overbrace underbrace underset overset stackrel
+left right middle big Big bigg Bigg bigl bigr Bigl Bigr biggl biggr Biggl Biggr
+ldots cdots dots vdots ddots dotsb dotsc quad qquad
+in notin ni subset subseteq subsetneq supset supseteq supsetneq cup cap bigcup bigcap emptyset varnothing
+setminus complement
+forall exists nexists neg lnot land lor wedge vee implies impliedby iff Rightarrow Leftarrow Leftrightarrow
+rightarrow leftarrow leftrightarrow longrightarrow longleftarrow Longrightarrow Longleftarrow
+Longleftrightarrow to gets mapsto longmapsto uparrow downarrow nearrow searrow hookrightarrow
+leq geq le ge neq ne approx equiv sim simeq cong propto leqslant geqslant ll gg perp parallel mid nmid
+prec succ preceq succeq triangleq doteq
+infty partial nabla cdot times div pm mp circ star ast bullet bot top angle prime ell hbar Re Im aleph
+oplus otimes odot
+langle rangle lfloor rfloor lceil rceil vert Vert lvert rvert lVert rVert lbrace rbrace
+colon not boxed color textcolor phantom hphantom vphantom
+begin end
+""".split())
+
+ALLOWED_ENVIRONMENTS = frozenset("""
+matrix pmatrix bmatrix Bmatrix vmatrix Vmatrix smallmatrix cases array aligned gathered split
+""".split())
+
+_TOKEN_RE = re.compile(r'\\([A-Za-z]+)\*?(?:\s*\{([A-Za-z*]+)\})?|\\.|([{}])')
+
+
+def lint_math(formula):
+    """Problems of one formula (without its delimiters)."""
+    problems = []
+    depth = 0
+    left = 0
+    envs = []
+    for m in _TOKEN_RE.finditer(formula):
+        macro, arg, brace = m.group(1), m.group(2), m.group(3)
+        if brace == '{':
+            depth += 1
+        elif brace == '}':
+            depth -= 1
+            if depth < 0:
+                problems.append(f"accolade fermante sans ouverture (position {m.start()})")
+                depth = 0
+        elif macro:
+            if macro not in ALLOWED_MACROS:
+                problems.append(f"macro inconnue \\{macro}")
+            elif macro == 'left':
+                left += 1
+            elif macro == 'right':
+                left -= 1
+                if left < 0:
+                    problems.append("\\right sans \\left")
+                    left = 0
+            elif macro in ('begin', 'end'):
+                # \begin{...} : l'accolade est consommée avec la macro
+                if arg is None:
+                    problems.append(f"\\{macro} sans nom d'environnement")
+                    continue
+                if arg.rstrip('*') not in ALLOWED_ENVIRONMENTS:
+                    problems.append(f"environnement inconnu {arg}")
+                if macro == 'begin':
+                    envs.append(arg)
+                elif not envs or envs.pop() != arg:
+                    problems.append(f"\\end{{{arg}}} sans \\begin{{{arg}}} correspondant")
+    if depth > 0:
+        problems.append(f"{depth} accolade(s) non fermée(s)")
+    if left > 0:
+        problems.append("\\left sans \\right")
+    for env in envs:
+        problems.append(f"\\begin{{{env}}} jamais fermé")
+    return problems
+
+
+def lint_text(value):
+    """Problems of one field: delimiters, then each formula, then macros of the plain text."""
+    problems = []
+    segments, errors = split_math(value)
+    problems.extend(errors)
+    for seg in segments:
+        if seg["type"] == "math":
+            problems.extend(lint_math(seg["value"]))
+        else:
+            # Hors formule, les accolades sont échappées mais pas les macros
+            for m in _TOKEN_RE.finditer(seg["value"]):
+                if m.group(1) and m.group(1) not in ALLOWED_MACROS:
+                    problems.append(f"macro inconnue \\{m.group(1)} hors formule")
+    return problems
+
+
+def lint_question(q):
+    """["field : problem"] for every checked field of a question."""
+    problems = []
+    for field in LINTED_FIELDS:
+        value = q.get(field)
+        if isinstance(value, str):
+            problems.extend(f"{field} : {p}" for p in lint_text(value))
+    options = q.get('answerOptions', q.get('options'))
+    if isinstance(options, list):
+        for i, opt in enumerate(options):
+            problems.extend(f"answerOptions[{i}] : {p}" for p in lint_text(str(opt)))
+    return problems
+
+
+def format_problem(q, problem):
+    return f"{q.get('_source_file', '?')}:{q.get('_line_number', '?')}: uid={q.get('uid')} : {problem}"
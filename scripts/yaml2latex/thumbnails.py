@@ -0,0 +1,150 @@
+"""
+    Per-question thumbnails (PNG or SVG) for the teacher UI
+
+    Every question is typeset on its own page (preview package, page cropped to
+    the content). The missing thumbnails are typeset together, BATCH_SIZE
+    questions per engine run, and the pdf is then split into one image per page
+    with a single pdftoppm (PNG) or dvisvgm (SVG) call.
+
+    Images are named after a hash of the rendered LaTeX of the question (source
+    file / line annotations left out), so an unchanged question is never
+    rendered again, wherever its YAML file lives. index.json maps each uid to
+    its image; the directory is served as static files by the frontend.
+"""
+
+import re
+import json
+import shutil
+import hashlib
+import subprocess
+from pathlib import Path
+
+from .latex import RENDERER_VERSION, END_OF_DUMP, latex_preamble, latex_question
+from .compiler import compile_latex
+from .manifest import write_if_changed
+from .toolchain import tool_path
+
+THUMBNAIL_VERSION = 1
+FORMATS = ('png', 'svg')
+BATCH_SIZE = 100
+DPI = 150
+INDEX_NAME = 'index.json'
+# Largeur du texte d'une vignette (comme une page A4 avec marges de 2 cm)
+TEXT_WIDTH = '17cm'
+
+_PAGE_RE = re.compile(r'-(\d+)\.(png|svg)$')
+
+
+def thumbnail_question(q):
+    """The question without the annotations added by yaml2latex (_source_file, _line_number...)."""
+    return {k: v for k, v in q.items() if not str(k).startswith('_')}
+
+
+def thumbnail_key(fragment, fmt):
+    return hashlib.sha256(f"{THUMBNAIL_VERSION}:{RENDERER_VERSION}:{fmt}:{DPI}\0{fragment}".encode('utf-8')).hexdigest()[:32]
+
+
+def batch_source(fragments):
+    """One cropped page per LaTeX fragment."""
+    parts = [latex_preamble(),
+             "\\usepackage[active,tightpage]{preview}\n\\setlength\\PreviewBorder{4pt}\n",
+             END_OF_DUMP,
+             "\\begin{document}\n"]
+    for fragment in fragments:
+        parts.append(f"\\begin{{preview}}\\begin{{minipage}}{{{TEXT_WIDTH}}}\n{fragment}\\end{{minipage}}\\end{{preview}}\n")
+    parts.append("\\end{document}\n")
+    return ''.join(parts)
+
+
+def split_pages(pdf_path, fmt, log=print):
+    """Convert every page of pdf_path to an image, in one subprocess. Returns the images in page order."""
+    pdf_path = Path(pdf_path)
+    prefix = pdf_path.with_name('page')
+    if fmt == 'png':
+        cmd = [tool_path('pdftoppm') or 'pdftoppm', '-png', '-r', str(DPI), str(pdf_path), str(prefix)]
+    else:
+        cmd = [tool_path('dvisvgm') or 'dvisvgm', '--pdf', '--page=1-', '--no-fonts', '--exact-bbox',
+               f'--output={prefix}-%p.svg', str(pdf_path)]
+    try:
+        cp = subprocess.run(cmd, cwd=pdf_path.parent, capture_output=True, text=True)
+    except OSError as e:
+        log(f"[yaml2latex] {cmd[0]} not available: {e}")
+        return []
+    if cp.returncode != 0:
+        log(f"[yaml2latex] {cmd[0]} failed with return code {cp.returncode}")
+        log(cp.stderr)
+        return []
+    pages = [p for p in pdf_path.parent.glob(f'page-*.{fmt}') if _PAGE_RE.search(p.name)]
+    # pdftoppm complète les numéros par des zéros selon le nombre de pages : tri numérique
+    return sorted(pages, key=lambda p: int(_PAGE_RE.search(p.name).group(1)))
+
+
+class ThumbnailStore:
+    def __init__(self, out_dir, fmt='png', render=latex_question):
+        if fmt not in FORMATS:
+            raise ValueError(f"format de vignette inconnu : {fmt}")
+        self.dir = Path(out_dir)
+        self.fmt = fmt
+        self.render = render
+        self.index = {}
+        try:
+            with open(self.dir / INDEX_NAME, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def path(self, key):
+        return self.dir / f'{key}.{self.fmt}'
+
+    def update(self, questions, work_dir, log=print):
+        """Render the missing thumbnails of questions and point index.json at them.
+
+        Returns (rendered, reused, failed) counts.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True)
+        pending = {}
+        reused = 0
+        for q in questions:
+            fragment = self.render(thumbnail_question(q))
+            key = thumbnail_key(fragment, self.fmt)
+            uid = q.get('uid')
+            if self.path(key).is_file():
+                reused += 1
+                if uid:
+                    self.index[uid] = self.path(key).name
+            else:
+                pending.setdefault(key, (fragment, []))[1].append(uid)
+        rendered = failed = 0
+        keys = list(pending)
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            images = self._render_batch([pending[k][0] for k in batch], Path(work_dir) / f'lot-{start // BATCH_SIZE}', log)
+            if len(images) != len(batch):
+                log(f"[yaml2latex] Vignettes : lot de {len(batch)} question(s) non rendu ({len(images)} page(s) obtenue(s))")
+                failed += len(batch)
+                continue
+            for key, image in zip(batch, images):
+                shutil.move(str(image), str(self.path(key)))
+                for uid in pending[key][1]:
+                    if uid:
+                        self.index[uid] = self.path(key).name
+            rendered += len(batch)
+        return rendered, reused, failed
+
+    def _render_batch(self, fragments, batch_dir, log):
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        tex_path = batch_dir / 'vignettes.tex'
+        tex_path.write_text(batch_source(fragments), encoding='utf-8')
+        if not compile_latex(tex_path, log=log):
+            return []
+        return split_pages(tex_path.with_suffix('.pdf'), self.fmt, log=log)
+
+    def save(self, keep_only=None):
+        """Write index.json; with keep_only (uids of the whole bank), drop other entries and unused images."""
+        if keep_only is not None:
+            self.index = {uid: name for uid, name in self.index.items() if uid in keep_only}
+            used = set(self.index.values())
+            for path in self.dir.glob(f'*.{self.fmt}'):
+                if path.name not in used:
+                    path.unlink()
+        write_if_changed(self.dir / INDEX_NAME, json.dumps(self.index, ensure_ascii=False, indent=1, sort_keys=True) + "\n")
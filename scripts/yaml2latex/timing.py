@@ -0,0 +1,126 @@
+"""
+    Per-folder, per-stage timings of a yaml2latex run
+
+    TIMINGS.stage(name) wraps each step of the pipeline (load, lint, render,
+    write, compile, cleanup); TIMINGS.folder(path) tells which folder the
+    current thread works on (-j builds several at once). Nothing is recorded
+    until TIMINGS.enable() is called; then subprocess.Popen is wrapped as well,
+    so that engine passes, probes and image conversions are counted per
+    program.
+
+    report() / save() give:
+      {"folders": {folder: {"stages": {stage: {"seconds": s, "calls": n}},
+                            "subprocesses": {program: n}}},
+       "totals": {"stages": {...}, "subprocesses": {...}}}
+"""
+
+import os
+import json
+import time
+import threading
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+STAGES = ('load', 'lint', 'render', 'write', 'compile', 'cleanup')
+TIMINGS_RELPATH = Path('.cache') / 'yaml2latex-timings.json'
+
+
+class Timings:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._popen = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.folders = {}
+
+    def enable(self):
+        """Start recording, and counting subprocesses."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._popen = subprocess.Popen
+        timings = self
+
+        class CountingPopen(self._popen):
+            def __init__(self, args, *rest, **kwargs):
+                program = args if isinstance(args, (str, bytes, os.PathLike)) else args[0]
+                timings._count(os.path.basename(os.fsdecode(program)).split()[0])
+                super().__init__(args, *rest, **kwargs)
+
+        subprocess.Popen = CountingPopen
+
+    def disable(self):
+        if self.enabled:
+            subprocess.Popen = self._popen
+            self.enabled = False
+
+    def _entry(self):
+        name = getattr(self._local, 'folder', None) or '(global)'
+        return self.folders.setdefault(name, {'stages': {}, 'subprocesses': {}})
+
+    def _count(self, program):
+        with self._lock:
+            counts = self._entry()['subprocesses']
+            counts[program] = counts.get(program, 0) + 1
+
+    @contextmanager
+    def folder(self, path):
+        previous = getattr(self._local, 'folder', None)
+        self._local.folder = str(path)
+        try:
+            yield
+        finally:
+            self._local.folder = previous
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stage = self._entry()['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+                stage['seconds'] += elapsed
+                stage['calls'] += 1
+
+    def report(self):
+        with self._lock:
+            folders = json.loads(json.dumps(self.folders))
+        totals = {'stages': {}, 'subprocesses': {}}
+        for data in folders.values():
+            for name, stage in data['stages'].items():
+                total = totals['stages'].setdefault(name, {'seconds': 0.0, 'calls': 0})
+                total['seconds'] += stage['seconds']
+                total['calls'] += stage['calls']
+            for program, n in data['subprocesses'].items():
+                totals['subprocesses'][program] = totals['subprocesses'].get(program, 0) + n
+        return {'folders': folders, 'totals': totals}
+
+    def save(self, path, **extra):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.report(), **extra), f, ensure_ascii=False, indent=1)
+
+
+def summary_lines(totals):
+    """Human-readable lines for the "totals" part of a report."""
+    lines = []
+    stages = totals['stages']
+    for name in sorted(stages, key=lambda n: STAGES.index(n) if n in STAGES else len(STAGES)):
+        lines.append(f"{name:<8} {stages[name]['seconds'] * 1e3:9.1f} ms  ({stages[name]['calls']} appel(s))")
+    if totals['subprocesses']:
+        lines.append("processus : " + ", ".join(f"{p} x{n}" for p, n in sorted(totals['subprocesses'].items())))
+    return lines
+
+
+TIMINGS = Timings()
@@ -0,0 +1,169 @@
+"""
+    LaTeX toolchain probe for yaml2latex
+
+    Finding the engines and the emoji font means `which` lookups, `fc-list` and
+    `<engine> --version` subprocesses. The probe runs once per process and its
+    result is kept in a cache file (~/.cache/mathquest/yaml2latex-toolchain.json).
+    The file is reused until PATH, the fontconfig environment, one of the font
+    directories, the fontconfig caches (rewritten by fc-cache, also for fonts
+    installed in subdirectories) or an engine binary (upgraded in place) changes.
+"""
+
+import os
+import json
+import hashlib
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+TOOLCHAIN_VERSION = 3
+ENGINES = ('lualatex', 'xelatex', 'pdflatex')
+# Conversion des pages pdf en images (vignettes, voir thumbnails.py)
+IMAGE_TOOLS = ('pdftoppm', 'dvisvgm')
+EMOJI_FAMILY = 'Noto Color Emoji'
+
+# Dossiers dont la date de modification change quand une police est ajoutée / retirée
+FONT_DIRS = (
+    '/etc/fonts',
+    '/usr/share/fonts',
+    '/usr/local/share/fonts',
+    '~/.fonts',
+    '~/.local/share/fonts',
+    '~/.config/fontconfig',
+)
+# Caches fontconfig : réécrits par fc-cache quand une police apparaît, même dans un sous-dossier
+FONTCONFIG_CACHE_DIRS = (
+    '/var/cache/fontconfig',
+    '~/.fontconfig',
+)
+
+_lock = threading.Lock()
+_toolchain = None
+
+
+def cache_dir():
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return Path(root) / 'mathquest'
+
+
+def cache_path():
+    return cache_dir() / 'yaml2latex-toolchain.json'
+
+
+def environment_key():
+    """Hash of everything that can change the probe result (no subprocess)."""
+    h = hashlib.sha256()
+    h.update(f"{TOOLCHAIN_VERSION}\0{os.environ.get('PATH', '')}\0".encode())
+    for var in ('FONTCONFIG_FILE', 'FONTCONFIG_PATH'):
+        h.update(f"{os.environ.get(var, '')}\0".encode())
+    user_cache = os.path.join(os.environ.get('XDG_CACHE_HOME') or '~/.cache', 'fontconfig')
+    for d in FONT_DIRS + FONTCONFIG_CACHE_DIRS + (user_cache,):
+        try:
+            mtime = os.stat(os.path.expanduser(d)).st_mtime_ns
+        except OSError:
+            mtime = 0
+        h.update(f"{d}:{mtime}\0".encode())
+    # Moteur mis à jour sur place (même chemin) : binaire réel, après les liens symboliques
+    for engine in ENGINES:
+        path = shutil.which(engine)
+        try:
+            st = os.stat(os.path.realpath(path)) if path else None
+        except OSError:
+            st = None
+        h.update(f"{engine}:{path}:{st.st_mtime_ns if st else 0}:{st.st_size if st else 0}\0".encode())
+    return h.hexdigest()
+
+
+def _engine_version(path):
+    try:
+        out = subprocess.check_output([path, '--version'], stderr=subprocess.DEVNULL, timeout=30).decode('utf-8', 'replace')
+        return out.splitlines()[0].strip() if out else ''
+    except Exception:
+        return ''
+
+
+def _emoji_fonts():
+    """(family available, path to a Noto Color Emoji file or None) from a single fc-list call."""
+    try:
+        out = subprocess.check_output(['fc-list', ':file family'], stderr=subprocess.DEVNULL).decode('utf-8')
+    except Exception:
+        return False, None
+    available = False
+    font_file = None
+    for line in out.splitlines():
+        # line format: /path/to/file.ttf: Family Name
+        parts = line.split(':')
+        if not parts:
+            continue
+        path = parts[0].strip()
+        fam = ':'.join(parts[1:]).strip()
+        if EMOJI_FAMILY in fam:
+            available = True
+        if font_file is None and (EMOJI_FAMILY in fam or 'NotoColorEmoji' in path or 'Noto-Emoji' in path or 'NotoEmoji' in fam):
+            font_file = path
+    return available, font_file
+
+
+def _kpsewhich(name):
+    try:
+        out = subprocess.check_output(['kpsewhich', name], stderr=subprocess.DEVNULL, timeout=30).decode('utf-8').strip()
+        return out or None
+    except Exception:
+        return None
+
+
+def probe_toolchain():
+    """Run the actual probe (which / fc-list / --version)."""
+    engines = {}
+    for engine in ENGINES:
+        path = shutil.which(engine)
+        engines[engine] = {'path': path, 'version': _engine_version(path) if path else None}
+    emoji_available, emoji_font_file = _emoji_fonts()
+    return {
+        'version': TOOLCHAIN_VERSION,
+        'engines': engines,
+        'emoji_font_available': emoji_available,
+        'emoji_font_file': emoji_font_file,
+        # Needed to dump the preamble into a format (see fmt.py)
+        'mylatexformat': _kpsewhich('mylatexformat.ltx'),
+        'tools': {tool: shutil.which(tool) for tool in IMAGE_TOOLS},
+    }
+
+
+def get_toolchain(refresh=False):
+    """Toolchain description, probed at most once per process and cached on disk."""
+    global _toolchain
+    with _lock:
+        if _toolchain is not None and not refresh:
+            return _toolchain
+        key = environment_key()
+        path = cache_path()
+        if not refresh:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('version') == TOOLCHAIN_VERSION and cached.get('key') == key:
+                    _toolchain = cached
+                    return _toolchain
+            except (OSError, ValueError):
+                pass
+        _toolchain = dict(probe_toolchain(), key=key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(_toolchain, f, indent=1)
+            os.replace(tmp, path)
+        except OSError:
+            # Pas de cache disque (HOME en lecture seule...) : le cache mémoire suffit
+            pass
+        return _toolchain
+
+
+def engine_path(engine):
+    return get_toolchain()['engines'].get(engine, {}).get('path')
+
+
+def tool_path(tool):
+    return get_toolchain().get('tools', {}).get(tool)
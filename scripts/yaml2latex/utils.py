@@ -3,123 +3,141 @@
 """
 
 import re
-import subprocess
+from functools import lru_cache
 from typing import Set
 
+from .toolchain import get_toolchain
+
 # When option 1 selected: do not attempt font or image rendering; replace emoji with placeholder
 EMOJI_PLACEHOLDER = '[emoji]'
 
 def find_emoji_font_file():
     """Return an absolute path to a Noto Color Emoji ttf if present, else None."""
-    try:
-        out = subprocess.check_output(['fc-list', ':file family'], stderr=subprocess.DEVNULL).decode('utf-8')
-        for line in out.splitlines():
-            # line format: /path/to/file.ttf: Family Name
-            parts = line.split(':')
-            if not parts:
-                continue
-            path = parts[0].strip()
-            fam = ':'.join(parts[1:]).strip()
-            if 'Noto Color Emoji' in fam or 'NotoColorEmoji' in path or 'Noto-Emoji' in path or 'NotoEmoji' in fam:
-                return path
-    except Exception:
-        return None
-    return None
+    return get_toolchain()['emoji_font_file']
+
+# Caractères spéciaux LaTeX et leur forme échappée
+_SPECIAL_CHARS = {
+    '_': r'\_',
+    '%': r'\%',
+    '&': r'\&',
+    '#': r'\#',
+    '$': r'\$',
+    '{': r'\{',
+    '}': r'\}',
+    # Caret and tilde need special forms
+    '^': r'\^{}',
+    '~': r'\~{}',
+}
+# Avoid re-escaping characters already escaped in the source (e.g. "\_" stays "\_")
+_SPECIAL = r'(?<!\\)([_%&#$^~{}])'
+_ESCAPE_RE = re.compile(_SPECIAL)
+# Emoji replaced by EMOJI_PLACEHOLDER in sanitize_preserve_emoji
+_EMOJI = r'([\U0001F300-\U0001FAFF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\u2600-\u26FF\u2700-\u27BF])'
+# Emoji wrapped by wrap_emojis (common emoji ranges: Misc symbols, emoticons, transport, dingbats, etc.)
+_WRAP_EMOJI_RE = re.compile(r'([\U0001F300-\U0001F5FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\u2600-\u26FF\u2700-\u27BF])')
+# Un seul automate : délimiteur math \( \) \[ \] (après un nombre pair de backslashs, comme
+# question_schema.segments), emoji ou caractère spécial
+_TOKEN_RE = re.compile(r'(?<!\\)(?:\\\\)*\\([()\[\]])|' + _EMOJI + '|' + _SPECIAL)
+
+# Taille des caches : les mêmes chaînes (options de réponse, thèmes, tags...) reviennent sans cesse
+_CACHE_SIZE = 16384
+
+
+def _escape_match(m):
+    return _SPECIAL_CHARS[m.group(1)]
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _escape(s):
+    return _ESCAPE_RE.sub(_escape_match, s)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _render(s, emoji):
+    """Escape s in one pass, keeping math blocks verbatim.
+
+    Same result as escaping the text segments of question_schema.segments.split_math
+    (an unclosed block is plain text up to the end); with emoji=True the string is
+    first cut at each emoji, which is replaced by EMOJI_PLACEHOLDER.
+    """
+    out = []
+    pos = 0
+    open_at = None
+    display = False
+    for m in _TOKEN_RE.finditer(s):
+        delim, emo, special = m.group(1), m.group(2), m.group(3)
+        if open_at is None:
+            if delim:
+                if delim in '([':
+                    # Le bloc commence au délimiteur, pas aux paires de backslashs qui le précèdent
+                    start = m.start(1) - 1
+                    out.append(s[pos:start])
+                    open_at = pos = start
+                    display = delim == '['
+                # délimiteur fermant sans ouverture : texte
+            elif emo:
+                if emoji:
+                    out.append(s[pos:m.start()])
+                    out.append(EMOJI_PLACEHOLDER)
+                    pos = m.end()
+            else:
+                out.append(s[pos:m.start()])
+                out.append(_SPECIAL_CHARS[special])
+                pos = m.end()
+        elif delim:
+            # Fermeture correspondante : le bloc est recopié tel quel ;
+            # ouverture imbriquée ou fermeture d'un autre type : ignorée
+            if delim in ')]' and (delim == ']') == display:
+                out.append(s[pos:m.end()])
+                open_at = None
+                pos = m.end()
+        elif emo and emoji:
+            # L'emoji coupe la chaîne : le bloc ouvert n'est jamais fermé, c'est du texte
+            out.append(_escape(s[open_at:m.start()]))
+            out.append(EMOJI_PLACEHOLDER)
+            open_at = None
+            pos = m.end()
+    if open_at is not None:
+        out.append(_escape(s[open_at:]))
+    else:
+        out.append(s[pos:])
+    return ''.join(out)
+
 
 def sanitize_latex(s):
     if not isinstance(s, str):
         return s
     # Escape LaTeX special characters, but avoid re-escaping ones that are
-    # already escaped in the source (e.g. "\_" should remain "\_"). We use
-    # negative lookbehind to only match characters not preceded by a backslash.
-    s2 = s
-    # Common single-char escapes
-    replacements = [
-        (r'(?<!\\)_', r'\\_'),
-        (r'(?<!\\)%', r'\\%'),
-        (r'(?<!\\)&', r'\\&'),
-        (r'(?<!\\)#', r'\\#'),
-        (r'(?<!\\)\$', r'\\$'),
-        (r'(?<!\\){', r'\\{'),
-        (r'(?<!\\)}', r'\\}'),
-    ]
-    for pat, repl in replacements:
-        s2 = re.sub(pat, repl, s2)
-    # Caret and tilde need special forms
-    s2 = re.sub(r'(?<!\\)\^', r'\\^{}', s2)
-    s2 = re.sub(r'(?<!\\)~', r'\\~{}', s2)
-    return s2
+    # already escaped in the source (e.g. "\_" should remain "\_"): one regex
+    # pass with a lookbehind, memoized.
+    return _escape(s)
 
 # N'échappe pas les blocs \( ... \) et \[ ... \]
 def sanitize_latex_smart(s):
     if not isinstance(s, str):
         return s
-    # Regex pour trouver les blocs math \( ... \) et \[ ... \] sur plusieurs lignes
-    pattern = r'(\\\(|\\\[)(.*?)(\\\)|\\\])'
-    # Version améliorée :
-    # - \( ... \)  ou  \[ ... \]  sur plusieurs lignes
-    # - non greedy, mais inclut tout jusqu'à le bon séparateur
-    pattern = r'(\\\(|\\\[)(.*?)(\\\)|\\\])'
-    matches = list(re.finditer(pattern, s, re.DOTALL))
-    if not matches:
-        return sanitize_latex(s)
-    parts = []
-    last_end = 0
-    for m in matches:
-        before = s[last_end:m.start()]
-        if before:
-            parts.append(sanitize_latex(before))
-        parts.append(m.group(0))
-        last_end = m.end()
-    if last_end < len(s):
-        parts.append(sanitize_latex(s[last_end:]))
-    return ''.join(parts)
+    # Même découpage texte / math que celui stocké en base par import_questions.py
+    return _render(s, False)
 
 def wrap_emojis(s):
-    """Replace emoji characters by \emoji{<char>} so they render with the emoji font.
+    """Replace emoji characters by \\emoji{<char>} so they render with the emoji font.
     Matches common emoji Unicode ranges.
     """
     if not isinstance(s, str) or not s:
         return s
-    # common emoji ranges: Misc symbols, emoticons, transport, dingbats, etc.
-    emoji_pattern = re.compile(r'([\U0001F300-\U0001F5FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\u2600-\u26FF\u2700-\u27BF])')
-    return emoji_pattern.sub(r'\\emoji{\1}', s)
+    return _WRAP_EMOJI_RE.sub(r'\\emoji{\1}', s)
 
 
 def sanitize_preserve_emoji(s):
     """Sanitize a string for LaTeX while preserving emoji characters.
-    Approach:
-    - Find emoji runs and replace them by placeholders (\x01, \x02, ...)
-    - Run existing sanitize_latex / sanitize_latex_smart on the non-emoji parts
-    - Reinsert the emoji runs wrapped in a TeX group that selects the emoji font
-      i.e. {\emojiFont <emoji>} so fontspec will use the emoji font for that glyph
+
+    Emoji runs split the string; each piece is sanitized like sanitize_latex_smart
+    (math blocks kept) and each emoji is replaced by EMOJI_PLACEHOLDER (easier,
+    portable). Done in the same single pass as sanitize_latex_smart.
     """
     if not isinstance(s, str) or not s:
         return s
-    # Regex matching a wide set of emoji/codepoints (extend as needed)
-    emoji_pattern = re.compile(r'([\U0001F300-\U0001FAFF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF\u2600-\u26FF\u2700-\u27BF])')
-    parts = []
-    placeholders = {}
-    idx = 0
-    last = 0
-    for m in emoji_pattern.finditer(s):
-        if m.start() > last:
-            parts.append(s[last:m.start()])
-        ph = f"\x01{idx}\x02"
-        placeholders[ph] = m.group(0)
-        parts.append(ph)
-        idx += 1
-        last = m.end()
-    if last < len(s):
-        parts.append(s[last:])
-
-    # Sanitize the non-emoji pieces using the smart sanitizer to keep math blocks
-    sanitized = ''.join(sanitize_latex_smart(p) if not (p.startswith('\x01') and p.endswith('\x02')) else p for p in parts)
-
-    # Reinsert emojis with a simple textual placeholder (easier, portable)
-    for ph, emo in placeholders.items():
-        sanitized = sanitized.replace(ph, EMOJI_PLACEHOLDER)
-    return sanitized
+    return _render(s, True)
 
 def get_env_type(q):
     # Détection du type de question
@@ -128,4 +146,46 @@ def get_env_type(q):
         return 'choix_multiple'
     elif t in ['numeric', 'numeric_answer']:
         return 'numeric'
-    return 'choix_simple'
\ No newline at end of file
+    return 'choix_simple'
+
+# Libellés des modes de jeu (panneau "exclu de")
+EXCLUDED_LABELS = {
+    'practice': 'entraînement',
+    'tournament': 'tournoi',
+    'quiz': 'quiz',
+}
+
+
+def excluded_labels(q):
+    return [EXCLUDED_LABELS.get(x, x) for x in (q.get('excludedFrom', []) or [])]
+
+
+def meta_parts(q, escape):
+    """Pieces of the metadata line (author, level, difficulty, themes, tags).
+
+    Shared by the LaTeX and HTML backends; each value goes through escape.
+    """
+    parts = []
+    for field in ('author', 'level'):
+        value = escape(q.get(field, ''))
+        if value:
+            parts.append(f"{value}")
+    difficulty = escape(q.get('difficulty', ''))
+    if difficulty:
+        parts.append(f"Difficulté : {difficulty}")
+    for field in ('themes', 'tags'):
+        values = q.get(field, [])
+        if values:
+            parts.append(", ".join(escape(v) for v in values))
+    return parts
+
+
+def option_marks(q):
+    """[(option text, is correct)] for choice questions."""
+    opts = q.get('answerOptions', q.get('options', [])) or []
+    corrects = q.get('correctAnswers', [])
+    marks = []
+    for i, opt in enumerate(opts):
+        correct = isinstance(corrects, list) and i < len(corrects) and bool(corrects[i])
+        marks.append((str(opt), correct))
+    return marks
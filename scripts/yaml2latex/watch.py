@@ -0,0 +1,90 @@
+"""
+    Watch mode for yaml2latex
+
+    Polls the YAML files under the watched directory (stat only, no external
+    dependency) and, once the edits have settled for `debounce` seconds, rebuilds
+    only the folders whose files were added, modified or removed. After each
+    rebuild the stamp file questions/.cache/yaml2latex.stamp is rewritten with
+    the paths of the refreshed outputs, so that viewers / editor tasks can
+    reload on a single file.
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+
+STAMP_RELPATH = Path('.cache') / 'yaml2latex.stamp'
+POLL_INTERVAL = 0.5
+DEBOUNCE = 0.3
+
+
+def scan(root):
+    """{yaml path: (mtime_ns, size)} for every YAML file under root (cache dirs skipped)."""
+    state = {}
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for f in files:
+            if f.endswith('.yaml'):
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def changed_folders(before, after):
+    """Folders holding a YAML file added, modified or removed between two scans, still holding YAML files."""
+    changed = {p for p in before.keys() | after.keys() if before.get(p) != after.get(p)}
+    live = {Path(p).parent for p in after}
+    return sorted({Path(p).parent for p in changed} & live)
+
+
+def touch_stamp(base_dir, outputs):
+    path = Path(base_dir) / STAMP_RELPATH
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(''.join(f"{out}\n" for out in outputs), encoding='utf-8')
+    except OSError:
+        pass
+
+
+def watch(root, base_dir, rebuild, interval=POLL_INTERVAL, debounce=DEBOUNCE, log=print, stop=None):
+    """Rebuild the folders changed under root until interrupted (or until stop is set).
+
+    rebuild(folder) returns the path of the refreshed output, or None on failure.
+    """
+    stop = stop or threading.Event()
+    state = scan(root)
+    log(f"[yaml2latex] Surveillance de {root} (Ctrl+C pour arrêter)")
+    try:
+        while not stop.wait(interval):
+            current = scan(root)
+            if current == state:
+                continue
+            # Attendre que les sauvegardes soient terminées (éditeurs qui écrivent en plusieurs fois)
+            while not stop.wait(debounce):
+                settled = scan(root)
+                if settled == current:
+                    break
+                current = settled
+            folders = changed_folders(state, current)
+            state = current
+            outputs = []
+            for folder in folders:
+                start = time.perf_counter()
+                try:
+                    out = rebuild(folder)
+                except Exception as e:
+                    # YAML en cours d'édition (syntaxe invalide...) : on attend la prochaine sauvegarde
+                    log(f"[yaml2latex] {folder}: {e}")
+                    out = None
+                log(f"[yaml2latex] {folder}: {'à jour' if out else 'échec'} en {time.perf_counter() - start:.1f} s")
+                if out:
+                    outputs.append(out)
+            if outputs:
+                touch_stamp(base_dir, outputs)
+    except KeyboardInterrupt:
+        pass